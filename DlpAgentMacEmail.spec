@@ -0,0 +1,40 @@
+# -*- mode: python ; coding: utf-8 -*-
+
+
+a = Analysis(
+    ['dlp_agent_mac_email.py'],
+    pathex=[],
+    binaries=[],
+    # HOOK_MODULES: setup_git_firewall() / create_git_email_helper() copy từ sys._MEIPASS vào ~/.dlp_git_hooks
+    datas=[('.env', '.'), ('git_hook_check.py', '.'), ('agent_ipc.py', '.'), ('push_scanner.py', '.'), ('code_detector.py', '.'), ('file_sampler.py', '.'), ('verdict_store.py', '.')],
+    hiddenimports=[],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=[],
+    noarchive=False,
+    optimize=0,
+)
+pyz = PYZ(a.pure)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    a.binaries,
+    a.datas,
+    [],
+    name='DlpAgent',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=True,
+    upx_exclude=[],
+    runtime_tmpdir=None,
+    console=True,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+    icon=['logo.icns'],
+)
@@ -0,0 +1,412 @@
+# -*- coding: utf-8 -*-
+"""IPC cục bộ giữa hook (tiến trình sống vài chục ms) và agent thường trú: request/response JSON.
+
+Agent giữ sẵn policy, VerdictStore đã mở, spool...; hook gửi 1 request thay vì dựng lại tất cả từ đầu.
+  - macOS/Linux: Unix domain socket <IPC_DIR>/agent.sock, thư mục 0700 -> chỉ user hiện tại kết nối được
+  - Windows: named pipe \\\\.\\pipe\\dlp_agent-<user>, DACL chỉ cho SID của user hiện tại; client kiểm tra
+    process giữ pipe (GetNamedPipeServerProcessId) chạy đúng user đó trước khi gửi gì -> user khác không
+    giả làm agent được dù tạo pipe trước
+Server dùng multiprocessing.connection.Listener (Windows: _PipeListener); mỗi message là JSON utf-8 đóng khung như
+Connection.send_bytes (4 byte độ dài big-endian) nên client POSIX chỉ cần socket/struct, không import
+multiprocessing (nặng gấp ~3 lần) trên đường chạy của hook.
+
+Client không kết nối được / quá thời gian / agent báo lỗi -> AgentUnavailable: caller tự đánh giá cục bộ.
+"""
+from __future__ import annotations
+import os
+import json
+import struct
+
+IPC_DIR = os.path.expanduser("~/.dlp_agent_ipc")
+CONNECT_TIMEOUT = 0.5
+CALL_TIMEOUT = 5.0
+IDLE_TIMEOUT = 30.0             # Server đóng kết nối không gửi gì trong khoảng này
+MAX_MESSAGE = 16 * 1024 * 1024
+ACCEPT_BACKOFF = (0.05, 2.0)    # accept() lỗi liên tiếp (EMFILE...): chờ tăng gấp đôi trong khoảng này
+ACCEPT_LOG_AFTER = 5            # In cảnh báo khi lỗi liên tiếp tới ngưỡng này, sau đó mỗi 100 lần
+PIPE_BUFSIZE = 8192
+
+
+class AgentUnavailable(Exception):
+    """Agent không chạy, không trả lời kịp hoặc xử lý lỗi - caller tự fallback."""
+
+
+def default_address():
+    if os.name == "nt":
+        user = os.environ.get("USERNAME") or "user"
+        return rf"\\.\pipe\dlp_agent-{user}"
+    return os.path.join(IPC_DIR, "agent.sock")
+
+
+class AgentClient:
+    """Client mỏng: call(op, **args) -> result. Giữ 1 kết nối cho nhiều call liên tiếp."""
+
+    def __init__(self, address=None, timeout=CALL_TIMEOUT, connect_timeout=CONNECT_TIMEOUT):
+        self.address = address or default_address()
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self._sock = None
+        self._conn = None
+
+    def _connect(self):
+        if self._sock is not None or self._conn is not None:
+            return
+        try:
+            if os.name == "nt":
+                self._conn = _pipe_connect(self.address, self.connect_timeout)
+            else:
+                import socket
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.settimeout(self.connect_timeout)
+                try:
+                    sock.connect(self.address)
+                except OSError:
+                    sock.close()
+                    raise
+                self._sock = sock
+        except OSError as e:
+            raise AgentUnavailable(f"agent not reachable at {self.address}: {e}")
+
+    def _recv_exact(self, n):
+        buf = bytearray()
+        while len(buf) < n:
+            chunk = self._sock.recv(n - len(buf))
+            if not chunk:
+                raise EOFError("agent closed the connection")
+            buf += chunk
+        return bytes(buf)
+
+    def _exchange(self, payload, timeout):
+        if self._conn is not None:
+            self._conn.send_bytes(payload)
+            if not self._conn.poll(timeout):
+                raise TimeoutError("no reply from agent")
+            return self._conn.recv_bytes(MAX_MESSAGE)
+        self._sock.settimeout(timeout)
+        self._sock.sendall(struct.pack("!i", len(payload)) + payload)
+        size, = struct.unpack("!i", self._recv_exact(4))
+        if size == -1:   # Khung message > 2GB của Connection (không xảy ra với MAX_MESSAGE, đọc cho đúng giao thức)
+            size, = struct.unpack("!Q", self._recv_exact(8))
+        if size > MAX_MESSAGE:
+            raise OSError(f"reply too large ({size} bytes)")
+        return self._recv_exact(size)
+
+    def call(self, op, timeout=None, **args):
+        self._connect()
+        args["op"] = op
+        try:
+            reply = json.loads(self._exchange(json.dumps(args).encode("utf-8"),
+                                              self.timeout if timeout is None else timeout))
+        except (OSError, EOFError, ValueError) as e:   # TimeoutError là OSError
+            self.close()
+            raise AgentUnavailable(f"{op}: {e}")
+        if not reply.get("ok"):
+            raise AgentUnavailable(f"{op}: {reply.get('error')}")
+        return reply.get("result")
+
+    def close(self):
+        for conn in (self._sock, self._conn):
+            if conn is not None:
+                try: conn.close()
+                except OSError: pass
+        self._sock = self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# --- Windows named pipe -------------------------------------------------------------------------------
+# multiprocessing.connection tạo pipe với DACL mặc định và Client chờ pipe bận tới 20s, nên phần tạo/mở
+# pipe tự làm ở đây; đọc/ghi vẫn dùng PipeConnection (cùng khung message với Listener phía POSIX).
+
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+TOKEN_QUERY = 0x0008
+TOKEN_USER = 1
+PIPE_REJECT_REMOTE_CLIENTS = 0x00000008
+SDDL_REVISION_1 = 1
+
+_win32 = None
+
+
+def _win_api():
+    """(kernel32, advapi32) qua ctypes, khai báo kiểu 1 lần."""
+    global _win32
+    if _win32 is None:
+        import ctypes
+        from ctypes import wintypes
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        advapi32 = ctypes.WinDLL("advapi32", use_last_error=True)
+        kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+        kernel32.OpenProcess.argtypes = (wintypes.DWORD, wintypes.BOOL, wintypes.DWORD)
+        kernel32.OpenProcess.restype = wintypes.HANDLE
+        kernel32.CloseHandle.argtypes = (wintypes.HANDLE,)
+        kernel32.LocalFree.argtypes = (ctypes.c_void_p,)
+        kernel32.LocalFree.restype = ctypes.c_void_p
+        kernel32.GetNamedPipeServerProcessId.argtypes = (wintypes.HANDLE, ctypes.POINTER(wintypes.ULONG))
+        kernel32.GetNamedPipeServerProcessId.restype = wintypes.BOOL
+        advapi32.OpenProcessToken.argtypes = (wintypes.HANDLE, wintypes.DWORD, ctypes.POINTER(wintypes.HANDLE))
+        advapi32.OpenProcessToken.restype = wintypes.BOOL
+        advapi32.GetTokenInformation.argtypes = (wintypes.HANDLE, ctypes.c_int, ctypes.c_void_p, wintypes.DWORD,
+                                                 ctypes.POINTER(wintypes.DWORD))
+        advapi32.GetTokenInformation.restype = wintypes.BOOL
+        advapi32.ConvertSidToStringSidW.argtypes = (ctypes.c_void_p, ctypes.POINTER(wintypes.LPWSTR))
+        advapi32.ConvertSidToStringSidW.restype = wintypes.BOOL
+        advapi32.ConvertStringSecurityDescriptorToSecurityDescriptorW.argtypes = (
+            wintypes.LPCWSTR, wintypes.DWORD, ctypes.POINTER(ctypes.c_void_p), ctypes.POINTER(wintypes.ULONG))
+        advapi32.ConvertStringSecurityDescriptorToSecurityDescriptorW.restype = wintypes.BOOL
+        _win32 = (kernel32, advapi32)
+    return _win32
+
+
+def _check(ok):
+    if not ok:
+        import ctypes
+        raise ctypes.WinError(ctypes.get_last_error())
+    return ok
+
+
+def _process_user_sid(pid=None):
+    """SID (dạng chuỗi S-1-5-...) của user sở hữu process pid (None = process hiện tại)."""
+    import ctypes
+    from ctypes import wintypes
+    kernel32, advapi32 = _win_api()
+    if pid is None:
+        process = kernel32.GetCurrentProcess()   # Pseudo handle, không cần đóng
+    else:
+        process = _check(kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid))
+    token = wintypes.HANDLE()
+    try:
+        _check(advapi32.OpenProcessToken(process, TOKEN_QUERY, ctypes.byref(token)))
+        try:
+            size = wintypes.DWORD()
+            advapi32.GetTokenInformation(token, TOKEN_USER, None, 0, ctypes.byref(size))
+            buf = ctypes.create_string_buffer(size.value)
+            _check(advapi32.GetTokenInformation(token, TOKEN_USER, buf, size, ctypes.byref(size)))
+            sid = ctypes.cast(buf, ctypes.POINTER(ctypes.c_void_p))[0]   # TOKEN_USER.User.Sid là field đầu
+            text = wintypes.LPWSTR()
+            _check(advapi32.ConvertSidToStringSidW(sid, ctypes.byref(text)))
+            try:
+                return text.value
+            finally:
+                kernel32.LocalFree(ctypes.cast(text, ctypes.c_void_p))
+        finally:
+            kernel32.CloseHandle(token)
+    finally:
+        if pid is not None:
+            kernel32.CloseHandle(process)
+
+
+def _pipe_connect(address, timeout):
+    """Mở pipe của agent trong tối đa timeout giây và chỉ nhận nếu server chạy cùng user với mình."""
+    import time
+    import ctypes
+    import _winapi
+    from ctypes import wintypes
+    from multiprocessing.connection import PipeConnection
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            handle = _winapi.CreateFile(address, _winapi.GENERIC_READ | _winapi.GENERIC_WRITE, 0, _winapi.NULL,
+                                        _winapi.OPEN_EXISTING, _winapi.FILE_FLAG_OVERLAPPED, _winapi.NULL)
+            break
+        except OSError as e:
+            if e.winerror not in (_winapi.ERROR_SEM_TIMEOUT, _winapi.ERROR_PIPE_BUSY):
+                raise   # ERROR_FILE_NOT_FOUND: agent không chạy
+            remaining = int((deadline - time.monotonic()) * 1000)
+            if remaining <= 0:
+                raise TimeoutError(f"pipe {address} busy")
+            _winapi.WaitNamedPipe(address, remaining)   # 0 là "timeout mặc định" nên remaining luôn >= 1
+    try:
+        _winapi.SetNamedPipeHandleState(handle, _winapi.PIPE_READMODE_MESSAGE, None, None)
+        pid = wintypes.ULONG()
+        _check(_win_api()[0].GetNamedPipeServerProcessId(handle, ctypes.byref(pid)))
+        if _process_user_sid(pid.value) != _process_user_sid():
+            raise PermissionError(f"pipe {address} is served by pid {pid.value} of another user")
+    except BaseException:
+        _winapi.CloseHandle(handle)
+        raise
+    return PipeConnection(handle)
+
+
+class _PipeListener:
+    """Như multiprocessing.connection.PipeListener nhưng pipe có DACL chỉ cho user hiện tại.
+
+    Instance đầu dùng FILE_FLAG_FIRST_PIPE_INSTANCE: nếu process khác đã tạo pipe trùng tên thì báo lỗi thay
+    vì âm thầm dùng chung tên với nó.
+    """
+
+    def __init__(self, address):
+        import ctypes
+        from ctypes import wintypes
+
+        class SECURITY_ATTRIBUTES(ctypes.Structure):
+            _fields_ = [("nLength", wintypes.DWORD), ("lpSecurityDescriptor", ctypes.c_void_p),
+                        ("bInheritHandle", wintypes.BOOL)]
+
+        self.address = address
+        descriptor = ctypes.c_void_p()
+        _check(_win_api()[1].ConvertStringSecurityDescriptorToSecurityDescriptorW(
+            f"D:P(A;;GA;;;{_process_user_sid()})", SDDL_REVISION_1, ctypes.byref(descriptor), None))
+        self._descriptor = descriptor
+        self._attributes = SECURITY_ATTRIBUTES(ctypes.sizeof(SECURITY_ATTRIBUTES), descriptor, False)
+        self._handles = [self._new_handle(first=True)]
+
+    def _new_handle(self, first=False):
+        import ctypes
+        import _winapi
+        flags = _winapi.PIPE_ACCESS_DUPLEX | _winapi.FILE_FLAG_OVERLAPPED
+        if first:
+            flags |= _winapi.FILE_FLAG_FIRST_PIPE_INSTANCE
+        return _winapi.CreateNamedPipe(
+            self.address, flags,
+            _winapi.PIPE_TYPE_MESSAGE | _winapi.PIPE_READMODE_MESSAGE | _winapi.PIPE_WAIT | PIPE_REJECT_REMOTE_CLIENTS,
+            _winapi.PIPE_UNLIMITED_INSTANCES, PIPE_BUFSIZE, PIPE_BUFSIZE, _winapi.NMPWAIT_WAIT_FOREVER,
+            ctypes.addressof(self._attributes))
+
+    def accept(self):
+        import _winapi
+        from multiprocessing.connection import PipeConnection
+        self._handles.append(self._new_handle())
+        handle = self._handles.pop(0)
+        try:
+            overlapped = _winapi.ConnectNamedPipe(handle, overlapped=True)
+        except OSError as e:
+            if e.winerror != _winapi.ERROR_NO_DATA:   # Client đã kết nối rồi đóng trước khi accept
+                _winapi.CloseHandle(handle)
+                raise
+        else:
+            try:
+                _winapi.WaitForMultipleObjects([overlapped.event], False, _winapi.INFINITE)
+            except BaseException:
+                overlapped.cancel()
+                _winapi.CloseHandle(handle)
+                raise
+            finally:
+                overlapped.GetOverlappedResult(True)
+        return PipeConnection(handle)
+
+    def close(self):
+        import _winapi
+        handles, self._handles = self._handles, []
+        for handle in handles:
+            _winapi.CloseHandle(handle)
+        if self._descriptor:
+            _win_api()[0].LocalFree(self._descriptor)
+            self._descriptor = None
+
+
+def _listener_alive(address):
+    try:
+        with AgentClient(address, connect_timeout=0.2) as client:
+            client.call("ping", timeout=0.5)
+        return True
+    except AgentUnavailable:
+        return False
+
+
+class AgentServer:
+    """Thread daemon nhận request {"op": ..., ...}, trả handlers[op](**args) (phải JSON được).
+
+    Mỗi kết nối xử lý ở thread riêng nên vài hook chạy cùng lúc không chờ nhau; handler phải thread-safe.
+    Lỗi trong handler trả về {"ok": false} - client coi như agent không có và tự xử lý cục bộ.
+    """
+
+    def __init__(self, handlers, address=None, name="agent_ipc"):
+        self.handlers = dict(handlers)
+        self.handlers.setdefault("ping", lambda: {"pid": os.getpid()})
+        self.address = address or default_address()
+        self.name = name
+        self._listener = None
+        self._stop = None
+        self._thread = None
+        self.stats = {"connections": 0, "requests": 0, "errors": 0, "accept_errors": 0}
+
+    def _listen(self):
+        if os.name == "nt":
+            return _PipeListener(self.address)
+        from multiprocessing.connection import Listener
+        directory = os.path.dirname(self.address)
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        os.chmod(directory, 0o700)
+        if os.path.exists(self.address):
+            if _listener_alive(self.address):
+                raise OSError(f"another agent is already listening on {self.address}")
+            os.remove(self.address)   # Socket còn lại của agent đã chết
+        return Listener(self.address, family="AF_UNIX", backlog=16)
+
+    def start(self):
+        """Bắt đầu nhận kết nối; không bind được thì in cảnh báo (hook vẫn chạy nhờ fallback cục bộ)."""
+        import threading
+        if self._thread is not None:
+            return self
+        try:
+            self._listener = self._listen()
+        except OSError as e:
+            print(f"⚠️ [{self.name}] IPC disabled: {e}")
+            return self
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._serve, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        _listener_alive(self.address)   # Đánh thức accept() đang chờ
+        try: self._listener.close()
+        except OSError: pass
+
+    def _serve(self):
+        import threading
+        failures = 0
+        while not self._stop.is_set():
+            try:
+                conn = self._listener.accept()
+            except OSError as e:
+                if self._stop.is_set():   # stop() đã đóng listener
+                    break
+                failures += 1
+                self.stats["accept_errors"] += 1
+                if failures == ACCEPT_LOG_AFTER or failures % 100 == 0:
+                    print(f"⚠️ [{self.name}] accept failed {failures} times in a row: {e}")
+                low, high = ACCEPT_BACKOFF
+                self._stop.wait(min(high, low * 2 ** min(failures - 1, 10)))
+                continue
+            failures = 0
+            if self._stop.is_set():
+                conn.close()
+                break
+            self.stats["connections"] += 1
+            threading.Thread(target=self._handle, args=(conn,), name=f"{self.name}-conn", daemon=True).start()
+
+    def _handle(self, conn):
+        with conn:
+            while True:
+                try:
+                    if not conn.poll(IDLE_TIMEOUT):
+                        return
+                    data = conn.recv_bytes(MAX_MESSAGE)
+                except (OSError, EOFError):
+                    return
+                reply = self.dispatch(data)
+                try:
+                    conn.send_bytes(json.dumps(reply).encode("utf-8"))
+                except (OSError, ValueError):
+                    return
+
+    def dispatch(self, data):
+        """bytes request -> dict reply {"ok": true, "result": ...} hoặc {"ok": false, "error": ...}."""
+        self.stats["requests"] += 1
+        try:
+            args = json.loads(data)
+            handler = self.handlers.get(args.pop("op", None))
+            if handler is None:
+                raise ValueError("unknown op")
+            return {"ok": True, "result": handler(**args)}
+        except Exception as e:
+            self.stats["errors"] += 1
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""Spool sự kiện cảnh báo trên đĩa: hook chỉ ghi 1 file nhỏ rồi thoát, agent gửi email ở nền.
+
+Hook (git pre-push...) không được chờ SMTP: write_event() ghi <spool>/<ns>-<pid>.evt (ghi .tmp rồi
+os.replace nên agent không bao giờ đọc file dở), mỗi dòng "key value". Module chỉ dùng os/time để hook
+chạy bằng python -S -E vẫn import được.
+
+Agent: AlertSpool quét thư mục mỗi interval giây, "claim" từng file bằng rename (.evt -> .sending) nên
+agent thường trú và lệnh drain 1 lần (--drain-alert-spool) chạy cùng lúc cũng không gửi trùng.
+Gửi lỗi -> trả file về .evt, thử lại với backoff; quá MAX_ATTEMPTS hoặc quá cũ -> đổi thành .failed.
+Agent ghi heartbeat (<spool>/.agent) để hook biết có cần tự bật drain 1 lần hay không.
+"""
+from __future__ import annotations
+import os
+import time
+
+EVENT_SUFFIX = ".evt"
+SENDING_SUFFIX = ".sending"
+FAILED_SUFFIX = ".failed"
+HEARTBEAT_FILE = ".agent"
+HEARTBEAT_INTERVAL = 10.0
+HEARTBEAT_STALE = 30.0          # Heartbeat cũ hơn -> coi như agent không chạy
+ORPHAN_AGE = 600.0              # .sending/.tmp bỏ dở lâu hơn (drainer bị kill) -> lấy lại
+MAX_ATTEMPTS = 20
+MAX_BACKOFF = 300.0
+MAX_EVENT_AGE = 7 * 24 * 3600
+
+
+def write_event(spool_dir, **fields):
+    """Ghi 1 sự kiện, trả về đường dẫn file. Chỉ chạm đĩa cục bộ - không mạng, không subprocess."""
+    os.makedirs(spool_dir, exist_ok=True)
+    fields.setdefault("time", f"{time.time():.3f}")
+    name = f"{time.time_ns()}-{os.getpid()}"
+    tmp = os.path.join(spool_dir, name + ".tmp")
+    path = os.path.join(spool_dir, name + EVENT_SUFFIX)
+    with open(tmp, "w", encoding="utf-8") as f:
+        for key, value in fields.items():
+            f.write(f"{key} {' '.join(str(value).split())}\n")   # Giá trị 1 dòng
+    os.replace(tmp, path)
+    return path
+
+
+def read_event(path):
+    """-> dict key -> value. utf-8-sig: file do PowerShell (Set-Content -Encoding UTF8) ghi có BOM."""
+    event = {}
+    with open(path, encoding="utf-8-sig", errors="replace") as f:
+        for line in f:
+            key, _, value = line.rstrip("\r\n").partition(" ")
+            if key:
+                event[key] = value
+    return event
+
+
+def agent_alive(spool_dir, stale=HEARTBEAT_STALE):
+    try:
+        return time.time() - os.stat(os.path.join(spool_dir, HEARTBEAT_FILE)).st_mtime < stale
+    except OSError:
+        return False
+
+
+class AlertSpool:
+    """handler(event) -> True khi đã xử lý xong (xóa file), False để thử lại sau."""
+
+    def __init__(self, spool_dir, handler, interval=1.0, heartbeat=True, name="alert_spool"):
+        self.spool_dir = spool_dir
+        self.handler = handler
+        self.interval = interval
+        self.heartbeat = heartbeat
+        self.name = name
+        self._retry = {}        # tên file -> (số lần lỗi, thời điểm được thử lại)
+        self._last_heartbeat = 0.0
+        self._stop = None
+        self._thread = None
+        self.stats = {"sent": 0, "retried": 0, "failed": 0}
+
+    def start(self):
+        import threading
+        if self._thread is None:
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._stop is not None:
+            self._stop.set()
+
+    def touch_heartbeat(self, force=False):
+        now = time.time()
+        if not force and now - self._last_heartbeat < HEARTBEAT_INTERVAL:
+            return
+        self._last_heartbeat = now
+        try:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            with open(os.path.join(self.spool_dir, HEARTBEAT_FILE), "w") as f:
+                f.write(str(os.getpid()))
+        except OSError:
+            pass
+
+    def _recover_orphans(self, names, now):
+        """File .sending/.tmp của drainer đã chết: trả .sending về hàng đợi, bỏ .tmp."""
+        for name in names:
+            if not (name.endswith(SENDING_SUFFIX) or name.endswith(".tmp")):
+                continue
+            path = os.path.join(self.spool_dir, name)
+            try:
+                if now - os.stat(path).st_mtime < ORPHAN_AGE:
+                    continue
+                if name.endswith(".tmp"):
+                    os.remove(path)
+                else:
+                    os.replace(path, path[: -len(SENDING_SUFFIX)].rsplit(".", 1)[0])   # <name>.evt.<pid>.sending
+            except OSError:
+                pass
+
+    def drain(self):
+        """Xử lý mọi sự kiện đến hạn, trả về số sự kiện đã gửi xong."""
+        try:
+            names = sorted(os.listdir(self.spool_dir))
+        except OSError:
+            return 0
+        now = time.time()
+        self._recover_orphans(names, now)
+        done = 0
+        for name in names:
+            if not name.endswith(EVENT_SUFFIX):
+                continue
+            attempts, due = self._retry.get(name, (0, 0.0))
+            if due > now:
+                continue
+            path = os.path.join(self.spool_dir, name)
+            claimed = f"{path}.{os.getpid()}{SENDING_SUFFIX}"
+            try:
+                os.replace(path, claimed)   # Drainer khác đã lấy -> FileNotFoundError
+                os.utime(claimed)           # mtime = lúc claim, không thì _recover_orphans coi là bỏ dở
+            except OSError:
+                self._retry.pop(name, None)
+                continue
+            try:
+                event = read_event(claimed)
+                ok = bool(self.handler(event))
+            except Exception as e:
+                print(f"⚠️ [{self.name}] handler error: {e}")
+                event, ok = {}, False
+            if ok:
+                self._retry.pop(name, None)
+                self.stats["sent"] += 1
+                done += 1
+                try: os.remove(claimed)
+                except OSError: pass
+                continue
+            attempts += 1
+            try:
+                age = now - float(event.get("time") or now)
+            except ValueError:
+                age = 0
+            if attempts >= MAX_ATTEMPTS or age > MAX_EVENT_AGE:
+                self._retry.pop(name, None)
+                self.stats["failed"] += 1
+                target = path[: -len(EVENT_SUFFIX)] + FAILED_SUFFIX
+            else:
+                self._retry[name] = (attempts, now + min(MAX_BACKOFF, 2 ** attempts))
+                self.stats["retried"] += 1
+                target = path
+            try: os.replace(claimed, target)
+            except OSError: pass
+        return done
+
+    def _run(self):
+        last_mtime = None
+        while True:
+            if self.heartbeat:
+                self.touch_heartbeat()
+            # Chỉ listdir khi thư mục đổi (có file mới/rename) hoặc đang có sự kiện chờ thử lại
+            try:
+                mtime = os.stat(self.spool_dir).st_mtime_ns
+            except OSError:
+                mtime = None
+            if mtime != last_mtime or self._retry:
+                last_mtime = mtime
+                try:
+                    self.drain()
+                except Exception as e:
+                    print(f"⚠️ [{self.name}] drain error: {e}")
+            if self._stop.wait(self.interval):
+                break
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""Benchmark hook pre-push khi nhờ agent quét (agent_ipc) so với tự quét, trên repo tạm vài file mới.
+
+Hook chạy thật như git gọi (python -S -E git_hook_check.py --scan, stdin = dòng ref), HOME tạm cho cả hook và
+agent (socket + verdict DB riêng). Mỗi vòng đổi nội dung 1 file để luôn có blob chưa có verdict.
+
+    python bench_agent_ipc.py --runs 20 --files 20
+"""
+from __future__ import annotations
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PROSE = "The quarterly review covers hiring, budget and the roadmap for next year. "
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def git(repo, *args):
+    return subprocess.run(["git", "-C", repo] + list(args), check=True, capture_output=True).stdout
+
+
+def commit_round(repo, files, n):
+    """Sửa file n % files, commit -> dòng ref cho pre-push (push toàn bộ lịch sử lên remote trống)."""
+    with open(os.path.join(repo, f"note_{n % files}.md"), "w", encoding="utf-8") as f:
+        f.write(f"Round {n}. " + PROSE * 20)
+    git(repo, "commit", "-qam", f"round {n}")
+    head = git(repo, "rev-parse", "HEAD").decode().strip()
+    return f"refs/heads/main {head} refs/heads/main {'0' * len(head)}\n"
+
+
+def run_hook(repo, env, stdin):
+    start = time.perf_counter()
+    checker = os.path.join(HERE, "git_hook_check.py")
+    proc = subprocess.run([sys.executable, "-S", "-E", checker, "--scan", "bench", "bench"],
+                          cwd=repo, env=env, input=stdin, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise SystemExit(f"hook rejected a text-only push: {proc.stderr}")
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--files", type=int, default=20)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="dlp_ipc_bench_")
+    home = os.path.join(root, "home")
+    os.makedirs(home)
+    env = dict(os.environ, HOME=home, GIT_AUTHOR_NAME="bench", GIT_AUTHOR_EMAIL="b@b",
+               GIT_COMMITTER_NAME="bench", GIT_COMMITTER_EMAIL="b@b")
+    os.environ.update(env)   # Agent trong process này dùng cùng HOME (địa chỉ socket, verdict DB)
+    sys.path.insert(0, HERE)
+    from agent_ipc import AgentServer, default_address
+    from push_scanner import DEFAULT_DB_PATH, PUSH_VERDICTS, agent_handlers
+    from verdict_store import VerdictStore
+
+    repo = os.path.join(root, "repo")
+    git(root, "init", "-q", "-b", "main", repo)
+    for i in range(args.files):
+        with open(os.path.join(repo, f"note_{i}.md"), "w", encoding="utf-8") as f:
+            f.write(f"Note {i}. " + PROSE * 20)
+    git(repo, "add", "-A")
+    git(repo, "commit", "-qm", "initial")
+
+    try:
+        n = 0
+        local = []
+        for _ in range(args.runs + 1):
+            n += 1
+            local.append(run_hook(repo, env, commit_round(repo, args.files, n)))
+        store = VerdictStore(os.path.join(home, os.path.basename(DEFAULT_DB_PATH)), verdicts=PUSH_VERDICTS)
+        server = AgentServer(agent_handlers(store), address=default_address(), name="bench_ipc").start()
+        agent = []
+        for _ in range(args.runs + 1):
+            n += 1
+            agent.append(run_hook(repo, env, commit_round(repo, args.files, n)))
+        server.stop()
+        print(f"hook tự quét   p50={percentile(local[1:], 50):6.1f}ms p95={percentile(local[1:], 95):6.1f}ms")
+        print(f"hook nhờ agent p50={percentile(agent[1:], 50):6.1f}ms p95={percentile(agent[1:], 95):6.1f}ms "
+              f"(requests={server.stats['requests']}, errors={server.stats['errors']})")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
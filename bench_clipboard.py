@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""Benchmark pipeline block/restore của agent thật (dlp_agent_mac_email) trên MemoryClipboardBackend, headless.
+
+Import agent như thư viện, thay CLIPBOARD bằng MemoryClipboardBackend và client Azure bằng LLM giả có độ trễ;
+còn lại là code agent: handle_switch (đọc + xóa clipboard) -> CLASSIFIER (heuristic, cache, VerdictStore,
+single-flight) -> apply_verdict (TEXT thì restore). HOME tạm để VerdictStore/HoldStore không đụng dữ liệu thật.
+
+    python bench_clipboard.py --copies 200 --llm-latency 0.4 --read-latency 0.002 --prefetch
+"""
+from __future__ import annotations
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+from types import SimpleNamespace
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TARGET_APP = "BenchTarget"    # Không thuộc ALLOWED_APPS/BROWSER_APPS -> nhánh block của handle_switch
+
+CODE_SNIPPET = "def load(path):\n    with open(path) as f:\n        return json.load(f)\n"
+TEXT_SNIPPET = "Meeting moved to Thursday. Please bring the quarterly report and the updated slides.\n"
+MIXED_SNIPPET = "Call foo(bar) with retry_count = {id} then check output.log"  # Heuristic UNSURE -> LLM
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+class FakeLLM:
+    """Thế chỗ OpenAI client trả về từ LLM_CLIENT.get(): chat.completions.create ngủ latency giây."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, messages, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        content = messages[-1]["content"]
+        verdict = "CODE" if "def " in content or "{" in content else "TEXT"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=verdict))])
+
+
+def load_agent(home):
+    """Import dlp_agent_mac_email với HOME tạm (đường dẫn ~ được tính lúc import).
+
+    Biến môi trường đặt trước load_dotenv nên .env không ghi đè: EMAIL_* rỗng -> không bao giờ gửi email thật.
+    """
+    os.environ.update(HOME=home, DLP_HOLD_SPILL_DIR="", EMAIL_SENDER="", EMAIL_PASSWORD="", EMAIL_RECEIVER="",
+                      AZURE_INFERENCE_KEY=os.environ.get("AZURE_INFERENCE_KEY") or "bench")
+    sys.path.insert(0, HERE)
+    import dlp_agent_mac_email as agent
+    return agent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--copies", type=int, default=100)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="giây cho mỗi lần gọi LLM giả")
+    parser.add_argument("--read-latency", type=float, default=0.001, help="giây cho mỗi lần đọc clipboard")
+    parser.add_argument("--write-latency", type=float, default=0.001)
+    parser.add_argument("--dwell", type=float, default=0.5, help="giây user ở app nguồn trước khi chuyển app")
+    parser.add_argument("--prefetch", action="store_true", help="bật phân loại lúc copy (ClipboardPrefetcher)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    home = tempfile.mkdtemp(prefix="dlp_clip_bench_")
+    try:
+        agent = load_agent(home)
+        from clipboard_backend import MemoryClipboardBackend
+        from clipboard_prefetch import ClipboardPrefetcher
+
+        backend = MemoryClipboardBackend(latency={"read": args.read_latency, "write": args.write_latency,
+                                                  "clear": args.write_latency})
+        agent.CLIPBOARD = backend
+        llm = FakeLLM(args.llm_latency)
+        agent.LLM_CLIENT.get = lambda: llm
+        agent.show_alert = lambda *a, **k: None   # Cảnh báo CODE là UI, không thuộc phần đo
+
+        applied = threading.Event()
+        apply_verdict = agent.apply_verdict
+
+        def apply_and_signal(generation, verdict):
+            apply_verdict(generation, verdict)
+            applied.set()
+
+        agent.apply_verdict = apply_and_signal
+        if args.prefetch:
+            ClipboardPrefetcher(backend.change_count, agent.peek_clipboard, agent.prefetch_verdict,
+                                fingerprint=agent.get_content_hash, interval=0.05, settle=0.02).start()
+
+        rnd = random.Random(args.seed)
+        block_ms, verdict_ms = [], []
+        for i in range(args.copies):
+            snippet = rnd.choice((CODE_SNIPPET, TEXT_SNIPPET, MIXED_SNIPPET.format(id=i)))
+            agent.STATE["current_app"] = "BenchSource"
+            backend.copy("text", snippet)
+            time.sleep(args.dwell)
+            applied.clear()
+            generation = agent.STATE["clipboard_generation"]
+            agent.STATE["current_app"] = TARGET_APP
+            start = time.perf_counter()
+            agent.handle_switch(TARGET_APP)
+            blocked = time.perf_counter()
+            # Nội dung đã biết là TEXT (safe_hash) được restore ngay trong handle_switch, không qua CLASSIFIER
+            if agent.STATE["clipboard_generation"] != generation and not applied.wait(agent.CLASSIFY_DEADLINE + 1):
+                continue
+            done = time.perf_counter()
+            block_ms.append((blocked - start) * 1000)
+            verdict_ms.append((done - start) * 1000)
+
+        print(f"agent=dlp_agent_mac_email backend={backend.name} copies={args.copies} prefetch={args.prefetch} "
+              f"llm_calls={llm.calls}")
+        print(f"block    p50={percentile(block_ms, 50):.2f}ms p95={percentile(block_ms, 95):.2f}ms")
+        print(f"verdict  p50={percentile(verdict_ms, 50):.2f}ms p95={percentile(verdict_ms, 95):.2f}ms")
+        print(f"backend calls: {backend.calls}")
+        print(f"classifier: {agent.CLASSIFIER.stats}")
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""Benchmark thời gian khởi động của git_hook_check.py (pre-push hook) với ngân sách cứng.
+
+Chạy hook N lần trong 1 HOOKS_DIR tạm (giống cách agent cài), đo wall time từng lần;
+median vượt --budget-ms -> exit 1. Đồng thời liệt kê module bị import để bắt import nặng lọt vào.
+
+    python bench_hook_startup.py --runs 30 --budget-ms 50
+"""
+from __future__ import annotations
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# Module không được phép xuất hiện trên đường "push được phép"
+FORBIDDEN = ("tkinter", "PIL", "openai", "psutil", "pyperclip", "dotenv", "win32api", "subprocess", "json")
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run_hook(python, checker, url):
+    start = time.perf_counter()
+    proc = subprocess.run([python, "-S", "-E", checker, "origin", url],
+                          stdin=subprocess.DEVNULL, capture_output=True, text=True)
+    return (time.perf_counter() - start) * 1000, proc.returncode
+
+
+def imported_modules(python, checker, url):
+    proc = subprocess.run([python, "-S", "-E", "-X", "importtime", checker, "origin", url],
+                          stdin=subprocess.DEVNULL, capture_output=True, text=True)
+    names = []
+    for line in proc.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            name = line.rsplit("|", 1)[1].strip()
+            if name != "imported package":
+                names.append(name)
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--budget-ms", type=float, default=50.0)
+    parser.add_argument("--python", default=sys.executable)
+    parser.add_argument("--allowed-url", default="git@gitlab.siguna.co:team/project.git")
+    args = parser.parse_args()
+
+    hooks_dir = tempfile.mkdtemp(prefix="dlp_hooks_")
+    try:
+        checker = os.path.join(hooks_dir, "git_hook_check.py")
+        shutil.copyfile(os.path.join(HERE, "git_hook_check.py"), checker)
+        with open(os.path.join(hooks_dir, "hook_policy.txt"), "w", encoding="utf-8") as f:
+            f.write("allow gitlab.siguna.co\nallow mycompany.internal\n")
+
+        # Lần đầu làm nóng cache đĩa/pyc, không tính
+        run_hook(args.python, checker, args.allowed_url)
+        baseline = [run_hook(args.python, "-c", "pass")[0] for _ in range(max(5, args.runs // 3))]
+        timings = []
+        for _ in range(args.runs):
+            ms, code = run_hook(args.python, checker, args.allowed_url)
+            if code != 0:
+                raise SystemExit(f"hook rejected allowed url (exit {code})")
+            timings.append(ms)
+        _, blocked_code = run_hook(args.python, checker, "https://github.com/someone/leak.git")
+        if blocked_code != 1:
+            raise SystemExit(f"hook did not block external url (exit {blocked_code})")
+
+        modules = imported_modules(args.python, checker, args.allowed_url)
+        leaked = sorted({m for m in modules if m.split(".")[0] in FORBIDDEN})
+    finally:
+        shutil.rmtree(hooks_dir, ignore_errors=True)
+
+    p50, p95 = percentile(timings, 50), percentile(timings, 95)
+    print(f"python -S -E -c pass  p50={percentile(baseline, 50):.1f}ms")
+    print(f"git_hook_check.py     p50={p50:.1f}ms p95={p95:.1f}ms budget={args.budget_ms:.0f}ms")
+    print(f"modules imported: {len(modules)}" + (f" (forbidden: {', '.join(leaked)})" if leaked else ""))
+    if leaked or p50 > args.budget_ms:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
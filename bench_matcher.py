@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""Microbenchmark: vòng lặp policy cũ của smart killer so với policy_matcher (chạy được trên mọi OS).
+
+    python bench_matcher.py --processes 400 --windows 60 --rounds 200
+"""
+from __future__ import annotations
+import time
+import random
+import argparse
+
+from policy_matcher import EXACT, PatternSet, ProcessPolicy
+
+BANNED_APPS_MAC = ["Screenshot", "Grab", "Skitch", "Lightshot", "Gyazo",
+                   "screencapture", "Snippets", "CleanShot X", "Monosnap", "Snip"]
+BANNED_APPS_WINDOWS = ["SnippingTool.exe", "Lightshot.exe", "ShareX.exe", "Greenshot.exe",
+                       "ScreenSketch.exe", "Gyazo.exe", "screencapture.exe"]
+BANNED_WINDOW_TITLES = ["Snipping Tool", "Lightshot", "ShareX", "Greenshot", "Snip & Sketch", "Gyazo"]
+
+NORMAL_NAMES = ["Finder", "Safari", "Code Helper (Renderer)", "launchd", "WindowServer", "mdworker_shared",
+                "Slack Helper", "zsh", "node", "python3.11", "Google Chrome Helper", "cloudd", "distnoted"]
+NORMAL_TITLES = ["main.py - project - Visual Studio Code", "Inbox - Outlook", "Slack | general",
+                 "Untitled - Notepad", "GitHub - Google Chrome", "Windows PowerShell", "Task Manager"]
+
+
+# --- Logic cũ, chép nguyên từ dlp_agent_mac_email / dlp_agent_win để so sánh ---
+def legacy_mac(name, exe, cmdline):
+    p_name = name.lower() if name else ""
+    p_exe = exe.lower() if exe else ""
+    for banned in BANNED_APPS_MAC:
+        b_key = banned.lower()
+        if b_key in p_name or b_key in p_exe:
+            return True
+        if cmdline:
+            first_arg = cmdline[0].lower()
+            if b_key in first_arg:
+                if "electron" in first_arg or "node" in first_arg or "python" in first_arg:
+                    continue
+                return True
+    return False
+
+
+def legacy_win_name(name):
+    name = name or ""
+    return any(banned.lower() == name.lower() for banned in BANNED_APPS_WINDOWS)
+
+
+def legacy_win_title(title):
+    return any(banned.lower() in title.lower() for banned in BANNED_WINDOW_TITLES)
+
+
+def make_processes(n, rnd):
+    procs = []
+    for i in range(n):
+        if rnd.random() < 0.02:
+            name = rnd.choice(BANNED_APPS_MAC)
+        else:
+            name = rnd.choice(NORMAL_NAMES)
+        exe = f"/Applications/{name}.app/Contents/MacOS/{name}"
+        cmdline = [exe, f"--type=renderer-{i}"] if rnd.random() < 0.7 else [f"/usr/bin/python3 {name}.py"]
+        procs.append((name, exe, cmdline))
+    return procs
+
+
+def timed(fn, items, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        decisions = [bool(fn(*item)) for item in items]
+    elapsed = time.perf_counter() - start
+    return decisions, elapsed / (rounds * len(items)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=400)
+    parser.add_argument("--windows", type=int, default=60)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rnd = random.Random(args.seed)
+
+    procs = make_processes(args.processes, rnd)
+    titles = [(rnd.choice(BANNED_WINDOW_TITLES + NORMAL_TITLES * 6) + f" #{i}",) for i in range(args.windows)]
+    names = [(rnd.choice(BANNED_APPS_WINDOWS + [n + ".exe" for n in NORMAL_NAMES] * 4),) for _ in range(args.processes)]
+
+    policy = ProcessPolicy(BANNED_APPS_MAC)
+    name_matcher = PatternSet(BANNED_APPS_WINDOWS, mode=EXACT)
+    title_matcher = PatternSet(BANNED_WINDOW_TITLES)
+
+    for label, legacy, compiled, items in (
+        ("mac process", legacy_mac, policy.match, procs),
+        ("win name", legacy_win_name, name_matcher.match, names),
+        ("win title", legacy_win_title, title_matcher.match, titles),
+    ):
+        old, old_us = timed(legacy, items, args.rounds)
+        new, new_us = timed(compiled, items, args.rounds)
+        if old != new:
+            raise SystemExit(f"{label}: matcher disagrees with legacy loop")
+        print(f"{label:12s} items={len(items):4d} matched={sum(new):3d} "
+              f"legacy={old_us:.2f}us/item matcher={new_us:.2f}us/item speedup={old_us / new_us:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
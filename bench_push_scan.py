@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""Benchmark push_scanner trên repo tạm N file: lần đầu (cache lạnh), push lại, rebase (chỉ vài blob mới).
+
+    python bench_push_scan.py --files 5000 --workers 4
+"""
+from __future__ import annotations
+import os
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+from push_scanner import PushScanner, PUSH_VERDICTS
+from verdict_store import VerdictStore
+
+PROSE = ("The quarterly review covers hiring, budget and the roadmap for next year. "
+         "Please read the notes before the meeting and send comments to the team lead. ")
+CODE_TEMPLATE = "def handler_{i}(request):\n    value = request.get('id_{i}')\n    if value is None:\n        return {{}}\n    return {{'id': value, 'n': {i}}}\n\n"
+
+
+def git(repo, *args, **kwargs):
+    env = dict(os.environ, GIT_AUTHOR_NAME="bench", GIT_AUTHOR_EMAIL="b@b",
+               GIT_COMMITTER_NAME="bench", GIT_COMMITTER_EMAIL="b@b")
+    return subprocess.run(["git", "-C", repo] + list(args), check=True, capture_output=True, env=env, **kwargs).stdout
+
+
+def make_repo(root, files, code_ratio, rnd):
+    repo = os.path.join(root, "repo")
+    git(root, "init", "-q", "-b", "main", repo)
+    for i in range(files):
+        is_code = rnd.random() < code_ratio
+        name = f"src/mod_{i}.py" if is_code else f"docs/note_{i}.md"
+        path = os.path.join(repo, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            if is_code:
+                f.write("".join(CODE_TEMPLATE.format(i=i * 100 + k) for k in range(rnd.randint(1, 40))))
+            else:
+                f.write(f"Note {i}. " + PROSE * rnd.randint(1, 60))
+    git(repo, "add", "-A")
+    git(repo, "commit", "-qm", "initial")
+    return repo
+
+
+def timed_scan(scanner, updates):
+    start = time.perf_counter()
+    allowed, offending = scanner.check(updates)
+    return (time.perf_counter() - start) * 1000, allowed, len(offending)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=5000)
+    parser.add_argument("--code-ratio", type=float, default=0.3)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rnd = random.Random(args.seed)
+
+    root = tempfile.mkdtemp(prefix="dlp_push_bench_")
+    try:
+        repo = make_repo(root, args.files, args.code_ratio, rnd)
+        head = git(repo, "rev-parse", "HEAD").decode().strip()
+        zero = "0" * len(head)
+        updates = [("refs/heads/main", head, "refs/heads/main", zero)]
+
+        for workers in sorted({1, args.workers}):
+            store = VerdictStore(os.path.join(root, f"verdicts_{workers}.db"), verdicts=PUSH_VERDICTS)
+            scanner = PushScanner(store=store, workers=workers, cwd=repo)
+            ms, allowed, bad = timed_scan(scanner, updates)
+            print(f"cold   workers={workers:2d} blobs={scanner.stats['blobs']:6d} "
+                  f"scanned={scanner.stats['scanned']:6d} non-text={bad:6d} {ms:8.1f}ms")
+
+        ms, _, _ = timed_scan(scanner, updates)
+        print(f"re-push             blobs={scanner.stats['blobs']:6d} cached={scanner.stats['cached']:6d} {ms:8.1f}ms")
+
+        # "Rebase": sửa 5 file, commit mới trên cùng lịch sử -> chỉ 5 blob chưa có verdict
+        for i in range(5):
+            with open(os.path.join(repo, "docs", f"extra_{i}.md"), "w", encoding="utf-8") as f:
+                f.write(PROSE * 3 + str(i))
+        git(repo, "add", "-A")
+        git(repo, "commit", "-qm", "rebased")
+        head = git(repo, "rev-parse", "HEAD").decode().strip()
+        ms, _, _ = timed_scan(scanner, [("refs/heads/main", head, "refs/heads/main", zero)])
+        print(f"rebase              blobs={scanner.stats['blobs']:6d} scanned={scanner.stats['scanned']:6d} {ms:8.1f}ms")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
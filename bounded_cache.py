@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""Cache trong bộ nhớ có giới hạn (LRU + TTL + ngân sách byte) dùng chung cho các agent."""
+from __future__ import annotations
+import sys
+import time
+import threading
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+def _estimate_size(key, value):
+    """Ước lượng kích thước 1 entry (key hash + verdict là chuỗi ngắn nên getsizeof là đủ)."""
+    return sys.getsizeof(key) + sys.getsizeof(value) + 64  # + overhead node OrderedDict
+
+
+class BoundedCache:
+    """Dict/set thread-safe với LRU + TTL, mọi thao tác O(1).
+
+    Dùng như dict (cache[k] = v, cache.get(k), k in cache) hoặc như set (add/discard).
+    """
+
+    def __init__(self, max_entries=5000, max_bytes=1024 * 1024, ttl=None, name="cache"):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.name = name
+        self._data = OrderedDict()  # key -> (value, expires_at, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    # --- nội bộ (gọi khi đang giữ lock) ---
+    def _lookup(self, key):
+        item = self._data.get(key)
+        if item is None:
+            return _MISSING
+        value, expires_at, size = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            self._bytes -= size
+            self.expirations += 1
+            return _MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def _evict(self):
+        while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, _, size) = self._data.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+    # --- API kiểu dict ---
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._lookup(key)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        size = _estimate_size(key, value)
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._data[key] = (value, expires_at, size)
+            self._bytes += size
+            self._evict()
+
+    def __setitem__(self, key, value):
+        self.put(key, value)
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._lookup(key) is not _MISSING
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+            if item is None:
+                return default
+            self._bytes -= item[2]
+            return item[0]
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    # --- API kiểu set (warned_hashes) ---
+    def add(self, key):
+        self.put(key, True)
+
+    def discard(self, key):
+        self.pop(key)
+
+    def stats(self):
+        """Counter cho log/metric: hit/miss/eviction/expiration + dung lượng hiện tại."""
+        with self._lock:
+            return {
+                "name": self.name,
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
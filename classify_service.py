@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""Service phân loại chạy trên asyncio: mỗi request có deadline, request cũ bị hủy khi clipboard có generation mới."""
+from __future__ import annotations
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Chính sách khi hết deadline mà chưa có verdict
+DEADLINE_CODE = "CODE"   # Fail-closed: coi như CODE (giống khi LLM lỗi)
+DEADLINE_TEXT = "TEXT"   # Fail-open: coi như TEXT, trả clipboard
+DEADLINE_HOLD = "HOLD"   # Giữ nguyên trạng thái đang chặn, không áp verdict nào
+DEADLINE_POLICIES = (DEADLINE_CODE, DEADLINE_TEXT, DEADLINE_HOLD)
+MAX_WORKERS = 4
+
+
+class _Saturated(Exception):
+    """Mọi worker đều đang chạy (thường là call Azure treo đã bị bỏ) - không xếp hàng sau chúng."""
+
+
+class ClassificationService:
+    """Event loop riêng trong 1 daemon thread; các thread khác gọi submit() (không block).
+
+    classify_fn chạy trong thread pool tối đa max_workers thread (I/O blocking: đọc file, gọi Azure), apply_fn
+    chỉ được gọi khi request vẫn là generation mới nhất - verdict cũ không bao giờ ghi đè STATE.
+    Hết deadline thì bỏ call đó (worker chạy nốt tới timeout của LLMClientPool rồi ghi cache). Hết worker rảnh
+    thì từ chối ngay và áp deadline_policy thay vì xếp hàng sau các call treo: số thread luôn bị chặn trên.
+    """
+
+    def __init__(self, deadline=8.0, deadline_policy=DEADLINE_CODE, max_workers=MAX_WORKERS):
+        if deadline_policy not in DEADLINE_POLICIES:
+            deadline_policy = DEADLINE_CODE
+        self.deadline = deadline
+        self.deadline_policy = deadline_policy
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="classify")
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._loop = None
+        self._thread = None
+        self._started = threading.Event()
+        self._tasks = {}  # generation -> asyncio.Task
+        self._latest_generation = 0
+        self._lock = threading.Lock()
+        self.inflight = 0   # classify_fn đang chạy, kể cả các call đã bị bỏ vì hết deadline
+        self.stats = {"submitted": 0, "applied": 0, "cancelled": 0, "stale_dropped": 0, "deadline_expired": 0,
+                      "rejected": 0}
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run_loop, name="classify-loop", daemon=True)
+        self._thread.start()
+        self._started.wait()
+
+    def _run_loop(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._started.set()
+        self._loop.run_forever()
+
+    def is_current(self, generation):
+        return generation == self._latest_generation
+
+    def submit(self, generation, classify_fn, apply_fn, *args, deadline=None):
+        """Gửi request cho generation; mọi request generation cũ hơn bị hủy ngay."""
+        self.start()
+        with self._lock:
+            self.stats["submitted"] += 1
+            if generation > self._latest_generation:
+                self._latest_generation = generation
+        self._loop.call_soon_threadsafe(self._schedule, generation, classify_fn, apply_fn, args,
+                                         deadline or self.deadline)
+
+    def _run_bounded(self, fn, *args):
+        """fn(*args) trên executor -> asyncio future; không còn worker rảnh -> _Saturated."""
+        if not self._slots.acquire(blocking=False):
+            raise _Saturated()
+
+        def run():
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self.inflight -= 1
+                self._slots.release()
+
+        with self._lock:
+            self.inflight += 1
+        try:
+            return asyncio.wrap_future(self._executor.submit(run), loop=self._loop)
+        except RuntimeError:   # Executor đã shutdown
+            with self._lock:
+                self.inflight -= 1
+            self._slots.release()
+            raise
+
+    # --- chạy trong thread của event loop ---
+    def _schedule(self, generation, classify_fn, apply_fn, args, deadline):
+        for old_gen, task in list(self._tasks.items()):
+            if old_gen < generation and not task.done():
+                task.cancel()  # Task chưa chạy thì coroutine không bao giờ được gọi -> đếm ở đây
+                self.stats["cancelled"] += 1
+        task = self._loop.create_task(self._handle(generation, classify_fn, apply_fn, args, deadline))
+        self._tasks[generation] = task
+        task.add_done_callback(lambda t, g=generation: self._tasks.pop(g, None))
+
+    async def _handle(self, generation, classify_fn, apply_fn, args, deadline):
+        loop = asyncio.get_running_loop()
+        try:
+            if not self.is_current(generation):
+                self.stats["stale_dropped"] += 1
+                return
+            try:
+                verdict = await asyncio.wait_for(self._run_bounded(classify_fn, *args), deadline)
+            except (asyncio.TimeoutError, _Saturated) as e:
+                if isinstance(e, _Saturated):
+                    self.stats["rejected"] += 1
+                    print(f"   ⏱️ All {self.inflight} classifier workers busy -> policy {self.deadline_policy}")
+                else:
+                    self.stats["deadline_expired"] += 1
+                    print(f"   ⏱️ Classification deadline ({deadline}s) expired -> policy {self.deadline_policy} "
+                          f"({self.inflight} call(s) still running)")
+                if self.deadline_policy == DEADLINE_HOLD:
+                    return
+                verdict = self.deadline_policy
+
+            # Clipboard đã có dữ liệu mới trong lúc chờ -> bỏ verdict cũ
+            if not self.is_current(generation):
+                self.stats["stale_dropped"] += 1
+                return
+            await loop.run_in_executor(None, apply_fn, verdict)
+            self.stats["applied"] += 1
+        except asyncio.CancelledError:
+            pass  # Bị generation mới hủy; thread đang gọi Azure vẫn chạy xong và ghi cache
+        except Exception as e:
+            print(f"   ❌ Classification error: {e}")
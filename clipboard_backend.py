@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""Lớp trừu tượng clipboard: agent chỉ gọi read/write/clear/change_count qua backend.
+
+Backend thật (win32clipboard/ImageGrab/NSPasteboard) được agent bọc bằng CallbackBackend;
+MemoryClipboardBackend là clipboard giả trong RAM (có độ trễ giả lập) để chạy benchmark/load-test trên Linux.
+"""
+from __future__ import annotations
+import abc
+import sys
+import time
+import threading
+
+
+class ClipboardBackend(abc.ABC):
+    """Interface: mỗi item là (d_type, data) với d_type thuộc "text" / "file" / "image"."""
+
+    name = "base"
+
+    @abc.abstractmethod
+    def read(self):
+        """Đọc item hiện tại, KHÔNG xóa. Trả về (None, None) nếu clipboard rỗng."""
+
+    @abc.abstractmethod
+    def write(self, d_type, data):
+        """Ghi item vào clipboard."""
+
+    @abc.abstractmethod
+    def clear(self):
+        """Xóa clipboard."""
+
+    @abc.abstractmethod
+    def change_count(self):
+        """Counter tăng mỗi lần clipboard đổi (NSPasteboard changeCount / GetClipboardSequenceNumber)."""
+
+    def read_and_clear(self):
+        d_type, data = self.read()
+        if data is not None:
+            self.clear()
+        return d_type, data
+
+
+class CallbackBackend(ClipboardBackend):
+    """Bọc các hàm native sẵn có của agent thành 1 backend."""
+
+    def __init__(self, read, write, clear, change_count, name="native"):
+        self._read = read
+        self._write = write
+        self._clear = clear
+        self._change_count = change_count
+        self.name = name
+
+    def read(self):
+        return self._read()
+
+    def write(self, d_type, data):
+        return self._write(d_type, data)
+
+    def clear(self):
+        return self._clear()
+
+    def change_count(self):
+        return self._change_count()
+
+
+class MemoryClipboardBackend(ClipboardBackend):
+    """Clipboard giả trong RAM, tất định: mọi thao tác ghi tăng counter, độ trễ cấu hình theo từng thao tác.
+
+    latency = {"read": s, "write": s, "clear": s, "change_count": s} (giây, mặc định 0) để mô phỏng
+    chi phí OpenClipboard/ImageGrab/NSPasteboard khi đo pipeline block/restore.
+    """
+
+    name = "memory"
+
+    def __init__(self, latency=None, sleep=time.sleep):
+        self.latency = dict(latency or {})
+        self._sleep = sleep
+        self._item = (None, None)
+        self._count = 0
+        self._lock = threading.Lock()
+        self.calls = {"read": 0, "write": 0, "clear": 0, "change_count": 0}
+
+    def _cost(self, op):
+        self.calls[op] += 1
+        delay = self.latency.get(op, 0)
+        if delay:
+            self._sleep(delay)
+
+    def read(self):
+        self._cost("read")
+        with self._lock:
+            return self._item
+
+    def write(self, d_type, data):
+        self._cost("write")
+        if not data:
+            return
+        with self._lock:
+            self._item = (d_type, data)
+            self._count += 1
+
+    def clear(self):
+        self._cost("clear")
+        with self._lock:
+            self._item = (None, None)
+            self._count += 1
+
+    def change_count(self):
+        self._cost("change_count")
+        with self._lock:
+            return self._count
+
+    def copy(self, d_type, data):
+        """Mô phỏng user copy ở app nguồn (không tính vào calls của agent)."""
+        with self._lock:
+            self._item = (d_type, data)
+            self._count += 1
+
+
+def native_change_counter():
+    """Hàm đọc counter của OS: NSPasteboard changeCount (macOS) / GetClipboardSequenceNumber (Windows).
+
+    Trả về None nếu không có (Linux, thiếu pyobjc) - caller khi đó đọc clipboard mỗi vòng như cũ.
+    """
+    if sys.platform == "darwin":
+        try:
+            from AppKit import NSPasteboard
+        except ImportError:
+            return None
+        pb = NSPasteboard.generalPasteboard()
+        return lambda: pb.changeCount()
+    if sys.platform == "win32":
+        import ctypes
+        get_seq = ctypes.windll.user32.GetClipboardSequenceNumber
+        return lambda: get_seq() or None  # 0 = lỗi/không có quyền
+    return None
+
+
+class ChangeGate:
+    """Chặn trước vòng poll: chỉ cho đọc + strip + hash clipboard khi counter đã đổi.
+
+    change_count trả None (hoặc lỗi) -> coi như đã đổi, không bao giờ bỏ sót thay đổi.
+    """
+
+    def __init__(self, change_count=None, name="clipboard_gate", log_every=0):
+        self._change_count = change_count
+        self.name = name
+        self.log_every = log_every
+        self._last = None
+        self.polls = 0
+        self.skipped = 0
+        self.fetched = 0
+
+    def changed(self):
+        self.polls += 1
+        count = None
+        if self._change_count is not None:
+            try:
+                count = self._change_count()
+            except Exception:
+                count = None
+        if count is not None and count == self._last:
+            self.skipped += 1
+            changed = False
+        else:
+            self._last = count
+            self.fetched += 1
+            changed = True
+        if self.log_every and self.polls % self.log_every == 0:
+            print(f"📊 [{self.name}] polls={self.polls} skipped={self.skipped} fetched={self.fetched}")
+        return changed
+
+    def stats(self):
+        return {"name": self.name, "polls": self.polls, "skipped": self.skipped, "fetched": self.fetched}
+
+
+class IdempotentRestorer:
+    """Restore kiểu "đảm bảo": nhớ lần ghi cuối (fingerprint + counter) và chỉ ghi lại khi clipboard đã khác.
+
+    Counter chưa đổi -> chắc chắn vẫn là dữ liệu mình ghi, không đọc gì thêm; counter đổi -> đọc lại,
+    so fingerprint, giống thì chỉ cập nhật mốc counter. Nhờ vậy watchdog restore mỗi tick mà clipboard
+    (và change counter) gần như không bị khuấy.
+    """
+
+    _CLEARED = object()
+
+    def __init__(self, write, read, clear, change_count, fingerprint, name="restorer"):
+        self._write = write
+        self._read = read
+        self._clear = clear
+        self._change_count = change_count
+        self._fingerprint = fingerprint
+        self.name = name
+        self._fp = None
+        self._count = None
+        self.stats = {"writes": 0, "clears": 0, "skipped": 0, "verified": 0}
+
+    def _counter(self):
+        try:
+            return self._change_count() or None  # 0 = không đọc được counter (Windows)
+        except Exception:
+            return None
+
+    def _still_holds(self, fp):
+        if self._fp is None or self._fp != fp:
+            return False
+        count = self._counter()
+        if count is not None and count == self._count:
+            self.stats["skipped"] += 1
+            return True
+        d_type, data = self._read()
+        current = self._CLEARED if data is None else self._fingerprint(data)
+        if current == fp:
+            self._count = count
+            self.stats["verified"] += 1
+            return True
+        return False
+
+    def restore(self, d_type, data):
+        """Ghi (d_type, data) nếu clipboard chưa chứa nó. Trả về True nếu đã thực sự ghi."""
+        if not data:
+            return False
+        fp = self._fingerprint(data)
+        if self._still_holds(fp):
+            return False
+        self._write(d_type, data)
+        self._fp, self._count = fp, self._counter()
+        self.stats["writes"] += 1
+        return True
+
+    def clear(self):
+        """Xóa clipboard nếu chưa rỗng (theo cùng cơ chế counter/fingerprint)."""
+        if self._still_holds(self._CLEARED):
+            return False
+        self._clear()
+        self._fp, self._count = self._CLEARED, self._counter()
+        self.stats["clears"] += 1
+        return True
+
+    def invalidate(self):
+        self._fp = self._count = None
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""Phân loại trước lúc copy: theo dõi change counter của clipboard, đọc nội dung mới và gọi classifier
+ngầm ngay khi user còn ở app nguồn - tới lúc chuyển app (handle_switch) verdict thường đã nằm trong cache."""
+from __future__ import annotations
+import time
+import hashlib
+import threading
+
+POLL_INTERVAL = 0.25   # Đọc change counter rất rẻ (1 syscall / 1 message ObjC)
+SETTLE_DELAY = 0.15    # Chờ clipboard ổn định - app hay ghi nhiều lần liên tiếp khi copy
+
+
+def _md5_fingerprint(data):
+    return hashlib.md5(str(data).encode("utf-8", "ignore")).hexdigest()
+
+
+class ClipboardPrefetcher:
+    """Thread daemon: counter đổi -> peek clipboard (không xóa) -> classify_fn(d_type, data).
+
+    classify_fn phải là đường phân loại thật của agent (đi qua llm_cache/VerdictStore/SingleFlight)
+    để kết quả được dùng lại; lỗi của classify_fn bị nuốt, prefetch chỉ là tối ưu.
+    fingerprint(data) nhận diện nội dung đã prefetch - agent truyền hàm hash có chế độ payload lớn.
+    """
+
+    def __init__(self, get_change_count, peek_clipboard, classify_fn,
+                 interval=POLL_INTERVAL, settle=SETTLE_DELAY, types=("text", "file"), name="prefetch",
+                 fingerprint=_md5_fingerprint):
+        self.get_change_count = get_change_count
+        self.peek_clipboard = peek_clipboard
+        self.classify_fn = classify_fn
+        self.interval = interval
+        self.settle = settle
+        self.types = types
+        self.fingerprint = fingerprint
+        self.name = name
+        self._thread = None
+        self._last_count = None
+        self._last_key = None
+        self.stats = {"changes": 0, "prefetched": 0, "skipped": 0, "errors": 0}
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while True:
+            try:
+                self.poll_once()
+            except Exception:
+                self.stats["errors"] += 1
+            time.sleep(self.interval)
+
+    def poll_once(self):
+        """1 vòng poll - tách riêng để gọi trực tiếp được (không cần thread)."""
+        count = self.get_change_count()
+        if count == self._last_count:
+            return False
+        first = self._last_count is None
+        self._last_count = count
+        if first:
+            return False  # Nội dung có sẵn lúc khởi động không phải copy mới
+        self.stats["changes"] += 1
+
+        if self.settle:
+            time.sleep(self.settle)
+            latest = self.get_change_count()
+            if latest != count:
+                return False  # Vẫn đang ghi -> để vòng sau lấy bản cuối
+        d_type, data = self.peek_clipboard()
+        if not data or d_type not in self.types:
+            self.stats["skipped"] += 1
+            return False
+
+        # restore_clipboard/clear của chính agent cũng làm counter đổi -> bỏ qua nội dung đã prefetch
+        key = (d_type, self.fingerprint(data))
+        if key == self._last_key:
+            self.stats["skipped"] += 1
+            return False
+        self._last_key = key
+        try:
+            self.classify_fn(d_type, data)
+            self.stats["prefetched"] += 1
+        except Exception:
+            self.stats["errors"] += 1
+        return True
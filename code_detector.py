@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""Bộ phát hiện CODE/TEXT cục bộ (pure Python) - chỉ đẩy các trường hợp UNSURE lên LLM."""
+from __future__ import annotations
+import re
+from collections import Counter
+
+CODE = "CODE"
+TEXT = "TEXT"
+UNSURE = "UNSURE"
+
+# Chấm điểm theo 2 bước: cửa sổ nhỏ trước, chỉ mở rộng khi chưa chắc chắn (giữ độ trễ < 1ms)
+FIRST_PASS_CHARS = 1500
+MAX_SCAN_CHARS = 4000
+MIN_CHARS = 12
+
+# Ngưỡng quyết định (điểm code - điểm văn bản)
+CODE_THRESHOLD = 6.0
+TEXT_THRESHOLD = -4.0
+
+# ==============================
+#   BẢNG TỪ KHÓA THEO NGÔN NGỮ
+# ==============================
+LANGUAGE_KEYWORDS = {
+    "python": ("def", "elif", "self", "None", "True", "False", "lambda", "yield", "async", "await", "import", "except", "__init__", "print"),
+    "javascript": ("function", "const", "let", "var", "=>", "undefined", "null", "typeof", "require", "export", "console", "async", "await", "this"),
+    "java_csharp": ("public", "private", "protected", "static", "void", "class", "interface", "extends", "implements", "new", "namespace", "using", "throws", "final"),
+    "c_cpp": ("#include", "#define", "int", "char", "struct", "typedef", "sizeof", "malloc", "free", "std", "nullptr", "template", "unsigned"),
+    "go": ("func", "package", "defer", "chan", "go", "struct", "interface", "map", ":=", "nil"),
+    "rust": ("fn", "let", "mut", "impl", "trait", "pub", "crate", "match", "enum", "unwrap", "Option", "Result"),
+    "sql": ("SELECT", "FROM", "WHERE", "INSERT", "UPDATE", "DELETE", "JOIN", "GROUP", "ORDER", "CREATE", "TABLE", "VALUES"),
+    "shell": ("echo", "fi", "then", "esac", "done", "export", "sudo", "grep", "awk", "sed", "chmod", "$("),
+    "php_ruby": ("<?php", "$this", "end", "elsif", "puts", "require_relative", "attr_accessor", "foreach", "echo"),
+}
+
+_KEYWORD_WEIGHTS = {}
+for _words in LANGUAGE_KEYWORDS.values():
+    for _w in _words:
+        _KEYWORD_WEIGHTS[_w] = 1.0
+# Các từ khóa tiếng Anh thông dụng trong văn bản thường -> trọng số thấp
+for _w in ("new", "this", "end", "then", "done", "free", "match", "map", "go", "let", "using", "static", "final", "print"):
+    _KEYWORD_WEIGHTS[_w] = 0.2
+# SQL thường viết hoa, tránh nhầm với câu văn "Select the ... from ..."
+_SQL_WORDS = frozenset(LANGUAGE_KEYWORDS["sql"])
+
+_TOKEN_RE = re.compile(r"#include|#define|<\?php|\$this|\$\(|:=|=>|[A-Za-z_][A-Za-z0-9_]*")
+# Định danh kiểu snake_case / camelCase - hiếm gặp trong văn bản thường
+_IDENT_STYLE_RE = re.compile(r"\b[A-Za-z][A-Za-z0-9]*_[A-Za-z0-9_]+|\b[a-z]+[A-Z][A-Za-z0-9]*")
+
+# Các mẫu đầu dòng gần như chắc chắn là code (gộp thành 1 regex, dùng .match)
+_STRONG_LINE_RE = re.compile(r"\s*(?:" + "|".join([
+    r"(?:def|class)\s+\w+\s*[\(:]",
+    r"import\s+[\w\.]+|from\s+[\w\.]+\s+import\s",
+    r"#include\s*[<\"]",
+    r"(?:public|private|protected)\s+[\w<>\[\], ]+\s+\w+\s*\(",
+    r"function\s+\w*\s*\(|(?:const|let|var)\s+\w+\s*=",
+    r"(?:func|fn)\s+\w+\s*[\(<]",
+    r"package\s+[\w\.]+;?\s*$",
+    r"using\s+[\w\.]+;|namespace\s+[\w\.]+",
+    r"(?i:SELECT|INSERT\s+INTO|UPDATE|DELETE\s+FROM|CREATE\s+TABLE)\b",
+    r"(?i:</?(?:html|div|script|span|body|head|template|\?xml)\b)",
+    r"#!\s*/",
+    r"@\w+(?:\(.*\))?\s*$",
+    r"(?:if|for|while|switch)\s*\(.*\)\s*\{?\s*$",
+]) + ")")
+# Dòng kết thúc bằng "{" sau một lời gọi/khai báo: foo(a, b) {
+_BRACE_CALL_RE = re.compile(r"\w\s*\([^()]*\)\s*\{$")
+
+# Secret / key -> luôn coi là CODE (giống system prompt của LLM)
+_SECRET_HINTS = ("-----begin", "akia", "ghp_", "gho_", "ghu_", "ghs_", "ghr_", "key", "secret", "password", "token")
+_SECRET_RE = re.compile(
+    r"-----BEGIN [A-Z ]*PRIVATE KEY-----|AKIA[0-9A-Z]{16}|gh[pousr]_[A-Za-z0-9]{30,}|"
+    r"\b(api[_-]?key|secret|password|token)\s*[:=]\s*['\"][^'\"\s]{8,}['\"]",
+    re.I,
+)
+
+_SENTENCE_END_RE = re.compile(r"[\.\!\?…]\s+[A-ZÀ-Ỹ]")
+_CODE_SYMBOLS = "{}[]();=<>|&!*/\\$#@_`^%~"
+_NON_LETTER_CHARS = "0123456789\n\t.,:;'\"-?+"
+
+
+def score_text(text: str, limit: int = MAX_SCAN_CHARS) -> float:
+    """Tính điểm: > 0 nghiêng về CODE, < 0 nghiêng về văn bản thường."""
+    sample = text[:limit]
+    lines = [ln for ln in sample.splitlines() if ln.strip()]
+    if not lines:
+        return 0.0
+    n_lines = len(lines)
+    n_chars = len(sample)
+
+    code = 0.0
+    prose = 0.0
+
+    # --- 1. Đặc trưng theo lớp ký tự ---
+    symbols = sum(sample.count(ch) for ch in _CODE_SYMBOLS)
+    spaces = sample.count(" ")
+    # Ước lượng số chữ cái = tổng - ký hiệu - khoảng trắng - chữ số - dấu câu (tránh duyệt từng ký tự)
+    letters = n_chars - symbols - spaces - sum(sample.count(ch) for ch in _NON_LETTER_CHARS)
+    symbol_ratio = symbols / n_chars
+    if symbol_ratio > 0.08:
+        code += min((symbol_ratio - 0.08) * 60, 6.0)
+    elif symbol_ratio < 0.02:
+        prose += 2.0
+    if letters / n_chars > 0.75 and symbol_ratio < 0.03:
+        prose += 1.5
+
+    # --- 2. Đặc trưng hình dạng dòng ---
+    ends_code = 0
+    ends_sentence = 0
+    indented = 0
+    strong = 0
+    for ln in lines:
+        stripped = ln.rstrip()
+        last = stripped[-1]
+        if last in ";{}):,]" or stripped.endswith("=>"):
+            ends_code += 1
+        elif last in ".?!…\"'" and " " in stripped:
+            ends_sentence += 1
+        if ln.startswith(("    ", "\t")):
+            indented += 1
+        if strong < 6 and (_STRONG_LINE_RE.match(stripped)
+                           or (last == "{" and _BRACE_CALL_RE.search(stripped))):
+            strong += 1
+    code += 6.0 * ends_code / n_lines
+    code += 3.0 * indented / n_lines if n_lines > 1 else 0.0
+    code += 3.0 * strong
+    prose += 4.0 * ends_sentence / n_lines
+
+    # --- 3. Từ khóa theo ngôn ngữ ---
+    tokens = _TOKEN_RE.findall(sample)
+    if tokens:
+        kw_score = 0.0
+        for tok, cnt in Counter(tokens).items():
+            w = _KEYWORD_WEIGHTS.get(tok)
+            if w is None:
+                continue
+            # Từ khóa SQL chỉ tính khi viết hoa toàn bộ
+            if tok in _SQL_WORDS and not tok.isupper():
+                continue
+            kw_score += w * cnt
+        density = kw_score / len(tokens)
+        code += min(density * 25, 6.0)
+        code += min(len(_IDENT_STYLE_RE.findall(sample)) / len(tokens) * 15, 3.0)
+
+    # --- 4. Văn xuôi: câu hoàn chỉnh, từ trung bình, tỉ lệ khoảng trắng ---
+    sentences = len(_SENTENCE_END_RE.findall(sample))
+    prose += min(sentences * 0.8, 5.0)
+    words = sample.split()
+    if words:
+        avg_word = len("".join(words)) / len(words)
+        if 3.5 <= avg_word <= 7.5 and symbol_ratio < 0.04:
+            prose += 1.5
+    if spaces / n_chars > 0.12 and symbol_ratio < 0.03:
+        prose += 1.0
+
+    return code - prose
+
+
+def _has_secret(head_lower: str) -> bool:
+    """Chỉ chạy regex secret trên các dòng chứa từ gợi ý (regex đã bật re.I nên dùng bản lower)."""
+    for hint in _SECRET_HINTS:
+        pos = head_lower.find(hint)
+        while pos != -1:
+            start = head_lower.rfind("\n", 0, pos) + 1
+            end = head_lower.find("\n", pos)
+            if end == -1:
+                end = len(head_lower)
+            if _SECRET_RE.search(head_lower, start, end):
+                return True
+            pos = head_lower.find(hint, end)
+    return False
+
+
+def classify_local(text) -> str:
+    """Trả về CODE / TEXT / UNSURE. Chỉ UNSURE mới cần gọi LLM."""
+    if not isinstance(text, str):
+        return UNSURE
+    if len(text) > MAX_SCAN_CHARS * 4:
+        text = text[:MAX_SCAN_CHARS * 4]  # Chỉ chấm tối đa MAX_SCAN_CHARS ký tự - không strip (copy) cả chuỗi lớn
+    stripped = text.strip()
+    if len(stripped) < MIN_CHARS:
+        return UNSURE
+    if _has_secret(stripped[:MAX_SCAN_CHARS].lower()):
+        return CODE
+    score = score_text(stripped, FIRST_PASS_CHARS)
+    if FIRST_PASS_CHARS < len(stripped) and TEXT_THRESHOLD < score < CODE_THRESHOLD:
+        score = score_text(stripped, MAX_SCAN_CHARS)
+    if score >= CODE_THRESHOLD:
+        return CODE
+    if score <= TEXT_THRESHOLD:
+        return TEXT
+    return UNSURE
@@ -13,14 +13,33 @@ import smtplib
 import uuid
 import atexit
 import stat
+import shutil
 import signal
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
 from dotenv import load_dotenv
 import pyperclip
-import psutil
-from openai import OpenAI
+
+from code_detector import classify_local, UNSURE
+from file_sampler import sample_file, sample_text
+from large_payload import is_large, lazy_strip, text_fingerprint
+from minhash_index import MinHashIndex
+from bounded_cache import BoundedCache
+from llm_client import LLMClientPool
+from single_flight import SingleFlight
+from classify_service import ClassificationService
+from clipboard_prefetch import ClipboardPrefetcher
+from clipboard_backend import CallbackBackend, ChangeGate, IdempotentRestorer
+from verdict_store import VerdictStore
+from hold_store import HoldStore
+from process_scanner import ProcessScanner
+from policy_matcher import ProcessPolicy
+from process_events import ProcessKiller, open_process_events
+from gitconfig_watch import GitConfigWatcher, global_config_files, same_path
+from alert_spool import AlertSpool, write_event
+from agent_ipc import AgentServer
+from push_scanner import DEFAULT_DB_PATH as PUSH_VERDICT_DB, PUSH_VERDICTS, agent_handlers as push_handlers
 
 try:
     from AppKit import NSWorkspace, NSWorkspaceDidActivateApplicationNotification, NSPasteboard, NSPasteboardTypeString, NSFilenamesPboardType
@@ -29,8 +48,14 @@ try:
     from pynput import keyboard
     import pyperclip
 except ImportError:
-    print("❌ Thiếu thư viện! Chạy: pip install pyobjc-framework-Cocoa openai python-dotenv pynput pyperclip")
-    sys.exit(1)
+    if __name__ == "__main__":
+        print("❌ Thiếu thư viện! Chạy: pip install pyobjc-framework-Cocoa openai python-dotenv pynput pyperclip")
+        sys.exit(1)
+    # Import làm thư viện (bench_clipboard.py chạy headless): chỉ phần native (NSPasteboard, app switch,
+    # hotkey) không dùng được, CLIPBOARD được thay bằng MemoryClipboardBackend
+    NSWorkspace = NSWorkspaceDidActivateApplicationNotification = NSPasteboard = None
+    NSPasteboardTypeString = NSFilenamesPboardType = NSURL = AppHelper = keyboard = None
+    NSObject = object
 
 # ==============================
 #   CONFIG
@@ -61,6 +86,14 @@ BASE_DIR = load_configuration()
 AZURE_ENDPOINT = os.getenv("AZURE_INFERENCE_ENDPOINT")
 AZURE_KEY = os.getenv("AZURE_INFERENCE_KEY")
 AZURE_MODEL = os.getenv("AZURE_INFERENCE_MODEL")
+CLASSIFY_DEADLINE = float(os.getenv("DLP_CLASSIFY_DEADLINE", "8"))  # Giây tối đa chờ verdict cho 1 clipboard
+DEADLINE_POLICY = os.getenv("DLP_DEADLINE_POLICY", "CODE").upper()  # CODE | TEXT | HOLD khi hết deadline
+NEAR_DUP_THRESHOLD = float(os.getenv("DLP_NEAR_DUP_THRESHOLD", "0.8"))  # Jaccard tối thiểu để dùng lại verdict snippet gần giống
+LARGE_TEXT_THRESHOLD = int(os.getenv("DLP_LARGE_TEXT_THRESHOLD", str(1024 * 1024)))  # Ký tự: trên ngưỡng -> không strip, hash lấy mẫu, phân loại theo cửa sổ
+HOLD_MAX_MB = int(os.getenv("DLP_HOLD_MAX_MB", "64"))  # Trần RAM cho clipboard đang bị giữ (nén zlib khi lớn)
+HOLD_SPILL_DIR = os.getenv("DLP_HOLD_SPILL_DIR", os.path.expanduser("~/.dlp_agent_hold"))  # "" = không spill ra đĩa
+GIT_CONTENT_SCAN = os.getenv("DLP_GIT_CONTENT_SCAN", "0") != "0"  # Bật (=1): push lên repo ngoài chỉ toàn TEXT thì cho qua; mặc định chặn theo URL
+ALERT_SPOOL_DIR = os.getenv("DLP_ALERT_SPOOL_DIR", os.path.expanduser("~/.dlp_agent_spool"))  # Hook ghi sự kiện, agent gửi email nền
 
 EMAIL_SENDER = os.getenv("EMAIL_SENDER")
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
@@ -94,23 +127,31 @@ WHITELIST_REPO = ["gitlab.siguna.co", "mycompany.internal"]  # Các repo đượ
 HOME_DIR = os.path.expanduser("~")
 HOOKS_DIR = os.path.join(HOME_DIR, ".dlp_git_hooks")
 HOOK_FILE = os.path.join(HOOKS_DIR, "pre-push")
+GIT_CONFIG_WATCHER = None
+# Copy vào HOOKS_DIR để hook quét bằng python3 -S -E: git_hook_check --scan nhờ agent quét qua agent_ipc,
+# agent không chạy thì tự quét bằng push_scanner
+HOOK_MODULES = ("git_hook_check.py", "agent_ipc.py", "push_scanner.py", "code_detector.py", "file_sampler.py",
+                "verdict_store.py")
+HOOK_CHECKER = os.path.join(HOOKS_DIR, "git_hook_check.py")
+
+def is_repo_allowed(url):
+    return any(domain and domain in url for domain in WHITELIST_REPO)
 
 STATE = {
-    "hidden_data": None,
-    "hidden_type": None,
+    "hidden_generation": None,  # Generation của clipboard đang bị giữ trong HOLD_STORE
     "current_app": "Unknown",
     "source_app": "Unknown",
     "monitor_active": False,
     "safe_hash": None,
     "content_type": None,
-    "llm_checking": False,
+    "clipboard_generation": 0,  # Tăng mỗi lần có clipboard mới cần phân loại
     "last_alert_time": 0,
     "last_alert_app": None,
     "last_clipboard_hash": None,  # Track clipboard hash changes
     "browser_allowed": False,
     "code_detected_time": 0,
     "warning_shown": False,
-    "warned_hashes": set(),
+    "warned_hashes": BoundedCache(max_entries=2000, max_bytes=256 * 1024, name="warned_hashes"),  # Cảnh báo 1 lần/phiên, chỉ giới hạn bộ nhớ (LRU)
     "warning_threads": set()
 }
 
@@ -119,7 +160,7 @@ STATE = {
 # ==============================
 def get_content_hash(data):
     if not data: return None
-    return hashlib.md5(data.encode('utf-8')).hexdigest()
+    return text_fingerprint(data, LARGE_TEXT_THRESHOLD)  # MD5, hoặc hash lấy mẫu nếu là payload lớn
 
 def get_active_browser_url(app_name):
     script = None
@@ -141,7 +182,7 @@ def is_domain_allowed(url):
         if domain in url: return True
     return False
 
-def clear_clipboard():
+def _mac_clear_clipboard():
     """Xóa clipboard - dùng pyperclip cho text, NSPasteboard cho file"""
     try:
         # Dùng pyperclip cho text (đảm bảo pkg chạy được)
@@ -153,7 +194,7 @@ def clear_clipboard():
         except: pass
     except: pass
 
-def restore_clipboard(data_type, data):
+def _mac_restore_clipboard(data_type, data):
     """Restore clipboard - dùng pyperclip cho text, AppleScript cho file (không cần NSPasteboard)"""
     if not data: return
     try:
@@ -171,6 +212,16 @@ def restore_clipboard(data_type, data):
                 print(f"❌ File not found: {file_path}")
                 return
             
+            # Cách 0: ghi NSURL thẳng vào NSPasteboard trong process - không spawn osascript mỗi lần restore
+            try:
+                pb = NSPasteboard.generalPasteboard()
+                pb.clearContents()
+                if pb.writeObjects_([NSURL.fileURLWithPath_(file_path)]):
+                    print(f"✅ Restored File Object to clipboard: {file_path}")
+                    return
+            except Exception:
+                pass
+            
             # Escape đường dẫn cho AppleScript (quan trọng!)
             escaped_path = file_path.replace('\\', '\\\\').replace('"', '\\"').replace("'", "\\'")
             
@@ -227,7 +278,7 @@ def restore_clipboard(data_type, data):
         import traceback
         traceback.print_exc()
 
-def get_pasteboard_change_count():
+def _mac_pasteboard_change_count():
     """Track clipboard changes - dùng NSPasteboard changeCount nếu có, không thì dùng hash"""
     try:
         # Thử dùng NSPasteboard changeCount trước
@@ -239,82 +290,72 @@ def get_pasteboard_change_count():
             content = pyperclip.paste()
             if content:
                 content_hash = get_content_hash(content)
-                if not hasattr(get_pasteboard_change_count, '_last_hash'):
-                    get_pasteboard_change_count._last_hash = None
-                    get_pasteboard_change_count._counter = 0
+                if not hasattr(_mac_pasteboard_change_count, '_last_hash'):
+                    _mac_pasteboard_change_count._last_hash = None
+                    _mac_pasteboard_change_count._counter = 0
                 
-                if content_hash != get_pasteboard_change_count._last_hash:
-                    get_pasteboard_change_count._last_hash = content_hash
-                    get_pasteboard_change_count._counter += 1
+                if content_hash != _mac_pasteboard_change_count._last_hash:
+                    _mac_pasteboard_change_count._last_hash = content_hash
+                    _mac_pasteboard_change_count._counter += 1
                 
-                return get_pasteboard_change_count._counter
+                return _mac_pasteboard_change_count._counter
         except: pass
         return 0
 
-def get_clipboard_hash():
-    """Get hash of current clipboard content - ưu tiên NSPasteboard, fallback pyperclip"""
+def _mac_read_clipboard():
+    """Lấy dữ liệu clipboard nhưng KHÔNG xóa - ưu tiên NSPasteboard cho file, pyperclip cho text"""
     try:
-        # Thử lấy từ NSPasteboard trước (cho file)
         pb = NSPasteboard.generalPasteboard()
         types = pb.types()
-        
-        content = None
         if "public.file-url" in types or NSFilenamesPboardType in types:
             url_str = pb.stringForType_("public.file-url")
             if url_str:
-                content = url_str
-        elif NSPasteboardTypeString in types:
+                ns_url = NSURL.URLWithString_(url_str)
+                if ns_url and ns_url.isFileURL():
+                    return "file", ns_url.path()
+        if NSPasteboardTypeString in types:
             content = pb.stringForType_(NSPasteboardTypeString)
-        
-        if content:
-            return get_content_hash(content)
+            if content:
+                return "text", content
     except: pass
     
-    # Fallback: dùng pyperclip cho text
     try:
-        content = pyperclip.paste()
+        content = lazy_strip(pyperclip.paste(), LARGE_TEXT_THRESHOLD)
         if content:
-            return get_content_hash(content)
+            return "text", content
     except: pass
-    return None
+    return None, None
+
+# Mọi truy cập clipboard đi qua CLIPBOARD - đổi sang MemoryClipboardBackend để benchmark không cần desktop
+CLIPBOARD = CallbackBackend(_mac_read_clipboard, _mac_restore_clipboard, _mac_clear_clipboard,
+                            _mac_pasteboard_change_count, name="nspasteboard")
+
+def clear_clipboard():
+    CLIPBOARD.clear()
+
+def restore_clipboard(data_type, data):
+    CLIPBOARD.write(data_type, data)
+
+def peek_clipboard():
+    """Lấy dữ liệu clipboard nhưng KHÔNG xóa"""
+    return CLIPBOARD.read()
 
 def get_and_clear_clipboard():
     """Lấy dữ liệu và xóa clipboard - ưu tiên NSPasteboard cho file, pyperclip cho text"""
-    try:
-        # Thử lấy từ NSPasteboard trước (cho file)
-        pb = NSPasteboard.generalPasteboard()
-        types = pb.types()
-        content = None
-        data_type = None
+    return CLIPBOARD.read_and_clear()
 
-        # Ưu tiên kiểm tra File trước
-        if "public.file-url" in types or NSFilenamesPboardType in types:
-            url_str = pb.stringForType_("public.file-url")
-            if url_str:
-                ns_url = NSURL.URLWithString_(url_str)
-                if ns_url and ns_url.isFileURL():
-                    content = ns_url.path()
-                    data_type = "file"
-        
-        # Nếu không phải file thì lấy Text từ NSPasteboard
-        if not content and NSPasteboardTypeString in types:
-            content = pb.stringForType_(NSPasteboardTypeString)
-            data_type = "text"
+def get_pasteboard_change_count():
+    return CLIPBOARD.change_count()
 
-        if content:
-            pb.clearContents()  # Xóa sau khi đã lấy được data
-            return data_type, content
-    except: pass
-    
-    # Fallback: dùng pyperclip cho text
+# Restore/clear mỗi tick của watchdog: chỉ ghi khi clipboard không còn đúng dữ liệu (tránh khuấy change counter)
+WATCHDOG_RESTORER = IdempotentRestorer(restore_clipboard, peek_clipboard, clear_clipboard,
+                                       get_pasteboard_change_count, get_content_hash, name="watchdog")
+
+def get_clipboard_hash():
+    """Get hash of current clipboard content"""
     try:
-        content = pyperclip.paste()
-        if content and content.strip():
-            data = content.strip()
-            pyperclip.copy("")  # Clear
-            return "text", data
-    except: pass
-    return None, None
+        return get_content_hash(CLIPBOARD.read()[1])
+    except: return None
 
 def read_file_safe(file_path):
     try:
@@ -430,62 +471,28 @@ def remove_from_startup():
 # ==============================
 #   KILLER & EMAIL
 # ==============================
-def kill_banned_windows():
+PROCESS_SCANNER = ProcessScanner(attrs=("name", "exe", "cmdline"), name="smart_killer")
+BANNED_PROCESS_POLICY = ProcessPolicy(BANNED_APPS_MAC)  # Biên dịch 1 lần, không lower() lại mỗi vòng
+
+def banned_process_rule(info):
     """
     Diệt Process mạnh mẽ hơn:
     1. Check Process Name
     2. Check Executable Path (tránh đổi tên app)
-    3. Check Command Line Arguments
+    3. Check Command Line Arguments (trừ tool dev như python/node/electron)
+    Trả về (field, rule) đã khớp hoặc None.
     """
-    try:
-        # Lấy thêm thông tin 'exe' để check đường dẫn file chạy
-        for proc in psutil.process_iter(['pid', 'name', 'exe', 'cmdline']):
-            try:
-                p_name = proc.info['name'].lower() if proc.info['name'] else ""
-                p_exe = proc.info['exe'].lower() if proc.info['exe'] else ""
-                
-                should_kill = False
-
-                for banned in BANNED_APPS_MAC:
-                    b_key = banned.lower()
-                    
-                    # 1. Check Tên
-                    if b_key in p_name:
-                        should_kill = True
-                        break
-                    
-                    # 2. Check Đường dẫn file (VD: /Applications/Skitch.app/...)
-                    if b_key in p_exe:
-                        should_kill = True
-                        break
-
-                    # 3. Check Lệnh chạy (trừ các tool dev như python/node/electron)
-                    cmd_list = proc.info['cmdline']
-                    if cmd_list and len(cmd_list) > 0:
-                        first_arg = cmd_list[0].lower()
-                        if b_key in first_arg:
-                            # Whitelist các tool dev chạy lệnh có tên trùng
-                            if "electron" in first_arg or "node" in first_arg or "python" in first_arg:
-                                continue 
-                            should_kill = True
-                            break
-
-                if should_kill:
-                    print(f"🚫 Killing banned app: {p_name} (PID: {proc.pid})")
-                    proc.kill()
-            
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                continue
-            except Exception:
-                continue
-    except Exception: pass
+    return BANNED_PROCESS_POLICY.match(info['name'], info['exe'], info['cmdline'])
+
+# Mọi nguồn sự kiện process (poll ProcessScanner trên macOS) đi qua cùng 1 quyết định kill
+PROCESS_KILLER = ProcessKiller(banned_process_rule, attrs=PROCESS_SCANNER.attrs, scanner=PROCESS_SCANNER,
+                               name="smart_killer", log_every=600)  # Log detect_to_kill mỗi 10 phút
 
 def start_smart_killer():
-    def loop_kill():
-        while RUN_FLAG:
-            kill_banned_windows()
-            time.sleep(1.0)
-    t = threading.Thread(target=loop_kill); t.daemon = True; t.start()
+    source = open_process_events(PROCESS_KILLER.handle, PROCESS_SCANNER, interval=1.0, running=lambda: RUN_FLAG)
+    source.start()
+    print(f"🛡️ Smart killer: {source.name}")
+    return source
 
 # ==============================
 #   GIT FIREWALL (DLP - Prevent Push to External Repos)
@@ -515,7 +522,7 @@ if os.path.exists(env_path):
         for line in f:
             if "=" in line and not line.strip().startswith("#"):
                 key, value = line.strip().split("=", 1)
-                os.environ[key] = value.strip("\\"'"')
+                os.environ[key] = value.strip("\\"'")
 
 EMAIL_SENDER = os.getenv("EMAIL_SENDER")
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
@@ -569,14 +576,14 @@ def send_email_git_push(repo_url):
                 <strong style="color: #a4262c;">Severity: Medium</strong>
             </div>
             <table style="width: 100%; font-size: 14px; line-height: 1.8; border-collapse: collapse;">
-                <tr><td style="width: 220px; font-weight: bold; color: #444;">Time of occurrence:</td><td>{time_local}</td></tr>
+                <tr><td style="width: 220px; font-weight: bold; color: #444;">Time of occurrence:</td><td>{{time_local}}</td></tr>
                 <tr><td style="font-weight: bold; color: #444;">Activity:</td><td>DlpRuleMatch (Git Push)</td></tr>
-                <tr><td style="font-weight: bold; color: #444;">User:</td><td style="color: #0078d4;">{email_mock}</td></tr>
+                <tr><td style="font-weight: bold; color: #444;">User:</td><td style="color: #0078d4;">{{email_mock}}</td></tr>
                 <tr><td style="font-weight: bold; color: #444;">Policy:</td><td>DLP_Block_SourceCode</td></tr>
-                <tr><td style="font-weight: bold; color: #444;">Alert ID:</td><td style="color: #666; font-family: monospace;">{alert_id}</td></tr>
-                <tr><td style="font-weight: bold; color: #444;">Repository URL:</td><td style="color: #d83b01; font-weight: bold; font-family: monospace;">{repo_url}</td></tr>
-                <tr><td style="font-weight: bold; color: #444;">Device:</td><td>{device}</td></tr>
-                <tr><td style="font-weight: bold; color: #444;">IP:</td><td>{ip}</td></tr>
+                <tr><td style="font-weight: bold; color: #444;">Alert ID:</td><td style="color: #666; font-family: monospace;">{{alert_id}}</td></tr>
+                <tr><td style="font-weight: bold; color: #444;">Repository URL:</td><td style="color: #d83b01; font-weight: bold; font-family: monospace;">{{repo_url}}</td></tr>
+                <tr><td style="font-weight: bold; color: #444;">Device:</td><td>{{device}}</td></tr>
+                <tr><td style="font-weight: bold; color: #444;">IP:</td><td>{{ip}}</td></tr>
                 <tr><td style="font-weight: bold; color: #444;">Status:</td><td style="color: #a4262c; font-weight: bold;">BLOCK</td></tr>
             </table>
             <hr style="border: 0; border-top: 1px solid #e1dfdd; margin: 25px 0;">
@@ -613,14 +620,32 @@ def send_email_git_push(repo_url):
     except Exception as e:
         print(f"Email Error: {{e}}", file=sys.stderr)
 
+def record_on_agent(repo_url):
+    """Giao alert cho agent thường trú (email + thử lại qua spool); False nếu agent không chạy."""
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    try:
+        from agent_ipc import AgentClient, AgentUnavailable
+    except ImportError:
+        return False
+    try:
+        with AgentClient() as client:
+            client.call("record_event", kind="git_push_blocked", url=repo_url)
+        return True
+    except AgentUnavailable:
+        return False
+
 if __name__ == "__main__":
     if len(sys.argv) > 1:
         repo_url = sys.argv[1]
-        send_email_git_push(repo_url)
+        if not record_on_agent(repo_url):
+            send_email_git_push(repo_url)
 '''
         
         with open(helper_script, "w", encoding="utf-8") as f:
             f.write(helper_code)
+        # Client IPC cạnh helper (record_on_agent)
+        src_dir = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
+        shutil.copyfile(os.path.join(src_dir, "agent_ipc.py"), os.path.join(HOOKS_DIR, "agent_ipc.py"))
         
         # Cấp quyền thực thi
         st = os.stat(helper_script)
@@ -648,6 +673,28 @@ def setup_git_firewall():
         
         # Escape đường dẫn cho bash
         agent_script_escaped = agent_script.replace('"', '\\"')
+        spool_escaped = ALERT_SPOOL_DIR.replace('"', '\\"')
+        if getattr(sys, 'frozen', False):
+            drain_cmd = f'"{agent_script_escaped}" --drain-alert-spool'
+        else:
+            drain_cmd = f'python3 "{agent_script_escaped}" --drain-alert-spool'
+
+        # Quét nội dung push: copy git_hook_check + push_scanner + detector vào HOOKS_DIR
+        scan_block = ""
+        if GIT_CONTENT_SCAN:
+            src_dir = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
+            try:
+                for module in HOOK_MODULES:
+                    shutil.copyfile(os.path.join(src_dir, module), os.path.join(HOOKS_DIR, module))
+                checker_escaped = HOOK_CHECKER.replace('"', '\\"')
+                scan_block = f"""
+# Repo ngoài whitelist: quét nội dung push, chỉ toàn TEXT thì cho qua
+if [ -f "{checker_escaped}" ]; then
+    python3 -S -E "{checker_escaped}" --scan "$remote" "$url" && exit 0
+fi
+"""
+            except Exception as e:
+                print(f"⚠️ Push content scan not installed: {e}")
         
         # 3. Tạo pre-push script với whitelist và gửi email khi bị chặn
         # Escape và format whitelist cho bash array
@@ -670,15 +717,25 @@ for domain in "${{ALLOWED_REPOS[@]}}"; do
         exit 0 # Allowed
     fi
 done
-
+{scan_block}
 echo "🚫 [DLP] BLOCKED: Push to $url is not allowed."
 echo "💡 Allowed repos: {whitelist_display}"
 
-# Gửi email cảnh báo khi push bị chặn - gọi trực tiếp dlp_agent_mac.py
-if [ -f "{agent_script_escaped}" ]; then
-    python3 "{agent_script_escaped}" --git-push-alert "$url" > /tmp/dlp_git_email.log 2>&1 &
-else
-    echo "⚠️ [DLP] Agent script not found: {agent_script_escaped}" >&2
+# Ghi alert vào spool cho agent gửi nền (hook không chờ SMTP)
+SPOOL="{spool_escaped}"
+mkdir -p "$SPOOL"
+name="$(date +%s)000000000-$$"
+printf 'kind git_push_blocked\nurl %s\nremote %s\ntime %s\n' "$url" "$remote" "$(date +%s)" > "$SPOOL/$name.tmp" \
+    && mv -f "$SPOOL/$name.tmp" "$SPOOL/$name.evt"
+
+# Agent không chạy (heartbeat cũ hơn 30s) -> bật drain 1 lần ở nền
+heartbeat=$(stat -f %m "$SPOOL/.agent" 2>/dev/null || stat -c %Y "$SPOOL/.agent" 2>/dev/null || echo 0)
+if [ $(( $(date +%s) - heartbeat )) -gt 30 ]; then
+    if [ -f "{agent_script_escaped}" ]; then
+        {drain_cmd} > /tmp/dlp_git_email.log 2>&1 &
+    else
+        echo "⚠️ [DLP] Agent script not found: {agent_script_escaped}" >&2
+    fi
 fi
 
 exit 1
@@ -701,6 +758,8 @@ exit 1
 
 def cleanup_git_firewall():
     """Gỡ bỏ Git Firewall khi chương trình tắt"""
+    if GIT_CONFIG_WATCHER is not None:
+        GIT_CONFIG_WATCHER.stop()  # Dừng trước khi unset, không thì watcher enforce lại ngay
     try:
         # Gỡ bỏ cấu hình core.hooksPath
         subprocess.run(["git", "config", "--global", "--unset", "core.hooksPath"], 
@@ -709,29 +768,32 @@ def cleanup_git_firewall():
     except Exception as e:
         pass  # Silent fail on cleanup
 
+def enforce_hooks_path(config):
+    """on_change của GIT_CONFIG_WATCHER: chỉ gọi git khi core.hooksPath thật sự lệch HOOKS_DIR."""
+    for condition, source, path in config.conditional:
+        if not same_path(path, HOOKS_DIR):
+            print(f"⚠️ core.hooksPath={path} for repos matching {condition} ({source})")
+    if same_path(config.hooks_path, HOOKS_DIR):
+        return
+    # User đã thay đổi config, enforce lại
+    subprocess.run(["git", "config", "--global", "core.hooksPath", HOOKS_DIR],
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=5)
+    if config.hooks_source and not any(same_path(config.hooks_source, f) for f in global_config_files()):
+        # Giá trị đến từ file include.path nằm sau [core] -> ghi --global không đè được
+        print(f"⚠️ core.hooksPath overridden by include file {config.hooks_source}")
+
 def monitor_git_config():
-    """Monitor và đảm bảo Git Firewall không bị tắt khi app đang chạy"""
-    while RUN_FLAG:
-        try:
-            result = subprocess.run(["git", "config", "--global", "core.hooksPath"], 
-                                    capture_output=True, text=True, timeout=1)
-            current_path = result.stdout.strip()
-            
-            if current_path != HOOKS_DIR:
-                # User đã thay đổi config, enforce lại
-                subprocess.run(["git", "config", "--global", "core.hooksPath", HOOKS_DIR],
-                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        except: pass
-        time.sleep(5)
+    """Monitor và đảm bảo Git Firewall không bị tắt khi app đang chạy (watch file, không poll git)"""
+    global GIT_CONFIG_WATCHER
+    GIT_CONFIG_WATCHER = GitConfigWatcher(enforce_hooks_path, name="git_firewall").start()
 
 def start_git_firewall():
     """Khởi động Git Firewall và monitor thread"""
     setup_git_firewall()
     # Đăng ký cleanup khi exit
     atexit.register(cleanup_git_firewall)
-    # Chạy monitor thread
-    t = threading.Thread(target=monitor_git_config, daemon=True)
-    t.start()
+    # Chạy watcher thread
+    monitor_git_config()
 
 def get_system_detail():
     """Thu thập thông tin hệ thống để đưa vào email alert."""
@@ -893,9 +955,9 @@ def send_email_file_copy(file_path, violated_app="Unknown App"):
         print(f"Email Error: {e}")
 
 def send_email_git_push(repo_url, violated_app="Git"):
-    """Gửi email cảnh báo DLP cho Git Push repo ngoài whitelist."""
+    """Gửi email cảnh báo DLP cho Git Push repo ngoài whitelist. False nếu gửi lỗi (spool sẽ thử lại)."""
     if not EMAIL_SENDER or not EMAIL_PASSWORD or not EMAIL_RECEIVER:
-        return
+        return True  # Chưa cấu hình email: không có gì để thử lại
 
     sys_info = get_system_detail()
 
@@ -945,9 +1007,38 @@ def send_email_git_push(repo_url, violated_app="Git"):
         server.send_message(msg)
         server.quit()
         print("📧 [EMAIL] Git Push alert sent")
+        return True
     except Exception as e:
         print(f"Email Error: {e}")
-    
+        return False
+
+def handle_alert_event(event):
+    """Handler của ALERT_SPOOL: True = xong (xóa khỏi spool), False = thử lại sau."""
+    if event.get("kind") == "git_push_blocked":
+        return send_email_git_push(event.get("url", ""))
+    return True  # Loại sự kiện không biết: bỏ
+
+ALERT_SPOOL = AlertSpool(ALERT_SPOOL_DIR, handle_alert_event)
+
+# ==============================
+#   AGENT IPC (hook hỏi agent thường trú thay vì tự dựng lại policy/cache)
+# ==============================
+PUSH_VERDICT_STORE = VerdictStore(PUSH_VERDICT_DB, verdicts=PUSH_VERDICTS)  # Cùng file với hook, agent mở 1 lần
+
+def ipc_record_event(**fields):
+    """Hook báo sự kiện -> ghi vào spool, ALERT_SPOOL gửi ở lượt quét kế tiếp."""
+    write_event(ALERT_SPOOL_DIR, **fields)
+    return True
+
+def ipc_status():
+    """Metric của agent (git_hook_check.py --status): kill latency, spool, hit rate của cache/index/single-flight."""
+    return {"smart_killer": PROCESS_KILLER.metrics(), "alert_spool": ALERT_SPOOL.stats,
+            "classifier": dict(CLASSIFIER.stats, inflight=CLASSIFIER.inflight), "hold_store": HOLD_STORE.snapshot(),
+            "caches": [c.stats() for c in (llm_cache, STATE["warned_hashes"], LLM_FLIGHT, NEAR_DUP_INDEX)]}
+
+AGENT_IPC = AgentServer({"is_allowed": is_repo_allowed, "record_event": ipc_record_event, "status": ipc_status,
+                         **push_handlers(PUSH_VERDICT_STORE)})
+
 def trigger_email_async(content, app_name="Unknown", email_type="clipboard"):
     """Trigger email async với loại email khác nhau.
     
@@ -988,14 +1079,48 @@ def show_alert(app_name, source_app="Unknown"):
 # ==============================
 #   AI ENGINE
 # ==============================
-llm_cache = {}
+llm_cache = BoundedCache(max_entries=5000, max_bytes=1024 * 1024, ttl=24 * 3600, name="llm_cache")
+LLM_CLIENT = LLMClientPool(AZURE_ENDPOINT, AZURE_KEY)  # Client + connection pool dùng chung, warm từ lúc khởi động
+LLM_FLIGHT = SingleFlight("call_azure_llm")  # Gộp các request trùng content đang bay
+NEAR_DUP_INDEX = MinHashIndex(threshold=NEAR_DUP_THRESHOLD, name="near_dup")  # Gần giống snippet CODE -> CODE (TEXT không suy từ hàng xóm)
+VERDICT_STORE = VerdictStore()  # Cache verdict trên đĩa, giữ qua các lần restart (KeepAlive)
+HOLD_STORE = HoldStore(max_bytes=HOLD_MAX_MB * 1024 * 1024, spill_dir=HOLD_SPILL_DIR or None)  # Clipboard bị giữ theo generation
+CLASSIFIER = ClassificationService(deadline=CLASSIFY_DEADLINE, deadline_policy=DEADLINE_POLICY)
 def call_azure_llm(content):
     if not content or not AZURE_KEY: return "TEXT"
     content_hash = hashlib.md5(content.encode('utf-8')).hexdigest()
-    if content_hash in llm_cache: return llm_cache[content_hash]
-
+    cached_verdict = llm_cache.get(content_hash)
+    if cached_verdict: return cached_verdict
+
+    # Heuristic cục bộ: CODE/TEXT rõ ràng thì trả luôn, chỉ UNSURE mới gọi Azure
+    local_verdict = classify_local(content)
+    if local_verdict != UNSURE:
+        llm_cache[content_hash] = local_verdict
+        return local_verdict
+
+    stored_verdict = VERDICT_STORE.get(content_hash)
+    if stored_verdict:
+        llm_cache[content_hash] = stored_verdict
+        NEAR_DUP_INDEX.add(content, stored_verdict)
+        return stored_verdict
+
+    # Gần giống snippet đã phân loại (thêm dòng, đổi thụt lề...) -> dùng lại verdict, không gọi Azure
+    near_verdict, similarity = NEAR_DUP_INDEX.lookup(content)
+    if near_verdict:
+        print(f"   ♻️ Near-duplicate ({similarity:.2f}) -> {near_verdict}")
+        llm_cache[content_hash] = near_verdict
+        return near_verdict
+
+    # Single-flight: các thread cùng content (switch app liên tục) chờ chung 1 request Azure
+    return LLM_FLIGHT.do(content_hash, request_azure_verdict, content, content_hash)
+
+def request_azure_verdict(content, content_hash):
+    """Gọi Azure thật (sau cache + heuristic) - chỉ chạy qua LLM_FLIGHT."""
+    # Thread trước có thể vừa ghi cache xong ngay trước khi thread này thành leader
+    cached_verdict = llm_cache.get(content_hash)
+    if cached_verdict: return cached_verdict
     try:
-        client = OpenAI(base_url=AZURE_ENDPOINT, api_key=AZURE_KEY)
+        client = LLM_CLIENT.get()
         system_prompt = "You are a DLP Agent. Input can be file content or text. If it contains source code (Python, JS, Keys, SQL), return 'CODE'. Otherwise return 'TEXT'."
         response = client.chat.completions.create(
             model=AZURE_MODEL,
@@ -1005,70 +1130,100 @@ def call_azure_llm(content):
         res_text = response.choices[0].message.content or ""
         result = "CODE" if "CODE" in res_text.upper() else "TEXT"
         llm_cache[content_hash] = result
+        VERDICT_STORE.put(content_hash, result)
+        NEAR_DUP_INDEX.add(content, result)
         return result
-    except:
+    except Exception as e:
+        LLM_CLIENT.report_error(e)  # Lỗi kết nối -> lần gọi sau tự tạo lại client
         return "CODE"
 
 # ==============================
 #   LOGIC PHÂN TÍCH
 # ==============================
-def async_analysis_universal(data, d_type):
-    STATE["llm_checking"] = True
-    try:
-        content = read_file_safe(data) if d_type == "file" else data
+def analyze_clipboard_data(data, d_type):
+    """Chạy trong worker của CLASSIFIER: chỉ tính verdict, không đụng tới STATE/clipboard."""
+    # File: lấy mẫu đầu/giữa/cuối, chỉ đoạn giống code nhất được gửi lên LLM
+    if d_type == "file":
+        content = sample_file(data)
+    elif is_large(data, LARGE_TEXT_THRESHOLD):
+        content = sample_text(data)  # Text lớn: chỉ vài cửa sổ đầu/giữa/cuối, không quét/hash cả chuỗi
+    else:
+        content = data
+    # File An toàn (Binary/Ảnh/File Safe) -> xử lý như TEXT
+    if content is None:
+        return "TEXT"
+    return call_azure_llm(content)
+
+def apply_verdict(generation, verdict):
+    """Áp verdict vào STATE - bỏ qua nếu clipboard đã có generation mới hơn."""
+    if STATE["clipboard_generation"] != generation:
+        return
+    d_type, data = HOLD_STORE.get(generation)
+    if data is None:
+        return
+    STATE["content_type"] = verdict
+    
+    if verdict == "TEXT":
+        release_hidden()
+        STATE["safe_hash"] = get_content_hash(data)
+        restore_clipboard(d_type, data)
+        time.sleep(0.1)
+        STATE["last_clipboard_hash"] = get_clipboard_hash()
+    else:
+        # CODE detected
+        data_hash = get_content_hash(data)
+        print(f"   🤖 AI: CODE -> Detected (Warning will show after delay)")
+        STATE["code_detected_time"] = time.time()
         
-        # Nếu là File An toàn (Binary/Ảnh/File Safe)
-        if content is None:
-            # print(f"   ✅ File Binary/Safe -> Auto Restore")
-            STATE["content_type"] = "TEXT"
-            STATE["hidden_data"] = None 
-            STATE["safe_hash"] = get_content_hash(data)
-            restore_clipboard(d_type, data)
-            time.sleep(0.1)
-            STATE["last_clipboard_hash"] = get_clipboard_hash()
-            return
-
-        # Check AI
-        verdict = call_azure_llm(content)
-        STATE["content_type"] = verdict
+        # Chỉ trigger warning nếu:
+        # 1. Chưa có thread warning đang chạy cho hash này
+        # 2. Chưa hiện warning cho hash này (hoặc đã quá 10 giây)
+        current_time = time.time()
+        should_warn = False
         
-        if verdict == "TEXT":
-            STATE["hidden_data"] = None
-            STATE["safe_hash"] = get_content_hash(data)
-            restore_clipboard(d_type, data)
-            time.sleep(0.1)
-            STATE["last_clipboard_hash"] = get_clipboard_hash()
-        else:
-            # CODE detected
-            data_hash = get_content_hash(data)
-            print(f"   🤖 AI: CODE -> Detected (Warning will show after delay)")
-            STATE["code_detected_time"] = time.time()
-            
-            # Chỉ trigger warning nếu:
-            # 1. Chưa có thread warning đang chạy cho hash này
-            # 2. Chưa hiện warning cho hash này (hoặc đã quá 10 giây)
-            current_time = time.time()
-            should_warn = False
-            
-            if data_hash not in STATE["warning_threads"]:
-                # Kiểm tra xem đã warn chưa, nếu rồi thì chỉ warn lại sau 10 giây
-                if data_hash not in STATE["warned_hashes"]:
-                    should_warn = True
-                else:
-                    # Đã warn rồi, nhưng có thể warn lại sau 10 giây
-                    # (không track thời gian cụ thể, chỉ clear sau một khoảng thời gian)
-                    # Đơn giản: chỉ warn một lần cho mỗi hash trong session
-                    pass
-            
-            if should_warn:
-                STATE["warning_threads"].add(data_hash)
-                # Trigger warning sau 2 giây (chạy ngầm, không chặn paste)
-                threading.Thread(target=delayed_warning, args=(STATE["current_app"], STATE["source_app"], data_hash), daemon=True).start()
-            
-    finally:
-        STATE["llm_checking"] = False
+        if data_hash not in STATE["warning_threads"]:
+            # Kiểm tra xem đã warn chưa, nếu rồi thì chỉ warn lại sau 10 giây
+            if data_hash not in STATE["warned_hashes"]:
+                should_warn = True
+            else:
+                # Đã warn rồi, nhưng có thể warn lại sau 10 giây
+                # (không track thời gian cụ thể, chỉ clear sau một khoảng thời gian)
+                # Đơn giản: chỉ warn một lần cho mỗi hash trong session
+                pass
+        
+        if should_warn:
+            STATE["warning_threads"].add(data_hash)
+            # Trigger warning sau 2 giây (chạy ngầm, không chặn paste)
+            threading.Thread(target=delayed_warning, args=(STATE["current_app"], STATE["source_app"], data_hash, generation), daemon=True).start()
+
+def prefetch_verdict(d_type, data):
+    """Phân loại ngay lúc copy để verdict có sẵn trong cache khi user chuyển app"""
+    analyze_clipboard_data(data, d_type)
+
+PREFETCHER = ClipboardPrefetcher(get_pasteboard_change_count, peek_clipboard, prefetch_verdict,
+                                 fingerprint=get_content_hash)
+
+def async_analysis_universal(data, d_type):
+    """Gửi clipboard mới cho CLASSIFIER (không block); request của clipboard cũ bị hủy."""
+    STATE["clipboard_generation"] += 1
+    generation = STATE["clipboard_generation"]
+    HOLD_STORE.put(generation, d_type, data)  # Generation cũ vẫn giữ riêng tới khi được release/evict
+    STATE["hidden_generation"] = generation
+    STATE["content_type"] = None
+    CLASSIFIER.submit(generation, analyze_clipboard_data,
+                      lambda verdict: apply_verdict(generation, verdict),
+                      data, d_type)
+
+def get_hidden():
+    """(d_type, data) của clipboard đang bị giữ, (None, None) nếu không có."""
+    return HOLD_STORE.get(STATE["hidden_generation"])
 
-def delayed_warning(app_name, source_app, data_hash):
+def release_hidden():
+    """Đã trả lại/hết giữ clipboard hiện tại -> bỏ nó cùng các generation cũ hơn khỏi HOLD_STORE."""
+    generation, STATE["hidden_generation"] = STATE["hidden_generation"], None
+    HOLD_STORE.discard_through(generation)
+
+def delayed_warning(app_name, source_app, data_hash, generation):
     """Hiện cảnh báo sau khi AI xác định là CODE (không phụ thuộc Cmd+V).
     Áp dụng cho cả browser (chatbot domain) và app ngoài whitelist."""
     try:
@@ -1099,14 +1254,16 @@ def delayed_warning(app_name, source_app, data_hash):
                         # App thường: luôn email nếu không nằm whitelist
                         should_email = True
 
-                if should_email and STATE.get("hidden_data"):
+                # Lấy đúng item đã bị phân loại CODE (không phải item mới nhất nếu user đã copy tiếp)
+                held_type, held_data = HOLD_STORE.get(generation) if should_email else (None, None)
+                if held_data:
                     # Phân biệt file vs text để gửi email đúng loại
-                    if STATE["hidden_type"] == "file":
+                    if held_type == "file":
                         # Copy FileCode
-                        trigger_email_async(STATE["hidden_data"], app_name=app_name, email_type="file")
+                        trigger_email_async(held_data, app_name=app_name, email_type="file")
                     else:
                         # Clipboard Paste (text)
-                        trigger_email_async(STATE["hidden_data"], app_name=app_name, email_type="clipboard")
+                        trigger_email_async(held_data, app_name=app_name, email_type="clipboard")
     except: 
         # Đảm bảo luôn remove khỏi warning_threads dù có lỗi
         STATE["warning_threads"].discard(data_hash)
@@ -1120,6 +1277,9 @@ def browser_watchdog_loop(app_name):
     STATE["last_clipboard_hash"] = get_clipboard_hash()
     STATE["browser_allowed"] = False
     consecutive_allowed_count = 0
+    gate = ChangeGate(get_pasteboard_change_count, name=f"watchdog:{app_name}")
+    gate.changed()  # Mốc ban đầu = clipboard vừa hash ở trên
+    held_gen, held_type, held_data = None, None, None
     
     while STATE["monitor_active"] and STATE["current_app"] == app_name:
         try:
@@ -1128,8 +1288,8 @@ def browser_watchdog_loop(app_name):
             is_allowed = is_domain_allowed(current_url)
             STATE["browser_allowed"] = is_allowed
 
-            # 1. Kiểm tra Clipboard mới
-            current_hash = get_clipboard_hash()
+            # 1. Kiểm tra Clipboard mới - changeCount không đổi thì khỏi đọc + hash lại
+            current_hash = get_clipboard_hash() if gate.changed() else STATE["last_clipboard_hash"]
             if current_hash != STATE["last_clipboard_hash"]:
                 STATE["last_clipboard_hash"] = current_hash
                 d_type, data = get_and_clear_clipboard()
@@ -1139,41 +1299,42 @@ def browser_watchdog_loop(app_name):
                     # Nếu là Safe Data -> Trả lại
                     if current_hash_check == STATE["safe_hash"]:
                         restore_clipboard(d_type, data)
-                        if STATE["hidden_data"]:
-                            STATE["hidden_data"] = None
+                        release_hidden()
                         continue
 
                     # Data mới -> Check
                     STATE["source_app"] = app_name
-                    STATE["hidden_data"] = data
-                    STATE["hidden_type"] = d_type
-                    STATE["content_type"] = None
-                    threading.Thread(target=async_analysis_universal, args=(data, d_type)).start()
+                    async_analysis_universal(data, d_type)
                     continue
             
-            # Nếu không có hidden_data -> sleep
-            if not STATE["hidden_data"]:
+            # Chỉ giải nén từ HOLD_STORE khi generation đổi, không phải mỗi tick
+            if held_gen != STATE["hidden_generation"]:
+                held_gen = STATE["hidden_generation"]
+                held_type, held_data = get_hidden()
+
+            # Nếu không có dữ liệu bị giữ -> sleep
+            if not held_data:
                 time.sleep(0.3)
                 continue
 
             # 2. Xử lý dữ liệu đang bị giữ (CODE)
             if is_allowed:
-                # Domain xịn -> Restore liên tục
-                restore_clipboard(STATE["hidden_type"], STATE["hidden_data"])
+                # Domain xịn -> Restore liên tục (chỉ ghi thật khi clipboard không còn giữ dữ liệu)
+                WATCHDOG_RESTORER.restore(held_type, held_data)
                 consecutive_allowed_count += 1
                 
                 if consecutive_allowed_count > 33:  # ~5 giây
-                    STATE["hidden_data"] = None
+                    release_hidden()
                     consecutive_allowed_count = 0
                     print(f"   ✅ [MULTI-PASTE] Cleared state after timeout")
             else:
                 # Domain lởm -> Xóa clipboard
-                clear_clipboard()
+                WATCHDOG_RESTORER.clear()
                 consecutive_allowed_count = 0
 
             time.sleep(0.15)
         except: pass
-    print(f"💤 Dừng giám sát {app_name}")
+    print(f"💤 Dừng giám sát {app_name} (clipboard polls skipped {gate.skipped}/{gate.polls})")
 
 # ==============================
 #   MAIN HANDLER
@@ -1191,10 +1352,11 @@ class TrapdoorHandler(NSObject):
 
 def handle_switch(app_name):
     if app_name in ALLOWED_APPS:
-        if STATE["hidden_data"]:
-            restore_clipboard(STATE["hidden_type"], STATE["hidden_data"])
+        hidden_type, hidden_data = get_hidden()
+        if hidden_data:
+            restore_clipboard(hidden_type, hidden_data)
             print(f"✅ [RESTORE] {app_name}")
-            STATE["hidden_data"] = None
+        release_hidden()
         return
 
     if app_name in BROWSER_APPS:
@@ -1203,10 +1365,7 @@ def handle_switch(app_name):
             if get_content_hash(data) == STATE["safe_hash"]:
                 restore_clipboard(d_type, data)
             else:
-                STATE["hidden_data"] = data
-                STATE["hidden_type"] = d_type
-                STATE["content_type"] = None
-                threading.Thread(target=async_analysis_universal, args=(data, d_type)).start()
+                async_analysis_universal(data, d_type)
         
         threading.Thread(target=browser_watchdog_loop, args=(app_name,), daemon=True).start()
         return
@@ -1214,24 +1373,20 @@ def handle_switch(app_name):
     # App thường
     d_type, data = get_and_clear_clipboard()
     if not data:
-        if STATE["hidden_data"]: 
-            d_type = STATE["hidden_type"]
-            data = STATE["hidden_data"]
-        else: return
+        d_type, data = get_hidden()
+        if not data: return
+        release_hidden()  # Được giữ lại dưới generation mới ngay bên dưới
 
     # App KHÔNG được phép: xóa clipboard ngay để chặn paste tức thì,
-    # dữ liệu thật được giữ trong STATE["hidden_data"]
+    # dữ liệu thật được giữ trong HOLD_STORE
     clear_clipboard()
 
     if get_content_hash(data) == STATE["safe_hash"]:
         restore_clipboard(d_type, data)
         return
 
-    STATE["hidden_data"] = data
-    STATE["hidden_type"] = d_type
-    STATE["content_type"] = None
     print(f"🔒 [BLOCK] {app_name}. Checking...")
-    threading.Thread(target=async_analysis_universal, args=(data, d_type)).start()
+    async_analysis_universal(data, d_type)
 
 # ==============================
 #   KEYBOARD LISTENER (FIXED ALERT LOGIC)
@@ -1254,6 +1409,10 @@ def main():
     print("🚀 DLP Agent (Sync State Fix) Started...")
     start_smart_killer()
     start_git_firewall()  # Khởi động Git Firewall
+    ALERT_SPOOL.start()  # Gửi alert do git hook để lại (kể cả lúc agent tắt)
+    AGENT_IPC.start()  # Unix socket cho hook: quét push / ghi alert bằng state đang nóng của agent
+    LLM_CLIENT.start()  # Mở sẵn kết nối Azure + keep-alive
+    PREFETCHER.start()  # Phân loại trước từ lúc copy (NSPasteboard changeCount)
     if keyboard:
         start_keyboard_listener()
     
@@ -1293,6 +1452,11 @@ if __name__ == "__main__":
             print("Usage: dlp_agent_mac.py --git-push-alert <repo_url>", file=sys.stderr)
             sys.exit(1)
 
+    # 3b. Gửi hết alert trong spool rồi thoát (hook bật khi agent thường trú không chạy)
+    if len(sys.argv) > 1 and sys.argv[1] == "--drain-alert-spool":
+        AlertSpool(ALERT_SPOOL_DIR, handle_alert_event, heartbeat=False).drain()
+        sys.exit(0)
+
     # 4. Chạy chính (DLP Agent)
     ensure_single_instance()
     
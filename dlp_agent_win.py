@@ -23,9 +23,30 @@ import subprocess
 from dotenv import load_dotenv
 import pyperclip
 import psutil
-from openai import OpenAI
 from PIL import Image, ImageGrab, ImageTk
 
+from code_detector import classify_local, UNSURE
+from file_sampler import sample_file, sample_text
+from large_payload import is_large, lazy_strip, text_fingerprint
+from minhash_index import MinHashIndex
+from image_hash import HammingIndex, dhash, image_fingerprint
+from bounded_cache import BoundedCache
+from llm_client import LLMClientPool
+from single_flight import SingleFlight
+from classify_service import ClassificationService
+from clipboard_prefetch import ClipboardPrefetcher
+from clipboard_backend import CallbackBackend, IdempotentRestorer
+from helper_worker import WorkerError, powershell_worker
+from verdict_store import VerdictStore
+from hold_store import HoldStore
+from process_scanner import ProcessScanner
+from policy_matcher import EXACT, SUBSTRING, PatternSet
+from process_events import ProcessKiller, open_process_events
+from gitconfig_watch import GitConfigWatcher, global_config_files, same_path
+from alert_spool import AlertSpool, agent_alive, write_event
+from agent_ipc import AgentClient, AgentServer, AgentUnavailable
+from push_scanner import DEFAULT_DB_PATH as PUSH_VERDICT_DB, PUSH_VERDICTS, agent_handlers as push_handlers
+
 # Không dùng keyboard listener nữa - warning được trigger từ delayed_warning sau khi AI check
 
 # ==============================
@@ -73,6 +94,15 @@ EMAIL_RECEIVER = os.getenv("EMAIL_RECEIVER")
 AZURE_ENDPOINT = os.getenv("AZURE_INFERENCE_ENDPOINT")
 AZURE_KEY = os.getenv("AZURE_INFERENCE_KEY")
 AZURE_MODEL = os.getenv("AZURE_INFERENCE_MODEL")
+CLASSIFY_DEADLINE = float(os.getenv("DLP_CLASSIFY_DEADLINE", "8"))  # Giây tối đa chờ verdict cho 1 clipboard
+DEADLINE_POLICY = os.getenv("DLP_DEADLINE_POLICY", "CODE").upper()  # CODE | TEXT | HOLD khi hết deadline
+NEAR_DUP_THRESHOLD = float(os.getenv("DLP_NEAR_DUP_THRESHOLD", "0.8"))  # Jaccard tối thiểu để dùng lại verdict snippet gần giống
+IMAGE_MAX_DISTANCE = int(os.getenv("DLP_IMAGE_MAX_DISTANCE", "4"))  # Số bit dHash lệch tối đa để coi là cùng 1 ảnh
+LARGE_TEXT_THRESHOLD = int(os.getenv("DLP_LARGE_TEXT_THRESHOLD", str(1024 * 1024)))  # Ký tự: trên ngưỡng -> không strip, hash lấy mẫu, phân loại theo cửa sổ
+HOLD_MAX_MB = int(os.getenv("DLP_HOLD_MAX_MB", "64"))  # Trần RAM cho clipboard đang bị giữ (nén zlib khi lớn)
+HOLD_SPILL_DIR = os.getenv("DLP_HOLD_SPILL_DIR", os.path.expanduser("~/.dlp_agent_hold"))  # "" = không spill ra đĩa
+GIT_CONTENT_SCAN = os.getenv("DLP_GIT_CONTENT_SCAN", "0") != "0"  # Bật (=1): push lên repo ngoài chỉ toàn TEXT thì cho qua; mặc định chặn theo URL
+ALERT_SPOOL_DIR = os.getenv("DLP_ALERT_SPOOL_DIR", os.path.expanduser("~/.dlp_agent_spool"))  # Hook ghi sự kiện, agent gửi email nền
 
 ALLOWED_APPS = {
     "Code.exe", "devenv.exe", "pycharm64.exe", "idea64.exe", "clion64.exe",
@@ -99,17 +129,16 @@ ALLOWED_DOMAINS = [
 ]
 
 STATE = {
-    "hidden_data": None,
-    "hidden_type": None,
+    "hidden_generation": None,  # Generation của clipboard đang bị giữ trong HOLD_STORE
     "current_app": "Unknown",
     "source_app": "Unknown",
     "monitor_active": False,
     "safe_hash": None,
     "content_type": None,
-    "llm_checking": False,
+    "clipboard_generation": 0,  # Tăng mỗi lần có clipboard mới cần phân loại
     "last_clipboard_hash": None,
     "browser_allowed": False,
-    "warned_hashes": set(),
+    "warned_hashes": BoundedCache(max_entries=2000, max_bytes=256 * 1024, name="warned_hashes"),  # Cảnh báo 1 lần/phiên, chỉ giới hạn bộ nhớ (LRU)
     "warning_threads": set()
 }
 
@@ -117,6 +146,7 @@ STATE = {
 WHITELIST_REPO = ["gitlab.siguna.co", "mycompany.internal"]  # Các repo được phép push
 HOOKS_DIR = os.path.join(os.path.expanduser("~"), ".dlp_git_hooks")
 HOOK_FILE = os.path.join(HOOKS_DIR, "pre-push")
+GIT_CONFIG_WATCHER = None
 
 # ==============================
 #   CORE FUNCTIONS
@@ -124,11 +154,10 @@ HOOK_FILE = os.path.join(HOOKS_DIR, "pre-push")
 def get_content_hash(data):
     if not data: return None
     if isinstance(data, str):
-        return hashlib.md5(data.encode('utf-8')).hexdigest()
+        return text_fingerprint(data, LARGE_TEXT_THRESHOLD)  # MD5, hoặc hash lấy mẫu nếu là payload lớn
     elif isinstance(data, Image.Image):
-        b = io.BytesIO()
-        data.save(b, "PNG")
-        return hashlib.md5(b.getvalue()).hexdigest()
+        # Hash buffer pixel thô (lấy mẫu) - không encode PNG mỗi lần watchdog poll
+        return image_fingerprint(data)
     return None
 
 def get_active_browser_url(app_name):
@@ -177,7 +206,7 @@ def is_domain_allowed(url):
         if domain in url: return True
     return False
 
-def clear_clipboard():
+def _win_clear_clipboard():
     """Xóa clipboard trên Windows - thread-safe"""
     try:
         with _clipboard_lock:
@@ -208,8 +237,15 @@ def clear_clipboard():
 
 # Lock để tránh race condition khi truy cập clipboard
 _clipboard_lock = threading.Lock()
+# PowerShell STA giữ sẵn WinForms để restore file object (thay vì spawn powershell mỗi lần restore)
+CLIPBOARD_HELPER = powershell_worker(name="clipboard_helper")
 
-def restore_clipboard(data_type, data):
+def warm_clipboard_helper():
+    """Khởi động PowerShell helper ngay lúc agent start để lần restore file đầu tiên không phải chờ."""
+    try: CLIPBOARD_HELPER.start()
+    except WorkerError as e: print(f"⚠️ Clipboard helper unavailable: {e}")
+
+def _win_restore_clipboard(data_type, data):
     """Restore clipboard trên Windows - thread-safe với retry logic"""
     if not data: return
     
@@ -257,21 +293,21 @@ def restore_clipboard(data_type, data):
                     # Restore file object vào clipboard Windows
                     if os.path.exists(data):
                         file_path = os.path.abspath(data)
-                        # Cách 1: Dùng PowerShell để copy file vào clipboard (đơn giản và đáng tin cậy)
+                        # Cách 1: PowerShell helper sống lâu (đã Add-Type sẵn) - chỉ tốn 1 lần ghi pipe
                         try:
-                            # Escape file path cho PowerShell
-                            escaped_path = file_path.replace('\\', '\\\\').replace('"', '\\"')
-                            ps_script = f'Add-Type -AssemblyName System.Windows.Forms; $file = New-Object System.Collections.Specialized.StringCollection; $file.Add("{escaped_path}"); [System.Windows.Forms.Clipboard]::SetFileDropList($file)'
-                            result = subprocess.run(
-                                ["powershell", "-Command", ps_script],
-                                capture_output=True,
-                                timeout=2,
-                                check=False
-                            )
-                            if result.returncode == 0:
+                            # Path đi dạng base64 rồi decode trong script: tên file không bao giờ thành mã
+                            # PowerShell (U+2018-U+201B cũng đóng chuỗi '...') và không phá giao thức từng dòng
+                            encoded_path = base64.b64encode(file_path.encode("utf-8")).decode("ascii")
+                            ps_script = ("try { $path = [System.Text.Encoding]::UTF8.GetString("
+                                         f"[System.Convert]::FromBase64String('{encoded_path}')); "
+                                         "$file = New-Object System.Collections.Specialized.StringCollection; "
+                                         "[void]$file.Add($path); "
+                                         "[System.Windows.Forms.Clipboard]::SetFileDropList($file); Write-Output 'OK' } "
+                                         "catch { Write-Output 'ERR' }")
+                            if "OK" in CLIPBOARD_HELPER.call(ps_script, timeout=2):
                                 print(f"✅ Restored File object to clipboard: {file_path}")
                                 return
-                        except Exception as e1:
+                        except WorkerError:
                             pass
                         
                         # Cách 2: Fallback - dùng win32clipboard với CF_HDROP
@@ -334,53 +370,64 @@ def restore_clipboard(data_type, data):
                 # Không print error để tránh spam log
                 # print(f"❌ Restore Error (after {max_retries} retries): {e}")
 
-def get_clipboard_hash():
-    """Get hash of current clipboard content"""
+def _win_clipboard_sequence_number():
+    """Counter của Windows tăng mỗi lần clipboard đổi - đọc không cần OpenClipboard"""
     try:
-        # Thử lấy file list trước (Windows clipboard có thể có file)
-        img = ImageGrab.grabclipboard()
-        if isinstance(img, list):
-            for path in img:
-                if os.path.isfile(path):
-                    return get_content_hash(path)  # Hash file path
-        
-        # Thử lấy text
-        content = pyperclip.paste()
-        if content:
-            return get_content_hash(content)
-        
-        # Thử lấy image
-        if isinstance(img, Image.Image):
-            return get_content_hash(img)
-    except: pass
-    return None
+        return ctypes.windll.user32.GetClipboardSequenceNumber()
+    except: return 0
 
-def get_and_clear_clipboard():
-    """Lấy dữ liệu và xóa clipboard - lưu file path, không đọc nội dung"""
+def _win_read_clipboard():
+    """Lấy dữ liệu clipboard nhưng KHÔNG xóa - lưu file path, không đọc nội dung"""
     try:
         # Thử lấy file list trước (Windows clipboard có thể có file)
         img = ImageGrab.grabclipboard()
         if isinstance(img, list):
             for path in img:
                 if os.path.isfile(path):
-                    # Lưu file path, không đọc nội dung
-                    clear_clipboard()
                     return "file", path
         
         # Thử lấy image
         if isinstance(img, Image.Image):
-            clear_clipboard()
             return "image", img
         
         # Thử lấy text
-        content = pyperclip.paste()
-        if content and content.strip():
-            data = content.strip()
-            clear_clipboard()
-            return "text", data
+        content = lazy_strip(pyperclip.paste(), LARGE_TEXT_THRESHOLD)
+        if content:
+            return "text", content
     except: pass
     return None, None
 
+# Mọi truy cập clipboard đi qua CLIPBOARD - đổi sang MemoryClipboardBackend để benchmark không cần desktop
+CLIPBOARD = CallbackBackend(_win_read_clipboard, _win_restore_clipboard, _win_clear_clipboard,
+                            _win_clipboard_sequence_number, name="win32")
+
+def clear_clipboard():
+    CLIPBOARD.clear()
+
+def restore_clipboard(data_type, data):
+    CLIPBOARD.write(data_type, data)
+
+def peek_clipboard():
+    """Lấy dữ liệu clipboard nhưng KHÔNG xóa"""
+    return CLIPBOARD.read()
+
+def get_and_clear_clipboard():
+    """Lấy dữ liệu và xóa clipboard - lưu file path, không đọc nội dung"""
+    return CLIPBOARD.read_and_clear()
+
+def get_clipboard_sequence_number():
+    return CLIPBOARD.change_count()
+
+# Restore/clear mỗi tick của watchdog: chỉ ghi khi clipboard không còn đúng dữ liệu (tránh khuấy change counter)
+WATCHDOG_RESTORER = IdempotentRestorer(restore_clipboard, peek_clipboard, clear_clipboard,
+                                       get_clipboard_sequence_number, get_content_hash, name="watchdog")
+
+def get_clipboard_hash():
+    """Get hash of current clipboard content"""
+    try:
+        return get_content_hash(CLIPBOARD.read()[1])
+    except: return None
+
 def read_file_safe(file_path):
     try:
         if not os.path.exists(file_path): return None
@@ -401,40 +448,38 @@ def ensure_single_instance():
     if kernel32.GetLastError() == 183: sys.exit(0)
     return mutex 
 
-def kill_banned_windows():
-    def kill_by_window_title():
-        if not win32gui: return
-        def callback(hwnd, extra):
-            try:
-                if win32gui.IsWindowVisible(hwnd):
-                    window_text = win32gui.GetWindowText(hwnd)
-                    for banned in BANNED_WINDOW_TITLES:
-                        if banned.lower() in window_text.lower():
-                            _, pid = win32process.GetWindowThreadProcessId(hwnd)
-                            try: psutil.Process(pid).kill()
-                            except: pass
-            except: pass
-        try: win32gui.EnumWindows(callback, None)
-        except: pass
+PROCESS_SCANNER = ProcessScanner(attrs=("name",), name="smart_killer")
+# Biên dịch 1 lần từ policy, không lower() lại danh sách cho từng process/cửa sổ
+BANNED_PROCESS_MATCHER = PatternSet(BANNED_APPS_WINDOWS, mode=EXACT, name="banned_apps")
+BANNED_TITLE_MATCHER = PatternSet(BANNED_WINDOW_TITLES, mode=SUBSTRING, name="banned_titles")
 
-    def kill_by_process_name():
-        for proc in psutil.process_iter(['pid', 'name']):
-            try:
-                name = proc.info['name'] or ""
-                for banned in BANNED_APPS_WINDOWS:
-                    if banned.lower() == name.lower():
-                        proc.kill()
-                        break
-            except: pass
+def banned_process_rule(info):
+    return BANNED_PROCESS_MATCHER.match(info['name'])
 
-    while RUN_FLAG:
+# Process mới (poll ProcessScanner) và cửa sổ mang title cấm dùng chung 1 killer + metric độ trễ
+PROCESS_KILLER = ProcessKiller(banned_process_rule, attrs=PROCESS_SCANNER.attrs, scanner=PROCESS_SCANNER,
+                               name="smart_killer", log_every=600)  # Log detect_to_kill mỗi 10 phút
+
+def kill_banned_windows():
+    """Title cửa sổ không có sự kiện tạo process -> vẫn quét EnumWindows mỗi 0.5s."""
+    def callback(hwnd, extra):
         try:
-            kill_by_window_title()
-            kill_by_process_name()
+            if win32gui.IsWindowVisible(hwnd):
+                if BANNED_TITLE_MATCHER.match(win32gui.GetWindowText(hwnd)):
+                    _, pid = win32process.GetWindowThreadProcessId(hwnd)
+                    try: psutil.Process(pid).kill()
+                    except: pass
         except: pass
+
+    while RUN_FLAG:
+        if win32gui:
+            try: win32gui.EnumWindows(callback, None)
+            except: pass
         time.sleep(0.5)
 
 def start_smart_killer():
+    # Tên process: chỉ process mới xuất hiện (PROCESS_SCANNER giữ bảng PID + create_time)
+    open_process_events(PROCESS_KILLER.handle, PROCESS_SCANNER, interval=0.5, running=lambda: RUN_FLAG).start()
     t = threading.Thread(target=kill_banned_windows); t.daemon = True; t.start()
 
 def hide_console_window():
@@ -475,6 +520,69 @@ def get_active_app_name() -> str | None:
 # ==============================
 #   GIT FIREWALL (DLP - Prevent Push to External Repos)
 # ==============================
+HOOK_CHECKER = os.path.join(HOOKS_DIR, "git_hook_check.py")
+HOOK_POLICY = os.path.join(HOOKS_DIR, "hook_policy.txt")
+# Copy vào HOOKS_DIR để hook chạy bằng python -S -E (không cần agent); push_scanner kéo theo các module còn lại
+HOOK_MODULES = ("git_hook_check.py", "alert_spool.py", "agent_ipc.py", "push_scanner.py", "code_detector.py",
+                "file_sampler.py", "verdict_store.py")
+
+def is_repo_allowed(url):
+    return any(domain and domain in url for domain in WHITELIST_REPO)
+
+def drain_command():
+    """argv của lệnh gửi hết alert trong spool rồi thoát (dùng khi agent thường trú không chạy)."""
+    if getattr(sys, 'frozen', False):
+        return [sys.executable, "--drain-alert-spool"]
+    return [sys.executable, os.path.abspath(__file__), "--drain-alert-spool"]
+
+def spool_git_push_alert(url, remote=""):
+    """Giao alert push bị chặn cho agent thường trú (IPC); agent không chạy thì ghi spool + bật drain tách rời."""
+    try:
+        with AgentClient() as client:
+            client.call("record_event", kind="git_push_blocked", url=url, remote=remote)
+        return
+    except AgentUnavailable:
+        pass
+    write_event(ALERT_SPOOL_DIR, kind="git_push_blocked", url=url, remote=remote)
+    if not agent_alive(ALERT_SPOOL_DIR):
+        subprocess.Popen(drain_command(), stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                         stderr=subprocess.DEVNULL, creationflags=0x00000008 | 0x08000000)  # DETACHED_PROCESS | CREATE_NO_WINDOW
+
+def find_hook_python():
+    """Python để chạy git_hook_check.py: chính interpreter đang chạy, hoặc python có sẵn trên máy (bản .exe)."""
+    if not getattr(sys, 'frozen', False):
+        return sys.executable
+    import shutil
+    for name in ("python3", "python", "py"):
+        path = shutil.which(name)
+        if path and "WindowsApps" not in path:  # Bỏ alias Microsoft Store (mở Store thay vì chạy python)
+            return path
+    return None
+
+def install_hook_checker():
+    """Copy HOOK_MODULES + ghi hook_policy.txt vào HOOKS_DIR. Trả về python để chạy hook, None nếu không dùng được."""
+    python = find_hook_python()
+    if not python:
+        return None
+    src_dir = sys._MEIPASS if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS') else os.path.dirname(os.path.abspath(__file__))
+    try:
+        for module in HOOK_MODULES:
+            with open(os.path.join(src_dir, module), "rb") as f:
+                source = f.read()
+            with open(os.path.join(HOOKS_DIR, module), "wb") as f:
+                f.write(source)
+        lines = ["# DLP hook policy - generated by DLP Agent, do not edit"]
+        lines += [f"allow {repo}" for repo in WHITELIST_REPO]
+        lines += [f"alert {arg}" for arg in drain_command()]
+        lines.append(f"spool {ALERT_SPOOL_DIR}")
+        lines.append(f"scan {'on' if GIT_CONTENT_SCAN else 'off'}")
+        with open(HOOK_POLICY, "w", encoding="utf-8", newline="\n") as f:
+            f.write("\n".join(lines) + "\n")
+        return python
+    except Exception as e:
+        print(f"⚠️ Hook checker not installed ({e}), falling back to agent binary")
+        return None
+
 def setup_git_firewall():
     """Cài đặt Git Firewall để ngăn push lên repo ngoài"""
     try:
@@ -486,16 +594,15 @@ def setup_git_firewall():
         if getattr(sys, 'frozen', False):
             # Nếu là executable đã đóng gói (.exe)
             agent_script = sys.executable
-            # Gọi trực tiếp binary
-            run_cmd = f'"{agent_script}"'
         else:
             # Nếu là script Python thông thường
             agent_script = os.path.abspath(__file__)
-            # Phải gọi bằng python
-            run_cmd = f'python "{agent_script}"'
         
         # Escape đường dẫn cho PowerShell
         agent_script_escaped = agent_script.replace('"', '`"')
+        spool_escaped = ALERT_SPOOL_DIR.replace('"', '`"')
+        drain_exe, *drain_rest = drain_command()
+        drain_args = ", ".join(f'"{arg}"' for arg in drain_rest)
         
         # 3. Tạo pre-push script với PowerShell (Windows)
         whitelist_str = ', '.join([f'"{repo}"' for repo in WHITELIST_REPO])
@@ -526,9 +633,17 @@ if (-not $isAllowed) {{
     Write-Host "🚫 [DLP] BLOCKED: Push to $url is not allowed." -ForegroundColor Red
     Write-Host "💡 Allowed repos: {whitelist_display}" -ForegroundColor Yellow
     
-    # Gửi email cảnh báo
-    if (Test-Path "{agent_script_escaped}") {{
-        Start-Process -FilePath "{run_cmd}" -ArgumentList "--git-push-alert", "`"$url`"" -WindowStyle Hidden
+    # Ghi alert vào spool cho agent gửi nền (không chờ SMTP); agent không chạy mới bật drain 1 lần
+    $spool = "{spool_escaped}"
+    New-Item -ItemType Directory -Force -Path $spool | Out-Null
+    $name = "$([DateTimeOffset]::UtcNow.ToUnixTimeMilliseconds())000000-$PID"
+    $now = [DateTimeOffset]::UtcNow.ToUnixTimeSeconds()
+    Set-Content -Path "$spool\$name.tmp" -Value "kind git_push_blocked`nurl $url`nremote $remote`ntime $now" -Encoding UTF8
+    Move-Item -Force "$spool\$name.tmp" "$spool\$name.evt"
+    $heartbeat = Join-Path $spool ".agent"
+    $alive = (Test-Path $heartbeat) -and ((Get-Item $heartbeat).LastWriteTime -gt (Get-Date).AddSeconds(-30))
+    if ((-not $alive) -and (Test-Path "{agent_script_escaped}")) {{
+        Start-Process -FilePath "{drain_exe}" -ArgumentList {drain_args} -WindowStyle Hidden
     }}
     
     exit 1
@@ -559,6 +674,16 @@ exit %errorlevel%
             script_path = os.path.abspath(__file__).replace('\\', '/')
             shell_run_cmd = f'"{exe}" "{script_path}"'
 
+        # Có Python -> hook chạy git_hook_check.py (chỉ import sys/os, vài chục ms);
+        # không có thì mới gọi cả agent binary (tkinter/PIL/openai... mất vài giây mỗi lần push)
+        hook_python = install_hook_checker()
+        if hook_python:
+            py = hook_python.replace('\\', '/')
+            checker = HOOK_CHECKER.replace('\\', '/')
+            check_cmd = f'"{py}" -S -E "{checker}" "$remote" "$url"'
+        else:
+            check_cmd = f'{shell_run_cmd} --check-git-push "$url" "$remote"'
+
         hook_file_sh = os.path.join(HOOKS_DIR, "pre-push")
         pre_push_sh_content = f"""#!/bin/sh
 # DLP Agent Git Firewall (Windows, shell-based)
@@ -569,10 +694,10 @@ if [ -z \"$url\" ]; then
     url=$(git config --get remote.\"$remote\".url)
 fi
 
-{shell_run_cmd} --check-git-push \"$url\"
+{check_cmd}
 exit $?
 """
-        with open(hook_file_sh, "w", encoding="utf-8", newline="\\n") as f:
+        with open(hook_file_sh, "w", encoding="utf-8", newline="\n") as f:
             f.write(pre_push_sh_content)
         
         # 5. Cấu hình Git Global
@@ -585,6 +710,8 @@ exit $?
 
 def cleanup_git_firewall():
     """Gỡ bỏ Git Firewall khi chương trình tắt"""
+    if GIT_CONFIG_WATCHER is not None:
+        GIT_CONFIG_WATCHER.stop()  # Dừng trước khi unset, không thì watcher enforce lại ngay
     try:
         # Gỡ bỏ cấu hình core.hooksPath
         subprocess.run(["git", "config", "--global", "--unset", "core.hooksPath"], 
@@ -593,29 +720,32 @@ def cleanup_git_firewall():
     except Exception as e:
         pass  # Silent fail on cleanup
 
+def enforce_hooks_path(config):
+    """on_change của GIT_CONFIG_WATCHER: chỉ gọi git khi core.hooksPath thật sự lệch HOOKS_DIR."""
+    for condition, source, path in config.conditional:
+        if not same_path(path, HOOKS_DIR):
+            print(f"⚠️ core.hooksPath={path} for repos matching {condition} ({source})")
+    if same_path(config.hooks_path, HOOKS_DIR):
+        return
+    # User đã thay đổi config, enforce lại
+    subprocess.run(["git", "config", "--global", "core.hooksPath", HOOKS_DIR],
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=5)
+    if config.hooks_source and not any(same_path(config.hooks_source, f) for f in global_config_files()):
+        # Giá trị đến từ file include.path nằm sau [core] -> ghi --global không đè được
+        print(f"⚠️ core.hooksPath overridden by include file {config.hooks_source}")
+
 def monitor_git_config():
-    """Monitor và đảm bảo Git Firewall không bị tắt khi app đang chạy"""
-    while RUN_FLAG:
-        try:
-            result = subprocess.run(["git", "config", "--global", "core.hooksPath"], 
-                                    capture_output=True, text=True, timeout=1)
-            current_path = result.stdout.strip()
-            
-            if current_path != HOOKS_DIR:
-                # User đã thay đổi config, enforce lại
-                subprocess.run(["git", "config", "--global", "core.hooksPath", HOOKS_DIR],
-                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        except: pass
-        time.sleep(5)
+    """Monitor và đảm bảo Git Firewall không bị tắt khi app đang chạy (watch file, không poll git)"""
+    global GIT_CONFIG_WATCHER
+    GIT_CONFIG_WATCHER = GitConfigWatcher(enforce_hooks_path, name="git_firewall").start()
 
 def start_git_firewall():
     """Khởi động Git Firewall và monitor thread"""
     setup_git_firewall()
     # Đăng ký cleanup khi exit
     atexit.register(cleanup_git_firewall)
-    # Chạy monitor thread
-    t = threading.Thread(target=monitor_git_config, daemon=True)
-    t.start()
+    # Chạy watcher thread
+    monitor_git_config()
 
 # ==============================
 #   EMAIL ALERT LOGIC (MICROSOFT PURVIEW STYLE) - GIỮ NGUYÊN
@@ -787,9 +917,9 @@ def send_email_file_copy(file_path, violated_app="Unknown App"):
         print(f"Email Error: {e}")
 
 def send_email_git_push(repo_url, violated_app="Git"):
-    """Gửi email cảnh báo DLP cho Git Push repo ngoài whitelist."""
+    """Gửi email cảnh báo DLP cho Git Push repo ngoài whitelist. False nếu gửi lỗi (spool sẽ thử lại)."""
     if not EMAIL_SENDER or not EMAIL_PASSWORD or not EMAIL_RECEIVER:
-        return
+        return True  # Chưa cấu hình email: không có gì để thử lại
 
     sys_info = get_system_detail()
 
@@ -839,9 +969,38 @@ def send_email_git_push(repo_url, violated_app="Git"):
         server.send_message(msg)
         server.quit()
         print("📧 [EMAIL] Git Push alert sent")
+        return True
     except Exception as e:
         print(f"Email Error: {e}")
-    
+        return False
+
+def handle_alert_event(event):
+    """Handler của ALERT_SPOOL: True = xong (xóa khỏi spool), False = thử lại sau."""
+    if event.get("kind") == "git_push_blocked":
+        return send_email_git_push(event.get("url", ""))
+    return True  # Loại sự kiện không biết: bỏ
+
+ALERT_SPOOL = AlertSpool(ALERT_SPOOL_DIR, handle_alert_event)
+
+# ==============================
+#   AGENT IPC (hook hỏi agent thường trú thay vì tự dựng lại policy/cache)
+# ==============================
+PUSH_VERDICT_STORE = VerdictStore(PUSH_VERDICT_DB, verdicts=PUSH_VERDICTS)  # Cùng file với hook, agent mở 1 lần
+
+def ipc_record_event(**fields):
+    """Hook báo sự kiện -> ghi vào spool, ALERT_SPOOL gửi ở lượt quét kế tiếp."""
+    write_event(ALERT_SPOOL_DIR, **fields)
+    return True
+
+def ipc_status():
+    """Metric của agent (git_hook_check.py --status): kill latency, spool, hit rate của cache/index/single-flight."""
+    return {"smart_killer": PROCESS_KILLER.metrics(), "alert_spool": ALERT_SPOOL.stats,
+            "classifier": dict(CLASSIFIER.stats, inflight=CLASSIFIER.inflight), "hold_store": HOLD_STORE.snapshot(),
+            "caches": [c.stats() for c in (llm_cache, STATE["warned_hashes"], LLM_FLIGHT, NEAR_DUP_INDEX, IMAGE_INDEX)]}
+
+AGENT_IPC = AgentServer({"is_allowed": is_repo_allowed, "record_event": ipc_record_event, "status": ipc_status,
+                         **push_handlers(PUSH_VERDICT_STORE)})
+
 def trigger_email_async(content, app_name="Unknown", email_type="clipboard"):
     """Trigger email async với loại email khác nhau.
     
@@ -917,20 +1076,76 @@ def show_alert(app_name, source_app="Unknown"):
 # ==============================
 #   AI ENGINE
 # ==============================
-llm_cache = {}
+llm_cache = BoundedCache(max_entries=5000, max_bytes=1024 * 1024, ttl=24 * 3600, name="llm_cache")
+LLM_CLIENT = LLMClientPool(AZURE_ENDPOINT, AZURE_KEY)  # Client + connection pool dùng chung, warm từ lúc khởi động
+LLM_FLIGHT = SingleFlight("call_azure_llm")  # Gộp các request trùng content đang bay
+NEAR_DUP_INDEX = MinHashIndex(threshold=NEAR_DUP_THRESHOLD, name="near_dup")  # Gần giống snippet CODE -> CODE (TEXT không suy từ hàng xóm)
+IMAGE_INDEX = HammingIndex(max_distance=IMAGE_MAX_DISTANCE, name="image_dhash")  # Screenshot gần giống ảnh CODE -> CODE (TEXT không suy từ ảnh gần giống)
+VERDICT_STORE = VerdictStore()  # Cache verdict trên đĩa, giữ qua các lần restart
+HOLD_STORE = HoldStore(max_bytes=HOLD_MAX_MB * 1024 * 1024, spill_dir=HOLD_SPILL_DIR or None)  # Clipboard bị giữ theo generation
+CLASSIFIER = ClassificationService(deadline=CLASSIFY_DEADLINE, deadline_policy=DEADLINE_POLICY)
 def call_azure_llm(content):
     if not content or not AZURE_KEY: return "TEXT"
-    content_hash = hashlib.md5(str(content).encode('utf-8')).hexdigest()
-    if content_hash in llm_cache: return llm_cache[content_hash]
-
+    image_fp = None
+    if isinstance(content, Image.Image):
+        # Key theo dHash: ổn định giữa các lần grab, lưu bền được (str(Image) đổi theo từng object)
+        image_fp = dhash(content)
+        content_hash = f"dhash:{image_fp:016x}"
+    else:
+        content_hash = hashlib.md5(str(content).encode('utf-8')).hexdigest()
+    cached_verdict = llm_cache.get(content_hash)
+    if cached_verdict: return cached_verdict
+
+    # Heuristic cục bộ: CODE/TEXT rõ ràng thì trả luôn, chỉ UNSURE mới gọi Azure
+    if isinstance(content, str):
+        local_verdict = classify_local(content)
+        if local_verdict != UNSURE:
+            llm_cache[content_hash] = local_verdict
+            return local_verdict
+
+        stored_verdict = VERDICT_STORE.get(content_hash)
+        if stored_verdict:
+            llm_cache[content_hash] = stored_verdict
+            NEAR_DUP_INDEX.add(content, stored_verdict)
+            return stored_verdict
+
+        # Gần giống snippet đã phân loại (thêm dòng, đổi thụt lề...) -> dùng lại verdict, không gọi Azure
+        near_verdict, similarity = NEAR_DUP_INDEX.lookup(content)
+        if near_verdict:
+            print(f"   ♻️ Near-duplicate ({similarity:.2f}) -> {near_verdict}")
+            llm_cache[content_hash] = near_verdict
+            return near_verdict
+    elif image_fp is not None:
+        stored_verdict = VERDICT_STORE.get(content_hash)
+        if stored_verdict:
+            llm_cache[content_hash] = stored_verdict
+            IMAGE_INDEX.add(image_fp, stored_verdict)
+            return stored_verdict
+
+        # Screenshot lệch vài pixel so với ảnh đã check -> dùng lại verdict, không gọi vision
+        near_verdict, distance = IMAGE_INDEX.lookup(image_fp)
+        if near_verdict:
+            print(f"   ♻️ Similar image (dHash distance {distance}) -> {near_verdict}")
+            llm_cache[content_hash] = near_verdict
+            return near_verdict
+
+    # Single-flight: các thread cùng content (switch app liên tục) chờ chung 1 request Azure
+    return LLM_FLIGHT.do(content_hash, request_azure_verdict, content, content_hash)
+
+def request_azure_verdict(content, content_hash):
+    """Gọi Azure thật (sau cache + heuristic) - chỉ chạy qua LLM_FLIGHT."""
+    # Thread trước có thể vừa ghi cache xong ngay trước khi thread này thành leader
+    cached_verdict = llm_cache.get(content_hash)
+    if cached_verdict: return cached_verdict
     try:
-        client = OpenAI(base_url=AZURE_ENDPOINT, api_key=AZURE_KEY)
+        client = LLM_CLIENT.get()
         system_prompt = "You are a DLP Agent. Input can be file content or text. If it contains source code (Python, JS, Keys, SQL), return 'CODE'. Otherwise return 'TEXT'."
         
         # Xử lý image nếu cần
         if isinstance(content, Image.Image):
             def image_to_data_url(img):
                 with io.BytesIO() as buf:
+                    img = img.copy()  # thumbnail() sửa ảnh tại chỗ - không làm hỏng dữ liệu đang giữ để restore
                     img.thumbnail((1024, 1024), Image.Resampling.LANCZOS)
                     if img.mode != "RGB": img = img.convert("RGB")
                     img.save(buf, format="PNG")
@@ -957,67 +1172,97 @@ def call_azure_llm(content):
         res_text = response.choices[0].message.content or ""
         result = "CODE" if "CODE" in res_text.upper() else "TEXT"
         llm_cache[content_hash] = result
+        VERDICT_STORE.put(content_hash, result)
+        if isinstance(content, str):
+            NEAR_DUP_INDEX.add(content, result)
+        elif content_hash.startswith("dhash:"):
+            IMAGE_INDEX.add(int(content_hash[6:], 16), result)
         return result
-    except: return "CODE"
+    except Exception as e:
+        LLM_CLIENT.report_error(e)  # Lỗi kết nối -> lần gọi sau tự tạo lại client
+        return "CODE"
 
 # ==============================
 #   LOGIC PHÂN TÍCH
 # ==============================
-def async_analysis_universal(data, d_type):
-    STATE["llm_checking"] = True
-    try:
-        # Nếu là file, đọc nội dung để check AI (nhưng restore thì restore file path)
-        if d_type == "file":
-            content = read_file_safe(data)
-            
-            # Nếu là File An toàn (Binary/Ảnh/File Safe - không đọc được)
-            if content is None:
-                STATE["content_type"] = "TEXT"
-                STATE["hidden_data"] = None 
-                STATE["safe_hash"] = get_content_hash(data)  # Hash file path
-                restore_clipboard(d_type, data)  # Restore file object
-                time.sleep(0.1)
-                STATE["last_clipboard_hash"] = get_clipboard_hash()
-                return
-            
-            # Có nội dung, check AI
-            verdict = call_azure_llm(content)
-        else:
-            # Text hoặc Image
-            content = data
-            verdict = call_azure_llm(content)
+def analyze_clipboard_data(data, d_type):
+    """Chạy trong worker của CLASSIFIER: chỉ tính verdict, không đụng tới STATE/clipboard."""
+    # Nếu là file, đọc nội dung để check AI (nhưng restore thì restore file path)
+    if d_type == "file":
+        content = sample_file(data)  # Đầu/giữa/cuối file, lấy đoạn giống code nhất
+        # File An toàn (Binary/Ảnh/File Safe - không đọc được) -> xử lý như TEXT
+        if content is None:
+            return "TEXT"
+    elif is_large(data, LARGE_TEXT_THRESHOLD):
+        # Text lớn: chỉ vài cửa sổ đầu/giữa/cuối, không quét/hash cả chuỗi
+        content = sample_text(data)
+    else:
+        # Text hoặc Image
+        content = data
+    return call_azure_llm(content)
+
+def apply_verdict(generation, verdict):
+    """Áp verdict vào STATE - bỏ qua nếu clipboard đã có generation mới hơn."""
+    if STATE["clipboard_generation"] != generation:
+        return
+    d_type, data = HOLD_STORE.get(generation)
+    if data is None:
+        return
+    STATE["content_type"] = verdict
+    
+    if verdict == "TEXT":
+        release_hidden()
+        STATE["safe_hash"] = get_content_hash(data)
+        restore_clipboard(d_type, data)  # Restore đúng type (file/text/image)
+        time.sleep(0.1)
+        STATE["last_clipboard_hash"] = get_clipboard_hash()
+    else:
+        # CODE detected
+        data_hash = get_content_hash(data)
+        print(f"   🤖 AI: CODE -> Detected (Warning will show after delay)")
         
-        STATE["content_type"] = verdict
+        # Chỉ trigger warning nếu:
+        # 1. Chưa có thread warning đang chạy cho hash này
+        # 2. Chưa hiện warning cho hash này
+        should_warn = False
         
-        if verdict == "TEXT":
-            STATE["hidden_data"] = None
-            STATE["safe_hash"] = get_content_hash(data)
-            restore_clipboard(d_type, data)  # Restore đúng type (file/text/image)
-            time.sleep(0.1)
-            STATE["last_clipboard_hash"] = get_clipboard_hash()
-        else:
-            # CODE detected
-            data_hash = get_content_hash(data)
-            print(f"   🤖 AI: CODE -> Detected (Warning will show after delay)")
-            
-            # Chỉ trigger warning nếu:
-            # 1. Chưa có thread warning đang chạy cho hash này
-            # 2. Chưa hiện warning cho hash này
-            should_warn = False
-            
-            if data_hash not in STATE["warning_threads"]:
-                if data_hash not in STATE["warned_hashes"]:
-                    should_warn = True
-            
-            if should_warn:
-                STATE["warning_threads"].add(data_hash)
-                # Trigger warning sau delay ngắn (chạy ngầm, không chặn paste)
-                threading.Thread(target=delayed_warning, args=(STATE["current_app"], STATE["source_app"], data_hash), daemon=True).start()
-            
-    finally:
-        STATE["llm_checking"] = False
+        if data_hash not in STATE["warning_threads"]:
+            if data_hash not in STATE["warned_hashes"]:
+                should_warn = True
+        
+        if should_warn:
+            STATE["warning_threads"].add(data_hash)
+            # Trigger warning sau delay ngắn (chạy ngầm, không chặn paste)
+            threading.Thread(target=delayed_warning, args=(STATE["current_app"], STATE["source_app"], data_hash, generation), daemon=True).start()
+
+def prefetch_verdict(d_type, data):
+    """Phân loại ngay lúc copy (text/file) để verdict có sẵn trong cache khi user chuyển app"""
+    analyze_clipboard_data(data, d_type)
+
+PREFETCHER = ClipboardPrefetcher(get_clipboard_sequence_number, peek_clipboard, prefetch_verdict,
+                                 fingerprint=get_content_hash)
+
+def async_analysis_universal(data, d_type):
+    """Gửi clipboard mới cho CLASSIFIER (không block); request của clipboard cũ bị hủy."""
+    STATE["clipboard_generation"] += 1
+    generation = STATE["clipboard_generation"]
+    HOLD_STORE.put(generation, d_type, data)  # Generation cũ vẫn giữ riêng tới khi được release/evict
+    STATE["hidden_generation"] = generation
+    STATE["content_type"] = None
+    CLASSIFIER.submit(generation, analyze_clipboard_data,
+                      lambda verdict: apply_verdict(generation, verdict),
+                      data, d_type)
+
+def get_hidden():
+    """(d_type, data) của clipboard đang bị giữ, (None, None) nếu không có."""
+    return HOLD_STORE.get(STATE["hidden_generation"])
 
-def delayed_warning(app_name, source_app, data_hash):
+def release_hidden():
+    """Đã trả lại/hết giữ clipboard hiện tại -> bỏ nó cùng các generation cũ hơn khỏi HOLD_STORE."""
+    generation, STATE["hidden_generation"] = STATE["hidden_generation"], None
+    HOLD_STORE.discard_through(generation)
+
+def delayed_warning(app_name, source_app, data_hash, generation):
     """Hiện cảnh báo sau khi AI xác định là CODE (không phụ thuộc Ctrl+V).
     Áp dụng cho cả browser (chatbot domain) và app ngoài whitelist."""
     try:
@@ -1048,14 +1293,16 @@ def delayed_warning(app_name, source_app, data_hash):
                         # App thường: luôn email nếu không nằm whitelist
                         should_email = True
 
-                if should_email and STATE.get("hidden_data"):
+                # Lấy đúng item đã bị phân loại CODE (không phải item mới nhất nếu user đã copy tiếp)
+                held_type, held_data = HOLD_STORE.get(generation) if should_email else (None, None)
+                if held_data:
                     # Phân biệt file vs text để gửi email đúng loại
-                    if STATE["hidden_type"] == "file":
+                    if held_type == "file":
                         # Copy FileCode
-                        trigger_email_async(STATE["hidden_data"], app_name=app_name, email_type="file")
+                        trigger_email_async(held_data, app_name=app_name, email_type="file")
                     else:
                         # Clipboard Paste (text)
-                        trigger_email_async(STATE["hidden_data"], app_name=app_name, email_type="clipboard")
+                        trigger_email_async(held_data, app_name=app_name, email_type="clipboard")
     except: 
         # Đảm bảo luôn remove khỏi warning_threads dù có lỗi
         STATE["warning_threads"].discard(data_hash)
@@ -1069,6 +1316,8 @@ def browser_watchdog_loop(app_name):
     STATE["last_clipboard_hash"] = get_clipboard_hash()
     STATE["browser_allowed"] = False
     consecutive_allowed_count = 0
+    last_seq = get_clipboard_sequence_number()
+    held_gen, held_type, held_data = None, None, None
     
     while STATE["monitor_active"] and STATE["current_app"] == app_name:
         try:
@@ -1077,8 +1326,13 @@ def browser_watchdog_loop(app_name):
             is_allowed = is_domain_allowed(current_url)
             STATE["browser_allowed"] = is_allowed
 
-            # 1. Kiểm tra Clipboard mới
-            current_hash = get_clipboard_hash()
+            # 1. Kiểm tra Clipboard mới - sequence number không đổi thì khỏi đọc lại (ImageGrab + hash)
+            seq = get_clipboard_sequence_number()
+            if seq and seq == last_seq:
+                current_hash = STATE["last_clipboard_hash"]
+            else:
+                last_seq = seq
+                current_hash = get_clipboard_hash()
             if current_hash != STATE["last_clipboard_hash"]:
                 STATE["last_clipboard_hash"] = current_hash
                 d_type, data = get_and_clear_clipboard()
@@ -1088,39 +1342,40 @@ def browser_watchdog_loop(app_name):
                     # Nếu là Safe Data -> Trả lại
                     if current_hash_check == STATE["safe_hash"]:
                         restore_clipboard(d_type, data)
-                        if STATE["hidden_data"]:
-                            STATE["hidden_data"] = None
+                        release_hidden()
                         continue
                     
                     # Data mới -> Check
                     STATE["source_app"] = app_name
-                    STATE["hidden_data"] = data
-                    STATE["hidden_type"] = d_type
-                    STATE["content_type"] = None
-                    threading.Thread(target=async_analysis_universal, args=(data, d_type)).start()
+                    async_analysis_universal(data, d_type)
                     
                     # Không restore ngay - đợi AI check xong, browser watchdog sẽ xử lý
                     continue
             
             # 2. Xử lý dữ liệu đang bị giữ (CODE) - Logic đơn giản như Mac version
+            # Chỉ giải nén từ HOLD_STORE khi generation đổi, không phải mỗi tick
+            if held_gen != STATE["hidden_generation"]:
+                held_gen = STATE["hidden_generation"]
+                held_type, held_data = get_hidden()
             if is_allowed:
                 # Domain xịn -> Restore liên tục
-                if STATE["hidden_data"]:
-                    restore_clipboard(STATE["hidden_type"], STATE["hidden_data"])
+                if held_data:
+                    WATCHDOG_RESTORER.restore(held_type, held_data)
                     consecutive_allowed_count += 1
                     
                     if consecutive_allowed_count > 33:  # ~5 giây
-                        STATE["hidden_data"] = None
+                        release_hidden()
                         consecutive_allowed_count = 0
                         print(f"   ✅ [MULTI-PASTE] Cleared state after timeout")
             else:
                 # Domain lởm -> Xóa clipboard (giống Mac version - đơn giản)
-                if STATE["hidden_data"]:
-                    clear_clipboard()
+                if held_data:
+                    WATCHDOG_RESTORER.clear()
                 consecutive_allowed_count = 0
             
-            # Nếu không có hidden_data -> sleep
-            if not STATE["hidden_data"]:
+            # Nếu không có dữ liệu bị giữ -> sleep
+            if STATE["hidden_generation"] is None:
+                held_gen, held_type, held_data = None, None, None
                 time.sleep(0.3)
                 continue
 
@@ -1133,10 +1388,11 @@ def browser_watchdog_loop(app_name):
 # ==============================
 def handle_switch(app_name):
     if app_name in ALLOWED_APPS:
-        if STATE["hidden_data"]:
-            restore_clipboard(STATE["hidden_type"], STATE["hidden_data"])
+        hidden_type, hidden_data = get_hidden()
+        if hidden_data:
+            restore_clipboard(hidden_type, hidden_data)
             print(f"✅ [RESTORE] {app_name}")
-            STATE["hidden_data"] = None
+        release_hidden()
         return
 
     if app_name in BROWSER_APPS:
@@ -1145,10 +1401,7 @@ def handle_switch(app_name):
             if get_content_hash(data) == STATE["safe_hash"]:
                  restore_clipboard(d_type, data)
             else:
-                STATE["hidden_data"] = data
-                STATE["hidden_type"] = d_type
-                STATE["content_type"] = None
-                threading.Thread(target=async_analysis_universal, args=(data, d_type)).start()
+                async_analysis_universal(data, d_type)
         
         threading.Thread(target=browser_watchdog_loop, args=(app_name,), daemon=True).start()
         return
@@ -1156,10 +1409,9 @@ def handle_switch(app_name):
     # App thường
     d_type, data = get_and_clear_clipboard()
     if not data:
-        if STATE["hidden_data"]: 
-            d_type = STATE["hidden_type"]
-            data = STATE["hidden_data"]
-        else: return
+        d_type, data = get_hidden()
+        if not data: return
+        release_hidden()  # Được giữ lại dưới generation mới ngay bên dưới
 
     # App KHÔNG được phép: xóa clipboard ngay để chặn paste tức thì
     clear_clipboard()
@@ -1168,11 +1420,8 @@ def handle_switch(app_name):
         restore_clipboard(d_type, data)
         return
 
-    STATE["hidden_data"] = data
-    STATE["hidden_type"] = d_type
-    STATE["content_type"] = None
     print(f"🔒 [BLOCK] {app_name}. Checking...")
-    threading.Thread(target=async_analysis_universal, args=(data, d_type)).start()
+    async_analysis_universal(data, d_type)
 
 # Không dùng keyboard listener nữa - warning được trigger từ delayed_warning sau khi AI check xong
 
@@ -1188,6 +1437,11 @@ def main_loop():
 
     start_smart_killer()
     start_git_firewall()  # Khởi động Git Firewall
+    ALERT_SPOOL.start()  # Gửi alert do git hook để lại (kể cả lúc agent tắt)
+    AGENT_IPC.start()  # Named pipe cho hook: quét push / ghi alert bằng state đang nóng của agent
+    LLM_CLIENT.start()  # Mở sẵn kết nối Azure + keep-alive
+    PREFETCHER.start()  # Phân loại trước từ lúc copy (GetClipboardSequenceNumber)
+    threading.Thread(target=warm_clipboard_helper, daemon=True).start()
     
     last_app = None
     while RUN_FLAG:
@@ -1241,22 +1495,28 @@ if __name__ == "__main__":
     if len(sys.argv) > 1 and sys.argv[1] == "--check-git-push":
         url = sys.argv[2] if len(sys.argv) > 2 else ""
         # Cho phép nếu URL thuộc whitelist
-        allowed = False
-        for domain in WHITELIST_REPO:
-            if domain and domain in url:
-                allowed = True
-                break
-        if allowed:
+        if is_repo_allowed(url):
             sys.exit(0)
-        # Repo ngoài whitelist → chặn và gửi email
+        # Repo ngoài whitelist → quét nội dung push (workers=1: bản .exe không dùng process pool)
+        if GIT_CONTENT_SCAN:
+            from push_scanner import check_push
+            remote = sys.argv[3] if len(sys.argv) > 3 else url
+            if check_push(remote, url, sys.stdin, workers=1):
+                sys.exit(0)
+        # Có code / không quét được → chặn, alert đi qua spool (git nhận exit code ngay)
         try:
             print(f"🚫 [DLP] BLOCKED: Push to {url} is not allowed.")
             print(f"💡 Allowed repos: {', '.join(WHITELIST_REPO)}")
-            send_email_git_push(url)
+            spool_git_push_alert(url, sys.argv[3] if len(sys.argv) > 3 else "")
         except Exception as e:
-            print(f"Error sending git push alert: {e}", file=sys.stderr)
+            print(f"Error queueing git push alert: {e}", file=sys.stderr)
         sys.exit(1)
 
+    # 3b. Gửi hết alert trong spool rồi thoát (hook bật khi agent thường trú không chạy)
+    if len(sys.argv) > 1 and sys.argv[1] == "--drain-alert-spool":
+        AlertSpool(ALERT_SPOOL_DIR, handle_alert_event, heartbeat=False).drain()
+        sys.exit(0)
+
     # 4. Git Push Alert Handler cũ (giữ lại cho tương thích nếu có nơi khác gọi)
     if len(sys.argv) > 1 and sys.argv[1] == "--git-push-alert":
         if len(sys.argv) > 2:
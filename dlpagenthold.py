@@ -21,6 +21,10 @@ import pyperclip
 import psutil
 from openai import OpenAI
 
+from bounded_cache import BoundedCache
+from clipboard_backend import ChangeGate, native_change_counter
+from verdict_store import VerdictStore
+
 # Thư viện lắng nghe bàn phím
 try:
     from pynput import keyboard
@@ -538,6 +542,8 @@ def trigger_email_async(content, app_name="Unknown"):
 # ==============================
 #   AI CLASSIFICATION
 # ==============================
+VERDICT_STORE = VerdictStore()  # Cache verdict trên đĩa, dùng chung giữa các lần restart
+
 def hash_data(d):
     if isinstance(d, str): 
         return hashlib.sha256(d.encode('utf-8','ignore')).hexdigest()
@@ -551,15 +557,26 @@ def call_llm(client, model, content):
             res = client.chat.completions.create(model=model, messages=msgs, max_tokens=20, temperature=0)
             out = res.choices[0].message.content or ""
             return "CODE" if "CODE" in out else "TEXT"
-        except: return "CODE"
+        except: return None  # Caller tự fallback CODE, không lưu bền lỗi
     return "TEXT"
 
+def classify_with_store(client, model, content, content_hash):
+    """Tra cache verdict trên đĩa trước khi gọi LLM - lỗi LLM (fallback CODE) không được lưu bền"""
+    result = VERDICT_STORE.get(content_hash)
+    if result:
+        return result
+    result = call_llm(client, model, content)
+    if result is None:
+        return "CODE"  # Default to CODE nếu lỗi
+    VERDICT_STORE.put(content_hash, result)
+    return result
+
 # ==============================
 #   MAIN LOOP (SAME APP POLICY)
 # ==============================
 def main_loop(url, key, model):
     client = OpenAI(base_url=url, api_key=key)
-    cache = {}
+    cache = BoundedCache(max_entries=5000, max_bytes=1024 * 1024, ttl=24 * 3600, name="verdict_cache")
     
     source_content = None
     source_type = None
@@ -572,6 +589,10 @@ def main_loop(url, key, model):
     # Khởi động keyboard listener
     start_keyboard_listener()
 
+    # Chỉ gọi get_clipboard_mac (osascript + paste) và hash lại khi changeCount đổi
+    gate = ChangeGate(native_change_counter(), name="main_loop", log_every=6000)
+    curr_type, curr_data, curr_hash = "empty", None, None
+
     while RUN_FLAG:
         try:
             current_app_name = get_active_app_name_mac()
@@ -580,7 +601,9 @@ def main_loop(url, key, model):
             if current_app_name:
                 GLOBAL_STATE["current_app"] = current_app_name
             
-            curr_type, curr_data = get_clipboard_mac()
+            if gate.changed():
+                curr_type, curr_data = get_clipboard_mac()
+                curr_hash = hash_data(curr_data) if curr_type != "empty" else None
             
             # --- 1. CLIPBOARD RỖNG + ĐANG BLOCK → Restore nếu quay lại SAME APP ---
             if curr_type == "empty" and GLOBAL_STATE["is_blocked"] and source_content:
@@ -596,8 +619,6 @@ def main_loop(url, key, model):
             if curr_type == "empty":
                 time.sleep(0.1); continue
 
-            curr_hash = hash_data(curr_data)
-
             # --- 2. PHÁT HIỆN SAO CHÉP MỚI → CHẶN NGAY LẬP TỨC ---
             if curr_hash != source_hash:
                 # CHẶN NGAY LẬP TỨC (Zero Trust) - Trước khi lưu thông tin
@@ -649,7 +670,8 @@ def main_loop(url, key, model):
                             cache[original_hash] = check_result
                     
                     if check_result is None:
-                        check_result = call_llm(client, model, content_to_check)
+                        # Key đĩa = hash nội dung (với file, original_hash chỉ là hash đường dẫn)
+                        check_result = classify_with_store(client, model, content_to_check, hash_data(content_to_check))
                         cache[original_hash] = check_result
 
                 if check_result == "TEXT":
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""Lấy mẫu file lớn bằng seek (đầu / giữa / cuối) thay vì chỉ đọc 5000 ký tự đầu.
+
+Mỗi cửa sổ được chấm điểm cục bộ bằng code_detector; chỉ cửa sổ giống code nhất được đưa lên LLM.
+Text clipboard lớn dùng cùng cách lấy mẫu, cửa sổ là slice của chuỗi thay vì seek.
+"""
+from __future__ import annotations
+import os
+
+from code_detector import CODE, classify_local, score_text
+
+WINDOW_BYTES = 3000          # = phần call_azure_llm gửi lên LLM, không đọc thừa
+TOTAL_BUDGET = 4 * WINDOW_BYTES
+BINARY_PROBE_BYTES = 4096
+# Thứ tự lấy mẫu theo vị trí tương đối trong file: đầu, giữa, cuối, rồi 1/4 và 3/4
+SAMPLE_POINTS = (0.0, 0.5, 1.0, 0.25, 0.75)
+
+
+def _trim_partial_lines(text, offset, length, size):
+    """Bỏ dòng bị cắt dở ở 2 đầu cửa sổ (trừ khi chạm đầu/cuối nguồn)."""
+    if offset > 0:
+        nl = text.find("\n")
+        if nl != -1:
+            text = text[nl + 1:]
+    if offset + length < size:
+        nl = text.rfind("\n")
+        if nl > 0:
+            text = text[:nl]
+    return text
+
+
+def window_offsets(size, window=WINDOW_BYTES, budget=TOTAL_BUDGET):
+    """Các offset cửa sổ sẽ được đọc theo SAMPLE_POINTS (bỏ trùng, trong budget) - theo thứ tự duyệt."""
+    offsets = []
+    for point in SAMPLE_POINTS:
+        if (len(offsets) + 1) * window > budget:
+            break
+        offset = min(int(point * size), size - window)
+        if offset not in offsets:
+            offsets.append(offset)
+    return offsets
+
+
+def iter_windows(read, size, window=WINDOW_BYTES, budget=TOTAL_BUDGET):
+    """Text từng cửa sổ (đã bỏ dòng cắt dở) của nguồn bytes read(offset, length), theo window_offsets."""
+    for offset in window_offsets(size, window, budget):
+        raw = read(offset, window)
+        yield _trim_partial_lines(raw.decode("utf-8", errors="ignore"), offset, len(raw), size)
+
+
+def _best_window(windows):
+    """Duyệt các cửa sổ: CODE chắc chắn thì dừng sớm, không thì lấy cửa sổ điểm cao nhất."""
+    best_text, best_score = None, None
+    for text in windows:
+        if not text.strip():
+            continue
+        if classify_local(text) == CODE:
+            return text
+        score = score_text(text)
+        if best_score is None or score > best_score:
+            best_text, best_score = text, score
+    return best_text
+
+
+def sample_bytes(read, size, window=WINDOW_BYTES, budget=TOTAL_BUDGET):
+    """Lấy mẫu từ nguồn bytes bất kỳ: read(offset, length) -> bytes. None nếu là binary (có NUL ở đầu)."""
+    head = read(0, min(size, max(window, BINARY_PROBE_BYTES)))
+    if b"\0" in head[:BINARY_PROBE_BYTES]:
+        return None
+    if size <= window:
+        return head.decode("utf-8", errors="ignore")
+    return _best_window(iter_windows(read, size, window, budget))
+
+
+def sample_file(file_path, window=WINDOW_BYTES, budget=TOTAL_BUDGET):
+    """Trả về đoạn text đại diện nhất để phân loại, None nếu file binary/không đọc được.
+
+    Dừng sớm ở cửa sổ đầu tiên classify_local chắc chắn là CODE; nếu không có thì lấy
+    cửa sổ điểm cao nhất (file văn xuôi -> cửa sổ nào cũng TEXT, LLM sẽ được bỏ qua).
+    """
+    try:
+        size = os.path.getsize(file_path)
+        with open(file_path, "rb") as f:
+            def read(offset, length):
+                f.seek(offset)
+                return f.read(length)
+            return sample_bytes(read, size, window, budget)
+    except Exception:
+        return None
+
+
+def sample_text(text, window=WINDOW_BYTES, budget=TOTAL_BUDGET):
+    """Như sample_file nhưng cho text clipboard lớn đã nằm trong RAM: mỗi cửa sổ chỉ là 1 slice nhỏ."""
+    size = len(text)
+    if size <= window:
+        return text
+
+    windows = (_trim_partial_lines(text[offset:offset + window], offset, window, size)
+               for offset in window_offsets(size, window, budget))
+    return _best_window(windows) or text[:window]
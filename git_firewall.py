@@ -2,16 +2,25 @@ import os
 import subprocess
 import stat
 import time
-import threading
 import atexit
 import signal
 import sys
 
+from gitconfig_watch import GitConfigWatcher, same_path
+
 # --- Cấu hình ---
 WHITELIST_REPO = ["gitlab.siguna.co", "mycompany.internal"]
 HOME_DIR = os.path.expanduser("~")
 HOOKS_DIR = os.path.join(HOME_DIR, ".dlp_git_hooks")
 HOOK_FILE = os.path.join(HOOKS_DIR, "pre-push")
+GIT_CONFIG_WATCHER = None
+# DLP_GIT_CONTENT_SCAN=1: repo ngoài whitelist vẫn được push nếu push_scanner (cạnh file này) thấy toàn TEXT
+GIT_CONTENT_SCAN = os.getenv("DLP_GIT_CONTENT_SCAN", "0") != "0"
+PUSH_SCANNER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "push_scanner.py")
+SCAN_BLOCK = f"""
+# Quét nội dung push (stdin: các dòng ref git gửi cho hook)
+"{sys.executable}" -S -E "{PUSH_SCANNER}" "$remote" "$url" && exit 0
+""" if GIT_CONTENT_SCAN else ""
 
 PRE_PUSH_SCRIPT = f"""#!/bin/bash
 # DLP Agent Git Firewall
@@ -29,7 +38,7 @@ for domain in "${{ALLOWED_IPS[@]}}"; do
         exit 0 # Allowed
     fi
 done
-
+{SCAN_BLOCK}
 echo "🚫 [DLP] BLOCKED: Push to $url is not allowed."
 exit 1
 """
@@ -59,6 +68,8 @@ def setup_git_firewall():
 def cleanup_git_firewall():
     """Hàm này sẽ chạy khi chương trình tắt để trả lại config cũ"""
     print("\n🧹 Đang dọn dẹp Git Firewall...")
+    if GIT_CONFIG_WATCHER is not None:
+        GIT_CONFIG_WATCHER.stop()  # Không thì watcher thấy unset và enforce lại ngay
     try:
         # Gỡ bỏ cấu hình core.hooksPath
         subprocess.run(["git", "config", "--global", "--unset", "core.hooksPath"], 
@@ -72,20 +83,17 @@ def cleanup_git_firewall():
     except Exception as e:
         print(f"❌ Cleanup Error: {e}")
 
+def enforce_hooks_path(config):
+    """Chỉ gọi git khi core.hooksPath (đọc thẳng từ file config) lệch HOOKS_DIR"""
+    if not same_path(config.hooks_path, HOOKS_DIR):
+        # print("⚠️ Git config modified! Re-enforcing firewall...")
+        subprocess.run(["git", "config", "--global", "core.hooksPath", HOOKS_DIR],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=5)
+
 def monitor_git_config():
-    """Loop check để đảm bảo user không tắt firewall khi app đang chạy"""
-    while True:
-        try:
-            result = subprocess.run(["git", "config", "--global", "core.hooksPath"], 
-                                    capture_output=True, text=True)
-            current_path = result.stdout.strip()
-            
-            if current_path != HOOKS_DIR:
-                # print("⚠️ Git config modified! Re-enforcing firewall...")
-                subprocess.run(["git", "config", "--global", "core.hooksPath", HOOKS_DIR],
-                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        except: pass
-        time.sleep(5)
+    """Watch ~/.gitconfig (+ include.path) để đảm bảo user không tắt firewall khi app đang chạy"""
+    global GIT_CONFIG_WATCHER
+    GIT_CONFIG_WATCHER = GitConfigWatcher(enforce_hooks_path, name="git_firewall").start()
 
 # --- Xử lý sự kiện tắt chương trình ---
 def handle_exit(signum, frame):
@@ -106,8 +114,7 @@ if __name__ == "__main__":
     
     # 2. Chạy luồng bảo vệ
     try:
-        t = threading.Thread(target=monitor_git_config, daemon=True)
-        t.start()
+        monitor_git_config()
     except Exception as e:
         print(f"❌ Thread Error: {e}")
     
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""Entry point tối giản cho pre-push hook: chỉ dùng sys/os, không đụng tới agent (tkinter, PIL, openai...).
+
+Hook gọi:  python -S -E git_hook_check.py <remote> <url>
+           python -S -E git_hook_check.py --scan <remote> <url>   (chỉ quét nội dung, exit 0 = toàn TEXT)
+Tay:       python git_hook_check.py --status   (in metric của agent đang chạy dạng JSON: cache hit rate, kill...)
+Policy do agent ghi cạnh script (hook_policy.txt), mỗi dòng 1 lệnh:
+    allow <domain>      repo được phép push
+    alert <arg>         argv (từng phần) của lệnh drain spool 1 lần - chỉ chạy khi agent không chạy
+    spool <dir>         thư mục alert_spool: push bị chặn -> ghi 1 file sự kiện, agent gửi email ở nền
+    scan on             repo ngoài whitelist: quét nội dung push (push_scanner), chỉ toàn TEXT thì cho qua
+Chỉ khi remote ngoài whitelist mới import push_scanner/subprocess - đường "được phép" không import gì thêm.
+Đường bị chặn hỏi agent thường trú qua agent_ipc (quét push, ghi alert); agent không chạy -> tự làm cục bộ.
+"""
+import os
+import sys
+
+POLICY_FILE = "hook_policy.txt"
+AGENT_SCAN_TIMEOUT = 30.0   # Giây chờ agent quét hộ; quá -> hook tự quét
+
+
+def load_policy(path):
+    """-> dict allowed/alert/spool/scan. Không đọc được policy -> allowed rỗng = chặn tất cả (fail closed)."""
+    allowed, alert, spool, scan = [], [], None, False
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.rstrip("\r\n")
+                if not line or line.startswith("#"):
+                    continue
+                key, _, value = line.partition(" ")
+                if key == "allow" and value.strip():
+                    allowed.append(value.strip())
+                elif key == "alert" and value:
+                    alert.append(value)
+                elif key == "spool" and value.strip():
+                    spool = value.strip()
+                elif key == "scan":
+                    scan = value.strip() == "on"
+    except OSError:
+        pass
+    return {"allowed": allowed, "alert": alert, "spool": spool, "scan": scan}
+
+
+def is_allowed(url, allowed):
+    return any(domain in url for domain in allowed)
+
+
+def remote_url(remote):
+    import subprocess
+    try:
+        out = subprocess.run(["git", "config", "--get", f"remote.{remote}.url"],
+                             capture_output=True, text=True, timeout=5)
+        return out.stdout.strip()
+    except Exception:
+        return ""
+
+
+def ask_agent(op, timeout=None, **args):
+    """Gọi agent thường trú qua agent_ipc; None nếu agent không chạy (caller tự xử lý cục bộ)."""
+    try:
+        from agent_ipc import AgentClient, AgentUnavailable
+    except ImportError:   # HOOKS_DIR cài từ bản cũ chưa có agent_ipc.py
+        return None
+    try:
+        with AgentClient() as client:
+            return client.call(op, timeout=timeout, **args)
+    except AgentUnavailable:
+        return None
+
+
+def scan_push(remote, url, stdin):
+    """Quét nội dung push: nhờ agent (detector + verdict DB đã nạp sẵn), agent không chạy / trả việc lại
+    (push quá nhiều blob mới) -> import push_scanner và tự quét."""
+    lines = stdin.read()
+    # Agent chạy ở thư mục khác: gửi đường dẫn tuyệt đối (GIT_DIR nếu git đặt cho hook)
+    repo = os.path.abspath(os.path.join(os.getcwd(), os.environ.get("GIT_DIR", "")))
+    result = ask_agent("check_push", timeout=AGENT_SCAN_TIMEOUT, cwd=repo, remote=remote, url=url, lines=lines)
+    if result is None:
+        from push_scanner import check_push   # Cùng thư mục hook (agent copy kèm)
+        return check_push(remote, url, lines.splitlines())
+    for line in result["lines"]:
+        say(line)
+    return result["allowed"]
+
+
+def send_alert(alert, spool, url, remote):
+    """Giao sự kiện cho agent (IPC); không được thì ghi spool, agent cũng không chạy -> bật drain tách khỏi hook."""
+    if ask_agent("record_event", kind="git_push_blocked", url=url, remote=remote):
+        return
+    if spool:
+        from alert_spool import agent_alive, write_event
+        try:
+            write_event(spool, kind="git_push_blocked", url=url, remote=remote)
+        except OSError:
+            return
+        if agent_alive(spool):
+            return
+    if not alert:
+        return
+    import subprocess
+    kwargs = {"stdin": subprocess.DEVNULL, "stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
+    if os.name == "nt":
+        kwargs["creationflags"] = 0x00000008 | 0x08000000  # DETACHED_PROCESS | CREATE_NO_WINDOW
+    else:
+        kwargs["start_new_session"] = True
+    try:
+        subprocess.Popen(alert, **kwargs)
+    except OSError:
+        pass
+
+
+def say(message):
+    try:
+        sys.stderr.write(message + "\n")
+    except UnicodeEncodeError:  # Pipe cp1252 trên Windows (python -E bỏ qua PYTHONIOENCODING)
+        sys.stderr.write(message.encode("ascii", "replace").decode("ascii") + "\n")
+
+
+def print_status():
+    status = ask_agent("status")
+    if status is None:
+        say("⚠️ [DLP] agent is not running")
+        return 1
+    import json
+    print(json.dumps(status, indent=2, ensure_ascii=False))
+    return 0
+
+
+def main(argv):
+    if argv[1:2] == ["--status"]:
+        return print_status()
+    if argv[1:2] == ["--scan"]:
+        return 0 if scan_push(argv[2] if len(argv) > 2 else "", argv[3] if len(argv) > 3 else "", sys.stdin) else 1
+    remote = argv[1] if len(argv) > 1 else ""
+    url = argv[2] if len(argv) > 2 else ""
+    if not url and remote:
+        url = remote_url(remote)
+    policy = load_policy(os.path.join(os.path.dirname(os.path.abspath(__file__)), POLICY_FILE))
+    allowed = policy["allowed"]
+    if url and is_allowed(url, allowed):
+        return 0
+    if url and not allowed and ask_agent("is_allowed", url=url):   # Mất hook_policy.txt: hỏi policy của agent
+        return 0
+    if policy["scan"] and scan_push(remote, url, sys.stdin):
+        return 0
+    say(f"🚫 [DLP] BLOCKED: Push to {url} is not allowed.")
+    if allowed:
+        say(f"💡 Allowed repos: {', '.join(allowed)}")
+    send_alert(policy["alert"], policy["spool"], url, remote)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+"""Theo dõi global gitconfig (và các file include.path) để giữ core.hooksPath, không spawn `git config`.
+
+Đọc/parse config ngay trong process (theo cú pháp git-config), chỉ parse lại khi file thật sự đổi:
+Linux dùng inotify trên thư mục chứa file (git ghi config bằng .lock + rename nên watch inode file là mất;
+file chưa có thì watch thư mục tổ tiên gần nhất đang tồn tại, vd ~/.config khi chưa có ~/.config/git), nơi khác so chữ ký os.stat mỗi interval giây. Lúc rảnh: 0 subprocess.
+"""
+from __future__ import annotations
+import os
+import re
+import sys
+import time
+import select
+import struct
+import threading
+
+MAX_INCLUDE_DEPTH = 10        # Giống git
+POLL_INTERVAL = 0.5
+INOTIFY_RESCAN = 5.0          # inotify: vẫn stat định kỳ phòng sự kiện lọt (vd thư mục bị xoá rồi tạo lại)
+
+_SECTION = re.compile(r'\[\s*([A-Za-z0-9.-]+)(?:\s+"((?:[^"\\\n]|\\.)*)")?\s*\]')
+_KEY = re.compile(r'\s*([A-Za-z][A-Za-z0-9-]*)\s*(=?)')
+
+
+def git_home():
+    """Git for Windows ưu tiên %HOME% nếu có, sau đó mới tới profile người dùng."""
+    return os.environ.get("HOME") or os.path.expanduser("~")
+
+
+def global_config_files(home=None):
+    """Các file mà `git config --global` đọc, theo thứ tự (file sau đè file trước)."""
+    if os.environ.get("GIT_CONFIG_GLOBAL"):
+        return [os.environ["GIT_CONFIG_GLOBAL"]]
+    home = home or git_home()
+    xdg = os.environ.get("XDG_CONFIG_HOME") or os.path.join(home, ".config")
+    return [os.path.join(xdg, "git", "config"), os.path.join(home, ".gitconfig")]
+
+
+def expand_path(value, home=None, base_dir=None):
+    if value.startswith("~/") or value.startswith("~\\") or value == "~":
+        value = os.path.join(home or git_home(), value[2:])
+    elif base_dir and not os.path.isabs(value):
+        value = os.path.join(base_dir, value)
+    return os.path.normpath(value)
+
+
+def same_path(a, b):
+    if not a or not b:
+        return False
+    return os.path.normcase(expand_path(a)) == os.path.normcase(expand_path(b))
+
+
+def _parse_value(lines, i, text):
+    """Value git-config: quote, escape, comment #/;, nối dòng bằng '\\' cuối dòng -> (value, index dòng kế)."""
+    out, pending_space, quoted = [], "", False
+    while True:
+        j = 0
+        while j < len(text):
+            c = text[j]
+            if c == "\\":
+                if j + 1 >= len(text):  # '\' cuối dòng: nối dòng sau
+                    break
+                nxt = text[j + 1]
+                out.append(pending_space + {"n": "\n", "t": "\t", "b": "\b"}.get(nxt, nxt))
+                pending_space = ""
+                j += 2
+                continue
+            if c == '"':
+                quoted = not quoted
+            elif not quoted and c in "#;":
+                return "".join(out), i + 1
+            elif not quoted and c.isspace():
+                if out:
+                    pending_space += c
+            else:
+                out.append(pending_space + c)
+                pending_space = ""
+            j += 1
+        else:
+            return "".join(out), i + 1
+        i += 1
+        if i >= len(lines):
+            return "".join(out), i
+        text = lines[i]
+
+
+def parse_config(text):
+    """-> list (key, value) theo thứ tự xuất hiện. key = "section.key" hoặc "section.subsection.key"
+    (section/key viết thường, subsection giữ nguyên); key không có '=' -> value None (boolean true)."""
+    entries = []
+    section = None
+    lines = text.splitlines()
+    i = 0
+    while i < len(lines):
+        line = lines[i].lstrip()
+        if line.startswith("["):
+            m = _SECTION.match(line)
+            if not m:
+                section = None
+                i += 1
+                continue
+            name, sub = m.group(1).lower(), m.group(2)
+            # [section "sub"] giữ hoa thường của sub; cú pháp cũ [section.sub] viết thường cả 2
+            section = name if sub is None else name + "." + re.sub(r"\\(.)", r"\1", sub)
+            line = line[m.end():].lstrip()  # "[core] hooksPath = x" hợp lệ
+        if not line or line[0] in "#;" or section is None:
+            i += 1
+            continue
+        m = _KEY.match(line)
+        if not m:
+            i += 1
+            continue
+        key = f"{section}.{m.group(1).lower()}"
+        if m.group(2):
+            value, i = _parse_value(lines, i, line[m.end():])
+        else:
+            value, i = None, i + 1
+        entries.append((key, value))
+    return entries
+
+
+class GitConfigSnapshot:
+    """Kết quả đọc global config tại 1 thời điểm.
+
+    hooks_path / hooks_source: giá trị core.hooksPath có hiệu lực và file định nghĩa nó.
+    conditional: [(điều kiện includeIf, file, hooksPath)] - chỉ áp dụng cho repo khớp điều kiện.
+    files: mọi file đã đọc hoặc cần theo dõi (kể cả file chưa tồn tại).
+    """
+
+    def __init__(self):
+        self.hooks_path = None
+        self.hooks_source = None
+        self.conditional = []
+        self.files = []
+
+    def __repr__(self):
+        return f"GitConfigSnapshot(hooks_path={self.hooks_path!r}, files={len(self.files)})"
+
+
+def load_global_config(home=None):
+    home = home or git_home()
+    snap = GitConfigSnapshot()
+
+    def read(path, depth, condition):
+        path = os.path.normpath(path)
+        if path not in snap.files:
+            snap.files.append(path)
+        if depth > MAX_INCLUDE_DEPTH:
+            return
+        try:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                entries = parse_config(f.read())
+        except OSError:
+            return
+        base_dir = os.path.dirname(path)
+        for key, value in entries:
+            if key == "core.hookspath" and value is not None:
+                if condition is None:
+                    snap.hooks_path, snap.hooks_source = expand_path(value, home), path
+                else:
+                    snap.conditional.append((condition, path, expand_path(value, home)))
+            elif key == "include.path" and value:
+                read(expand_path(value, home, base_dir), depth + 1, condition)
+            elif key.startswith("includeif.") and key.endswith(".path") and value:
+                read(expand_path(value, home, base_dir), depth + 1, condition or key[10:-5])
+
+    for path in global_config_files(home):
+        read(path, 0, None)
+    return snap
+
+
+def _file_signature(path):
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+    except OSError:
+        return None
+
+
+def _nearest_existing_dir(path):
+    """Thư mục gần nhất đang tồn tại trên đường tới path - nơi sẽ có sự kiện khi path (hoặc cha nó) được tạo."""
+    directory = os.path.dirname(path)
+    while not os.path.isdir(directory):
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            break
+        directory = parent
+    return directory
+
+
+def _affects(path, files):
+    """Sự kiện trên path có liên quan: chính file theo dõi, hoặc thư mục trên đường tới file đó."""
+    prefix = path + os.sep
+    return any(f == path or f.startswith(prefix) for f in files)
+
+
+class _Inotify:
+    """inotify tối giản qua ctypes: watch các thư mục, trả về tên file có sự kiện."""
+
+    MASK = 0x00000008 | 0x00000080 | 0x00000100 | 0x00000200 | 0x00000040 | 0x00000002
+    #      CLOSE_WRITE  MOVED_TO     CREATE       DELETE       MOVED_FROM   MODIFY
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        self._ctypes = ctypes
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs = {}   # wd -> dir
+
+    def watch(self, directory):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK)
+        if wd >= 0:
+            self._dirs[wd] = directory
+        return wd >= 0
+
+    def read(self, timeout):
+        """Chờ tối đa timeout giây -> list đường dẫn đầy đủ có sự kiện ([] nếu hết giờ)."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        paths = []
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return []
+        offset = 0
+        while offset + self._EVENT.size <= len(data):
+            wd, _mask, _cookie, length = self._EVENT.unpack_from(data, offset)
+            offset += self._EVENT.size
+            name = data[offset:offset + length].split(b"\0", 1)[0]
+            offset += length
+            if wd in self._dirs and name:
+                paths.append(os.path.join(self._dirs[wd], os.fsdecode(name)))
+        return paths
+
+    def close(self):
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+
+
+class GitConfigWatcher:
+    """Thread daemon gọi on_change(snapshot) lúc khởi động và mỗi khi global config (hoặc include) đổi.
+
+    Chỉ gọi khi chữ ký stat (mtime, size, inode) của ít nhất 1 file thay đổi, nên việc on_change tự
+    ghi lại config (enforce) chỉ gây thêm 1 lần đọc, không lặp vô hạn.
+    """
+
+    def __init__(self, on_change, interval=POLL_INTERVAL, home=None, use_inotify=True, name="gitconfig"):
+        self.on_change = on_change
+        self.interval = interval
+        self.home = home
+        self.use_inotify = use_inotify and sys.platform.startswith("linux")
+        self.name = name
+        self.mode = None
+        self.snapshot = None
+        self._signatures = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {"reloads": 0, "events": 0}
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run_safe, name=f"watch:{self.name}", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def check(self, force=False):
+        """So chữ ký các file đang theo dõi, đổi thì đọc lại + gọi on_change. Trả về True nếu đã reload."""
+        if self._stop.is_set():   # Đã stop (vd cleanup đang unset hooksPath): không enforce lại
+            return False
+        files = self.snapshot.files if self.snapshot else []
+        signatures = {path: _file_signature(path) for path in files}
+        if not force and signatures == self._signatures:
+            return False
+        self.snapshot = load_global_config(self.home)
+        self.stats["reloads"] += 1
+        # Lấy chữ ký sau khi đọc theo danh sách file mới (include có thể vừa thêm/bớt)
+        self._signatures = {path: _file_signature(path) for path in self.snapshot.files}
+        try:
+            self.on_change(self.snapshot)
+        except Exception as e:
+            print(f"⚠️ [{self.name}] on_change error: {e}")
+        if self._stop.is_set():
+            return True
+        # on_change có thể đã ghi config: cập nhật chữ ký để không gọi lại vì chính thay đổi đó
+        self._signatures = {path: _file_signature(path) for path in self.snapshot.files}
+        return True
+
+    def _run_safe(self):
+        try:
+            self.check(force=True)
+            if self.use_inotify:
+                try:
+                    self._run_inotify()
+                    return
+                except OSError as e:
+                    print(f"ℹ️ [{self.name}] inotify unavailable ({e}), falling back to stat polling")
+            self._run_poll()
+        except Exception as e:
+            print(f"⚠️ [{self.name}] watcher stopped: {e}")
+
+    def _run_poll(self):
+        self.mode = "poll"
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def _run_inotify(self):
+        self.mode = "inotify"
+        notify, watched = None, None
+        last_check = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                # Watch lại khi danh sách include đổi hoặc thư mục tổ tiên được tạo/xoá; không tạo lại fd
+                # mỗi vòng (sẽ mất sự kiện đang chờ)
+                dirs = {_nearest_existing_dir(path) for path in self.snapshot.files}
+                if dirs != watched:
+                    if notify is not None:
+                        notify.close()
+                    rewatch, notify, watched = watched is not None, _Inotify(), dirs
+                    for directory in dirs:
+                        notify.watch(directory)
+                    # File có thể đã được ghi giữa sự kiện tạo thư mục và lúc watch xong
+                    if rewatch and self.check():
+                        last_check = time.monotonic()
+                        continue
+                paths = notify.read(INOTIFY_RESCAN)
+                if any(_affects(path, self.snapshot.files) for path in paths):
+                    self.stats["events"] += 1
+                    time.sleep(0.02)   # Gom chuỗi sự kiện của 1 lần ghi (lock -> rename)
+                elif time.monotonic() - last_check < INOTIFY_RESCAN:
+                    continue           # Sự kiện của file khác trong $HOME
+                last_check = time.monotonic()
+                self.check()
+        finally:
+            if notify is not None:
+                notify.close()
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""Tiến trình helper sống lâu: gửi lệnh qua stdin, đọc kết quả qua stdout.
+
+Thay cho việc spawn powershell/osascript mỗi lần restore clipboard - runtime (PowerShell + WinForms)
+chỉ khởi động 1 lần, mỗi lệnh sau đó chỉ tốn 1 lần ghi pipe. Chạy được với bất kỳ shell nào đọc lệnh
+từng dòng (sh, cat...) nên test/benchmark được trên Linux.
+"""
+from __future__ import annotations
+import os
+import sys
+import time
+import queue
+import itertools
+import threading
+import subprocess
+
+
+class WorkerError(Exception):
+    """Helper chết, hết thời gian chờ hoặc không khởi động được - caller tự fallback."""
+
+
+class PersistentWorker:
+    """1 subprocess giữ nguyên giữa các lệnh; tự spawn lại ở lần gọi sau nếu bị chết/treo.
+
+    end_command: template lệnh in ra marker kết thúc, ví dụ "echo {marker}" (sh),
+    "Write-Output '{marker}'" (PowerShell) hoặc "{marker}" (cat chỉ echo lại input).
+    """
+
+    def __init__(self, argv, end_command="echo {marker}", startup=(), timeout=5.0, name="helper"):
+        self.argv = list(argv)
+        self.end_command = end_command
+        self.startup = list(startup)
+        self.timeout = timeout
+        self.name = name
+        self._proc = None
+        self._lines = None
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+        self.stats = {"calls": 0, "spawns": 0, "failures": 0, "total_ms": 0.0}
+
+    # --- vòng đời tiến trình ---
+    def _spawn(self):
+        flags = getattr(subprocess, "CREATE_NO_WINDOW", 0) if sys.platform == "win32" else 0
+        try:
+            proc = subprocess.Popen(
+                self.argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                text=True, encoding="utf-8", errors="replace", bufsize=1, creationflags=flags,
+            )
+        except OSError as e:
+            raise WorkerError(f"{self.name}: cannot start {self.argv[0]}: {e}")
+        lines = queue.Queue()
+
+        def pump():
+            for line in proc.stdout:
+                lines.put(line.rstrip("\r\n"))
+            lines.put(None)  # EOF -> tiến trình đã thoát
+
+        threading.Thread(target=pump, name=f"{self.name}-stdout", daemon=True).start()
+        self._proc, self._lines = proc, lines
+        self.stats["spawns"] += 1
+        for command in self.startup:
+            self._call_locked(command, self.timeout * 2)  # Lệnh warm-up (Add-Type...) chậm hơn lệnh thường
+
+    def _kill_locked(self):
+        proc, self._proc, self._lines = self._proc, None, None
+        if proc is not None:
+            try: proc.kill()
+            except Exception: pass
+
+    @property
+    def busy(self):
+        """Đang chạy lệnh (hoặc spawn/warm-up) - lệnh mới gửi vào sẽ phải chờ."""
+        return self._lock.locked()
+
+    def start(self):
+        """Khởi động + warm-up ngay (gọi từ thread nền lúc agent start)."""
+        with self._lock:
+            if self._proc is None or self._proc.poll() is not None:
+                try:
+                    self._spawn()
+                except WorkerError:
+                    self._kill_locked()
+                    raise
+
+    def close(self):
+        with self._lock:
+            proc = self._proc
+            if proc is not None:
+                try:
+                    proc.stdin.close()
+                    proc.wait(timeout=1)
+                except Exception:
+                    pass
+            self._kill_locked()
+
+    # --- gửi lệnh ---
+    def _call_locked(self, command, timeout):
+        marker = f"__DLP_DONE_{next(self._seq)}__"
+        try:
+            self._proc.stdin.write(command + "\n" + self.end_command.format(marker=marker) + "\n")
+            self._proc.stdin.flush()
+        except (OSError, ValueError) as e:
+            raise WorkerError(f"{self.name}: pipe closed: {e}")
+        output = []
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise WorkerError(f"{self.name}: timeout after {timeout}s")
+            try:
+                line = self._lines.get(timeout=remaining)
+            except queue.Empty:
+                raise WorkerError(f"{self.name}: timeout after {timeout}s")
+            if line is None:
+                raise WorkerError(f"{self.name}: process exited")
+            if line == marker:
+                return output
+            if line != command:  # Một số shell (cat) echo lại chính lệnh
+                output.append(line)
+
+    def call(self, command, timeout=None):
+        """Chạy 1 lệnh, trả về các dòng stdout của lệnh đó. Lỗi -> kill helper, raise WorkerError."""
+        timeout = timeout or self.timeout
+        start = time.perf_counter()
+        with self._lock:
+            self.stats["calls"] += 1
+            try:
+                if self._proc is None or self._proc.poll() is not None:
+                    self._spawn()
+                output = self._call_locked(command, timeout)
+            except WorkerError:
+                self.stats["failures"] += 1
+                self._kill_locked()  # Trạng thái pipe không còn tin được -> lần sau spawn mới
+                raise
+            self.stats["total_ms"] += (time.perf_counter() - start) * 1000
+            return output
+
+
+class WorkerPool:
+    """N PersistentWorker giống nhau; lệnh đi vào worker đang rảnh, hết thì chờ theo vòng."""
+
+    def __init__(self, factory, size=1):
+        self._workers = [factory() for _ in range(size)]
+        self._next = itertools.count()
+
+    def start(self):
+        for worker in self._workers:
+            try: worker.start()
+            except WorkerError: pass
+
+    def call(self, command, timeout=None):
+        for worker in self._workers:
+            if worker.busy:
+                continue
+            return worker.call(command, timeout)
+        worker = self._workers[next(self._next) % len(self._workers)]
+        return worker.call(command, timeout)
+
+    def close(self):
+        for worker in self._workers:
+            worker.close()
+
+    def stats(self):
+        return [dict(w.stats, name=w.name) for w in self._workers]
+
+
+def powershell_worker(name="powershell_helper", startup=("Add-Type -AssemblyName System.Windows.Forms",)):
+    """PowerShell STA đọc lệnh từ stdin (Clipboard API của WinForms cần STA)."""
+    exe = "powershell.exe" if os.name == "nt" else "pwsh"
+    return PersistentWorker(
+        [exe, "-NoLogo", "-NoProfile", "-NonInteractive", "-STA", "-Command", "-"],
+        end_command="Write-Output '{marker}'", startup=startup, name=name,
+    )
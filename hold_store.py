@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""Kho giữ clipboard đang bị chặn, key theo clipboard generation.
+
+Thay cho 1 cặp STATE["hidden_data"]/["hidden_type"]: copy thứ 2 trong lúc copy thứ nhất còn đang
+phân loại không ghi đè mất dữ liệu cũ. Payload lớn được nén zlib, tổng dung lượng có trần; vượt trần
+thì entry cũ nhất được mã hóa (Fernet) rồi spill ra file tạm, không có cryptography thì bị bỏ.
+"""
+from __future__ import annotations
+import os
+import zlib
+import threading
+from collections import OrderedDict
+
+from large_payload import iter_encoded
+
+try:
+    from cryptography.fernet import Fernet
+except ImportError:
+    Fernet = None
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024        # Tổng dung lượng payload giữ trong RAM
+DEFAULT_COMPRESS_THRESHOLD = 64 * 1024      # Payload lớn hơn ngưỡng này mới nén
+DEFAULT_MAX_ITEMS = 8                       # Số generation giữ tối đa (cũ nhất bị bỏ trước)
+COMPRESS_LEVEL = 1                          # Nén nhanh: text/code vẫn giảm 3-5 lần
+
+
+class _Entry:
+    __slots__ = ("d_type", "kind", "meta", "payload", "compressed", "nbytes", "spill_path")
+
+    def __init__(self, d_type, kind, meta, payload, compressed):
+        self.d_type = d_type
+        self.kind = kind
+        self.meta = meta
+        self.payload = payload
+        self.compressed = compressed
+        self.nbytes = len(payload)
+        self.spill_path = None
+
+
+def _encode(data):
+    """data -> (kind, meta, bytes). Ảnh PIL lưu pixel thô (mode, size) để dựng lại không cần encode PNG."""
+    if isinstance(data, str):
+        return "str", None, data.encode("utf-8", "surrogatepass")
+    if isinstance(data, (bytes, bytearray)):
+        return "bytes", None, bytes(data)
+    if hasattr(data, "tobytes") and hasattr(data, "mode") and hasattr(data, "size"):
+        return "image", (data.mode, data.size), data.tobytes()
+    raise TypeError(f"HoldStore: unsupported payload type {type(data).__name__}")
+
+
+def _compress_text(text):
+    """Nén text theo từng khối đã encode: không lúc nào giữ bản bytes của cả chuỗi (clipboard vài trăm MB)."""
+    comp = zlib.compressobj(COMPRESS_LEVEL)
+    parts = [comp.compress(chunk) for chunk in iter_encoded(text)]
+    parts.append(comp.flush())
+    return b"".join(parts)
+
+
+def _decode(kind, meta, raw):
+    if kind == "str":
+        return raw.decode("utf-8", "surrogatepass")
+    if kind == "image":
+        from PIL import Image
+        mode, size = meta
+        return Image.frombytes(mode, size, raw)
+    return raw
+
+
+class HoldStore:
+    """generation -> (d_type, data), thread-safe, thứ tự theo generation (cũ -> mới).
+
+    Generation mới nhất không bao giờ bị bỏ vì vượt trần (đó là dữ liệu user đang chờ được trả lại),
+    chỉ bị spill nếu bật được mã hóa.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, compress_threshold=DEFAULT_COMPRESS_THRESHOLD,
+                 max_items=DEFAULT_MAX_ITEMS, spill_dir=None, name="hold_store"):
+        self.max_bytes = max_bytes
+        self.compress_threshold = compress_threshold
+        self.max_items = max_items
+        self.name = name
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Key chỉ nằm trong RAM của process: file spill không đọc lại được sau khi agent tắt
+        self._fernet = Fernet(Fernet.generate_key()) if (Fernet is not None and spill_dir) else None
+        self.spill_dir = spill_dir if self._fernet is not None else None
+        if self.spill_dir:
+            self._purge_stale_spills()
+        self.stats = {"puts": 0, "compressed": 0, "spilled": 0, "evicted": 0, "saved_bytes": 0}
+
+    # --- ghi / đọc ---
+    def put(self, generation, d_type, data):
+        if data is None:
+            self.discard(generation)
+            return
+        if isinstance(data, str) and len(data) > self.compress_threshold:
+            entry = _Entry(d_type, "str", None, _compress_text(data), True)
+            self.stats["compressed"] += 1
+            self.stats["saved_bytes"] += max(0, len(data) - entry.nbytes)
+            self._insert(generation, entry)
+            return
+        kind, meta, raw = _encode(data)
+        compressed = False
+        if len(raw) > self.compress_threshold:
+            packed = zlib.compress(raw, COMPRESS_LEVEL)
+            if len(packed) < len(raw):
+                self.stats["saved_bytes"] += len(raw) - len(packed)
+                raw, compressed = packed, True
+                self.stats["compressed"] += 1
+        self._insert(generation, _Entry(d_type, kind, meta, raw, compressed))
+
+    def _insert(self, generation, entry):
+        with self._lock:
+            self._drop_locked(generation)
+            self._entries[generation] = entry
+            self._bytes += entry.nbytes
+            self.stats["puts"] += 1
+            self._enforce_locked()
+
+    def get(self, generation):
+        """Trả về (d_type, data) hoặc (None, None) nếu generation không còn được giữ."""
+        if generation is None:
+            return None, None
+        with self._lock:
+            entry = self._entries.get(generation)
+            if entry is None:
+                return None, None
+            raw = self._load_locked(entry)
+        if raw is None:
+            return None, None
+        if entry.compressed:
+            raw = zlib.decompress(raw)
+        return entry.d_type, _decode(entry.kind, entry.meta, raw)
+
+    def pop(self, generation):
+        item = self.get(generation)
+        self.discard(generation)
+        return item
+
+    def discard(self, generation):
+        with self._lock:
+            self._drop_locked(generation)
+
+    def discard_through(self, generation):
+        """Bỏ generation này và mọi generation cũ hơn (đã bị clipboard mới thay thế)."""
+        if generation is None:
+            return
+        with self._lock:
+            for old in [g for g in self._entries if g <= generation]:
+                self._drop_locked(old)
+
+    def clear(self):
+        with self._lock:
+            for generation in list(self._entries):
+                self._drop_locked(generation)
+
+    def latest(self):
+        with self._lock:
+            return next(reversed(self._entries), None)
+
+    def __contains__(self, generation):
+        with self._lock:
+            return generation in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def memory_bytes(self):
+        return self._bytes
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, name=self.name, items=len(self._entries), bytes=self._bytes,
+                        spill=self.spill_dir is not None)
+
+    # --- nội bộ ---
+    def _drop_locked(self, generation):
+        entry = self._entries.pop(generation, None)
+        if entry is None:
+            return
+        if entry.spill_path:
+            try: os.remove(entry.spill_path)
+            except OSError: pass
+        else:
+            self._bytes -= entry.nbytes
+
+    def _enforce_locked(self):
+        while len(self._entries) > self.max_items:
+            oldest = next(iter(self._entries))
+            self._drop_locked(oldest)
+            self.stats["evicted"] += 1
+        if self._bytes <= self.max_bytes:
+            return
+        newest = next(reversed(self._entries))
+        for generation in list(self._entries):
+            if self._bytes <= self.max_bytes:
+                break
+            entry = self._entries[generation]
+            if entry.spill_path:
+                continue
+            if self._spill_locked(generation, entry):
+                continue
+            if generation != newest:
+                self._drop_locked(generation)
+                self.stats["evicted"] += 1
+                print(f"⚠️ [{self.name}] Over budget, dropped held clipboard #{generation}")
+
+    def _purge_stale_spills(self):
+        """File spill của lần chạy trước không giải mã được nữa (key đã mất) -> xóa."""
+        try:
+            names = os.listdir(self.spill_dir)
+        except OSError:
+            return
+        for fname in names:
+            if fname.startswith("hold_") and fname.endswith(".bin"):
+                try: os.remove(os.path.join(self.spill_dir, fname))
+                except OSError: pass
+
+    def _spill_locked(self, generation, entry):
+        if self._fernet is None:
+            return False
+        path = os.path.join(self.spill_dir, f"hold_{os.getpid()}_{generation}.bin")
+        try:
+            os.makedirs(self.spill_dir, mode=0o700, exist_ok=True)
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "wb") as f:
+                f.write(self._fernet.encrypt(entry.payload))
+        except Exception as e:
+            print(f"⚠️ [{self.name}] Spill failed: {e}")
+            return False
+        self._bytes -= entry.nbytes
+        entry.payload, entry.spill_path = None, path
+        self.stats["spilled"] += 1
+        return True
+
+    def _load_locked(self, entry):
+        if entry.spill_path is None:
+            return entry.payload
+        try:
+            with open(entry.spill_path, "rb") as f:
+                return self._fernet.decrypt(f.read())
+        except Exception as e:
+            print(f"⚠️ [{self.name}] Cannot read spilled item: {e}")
+            return None
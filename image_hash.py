@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""Perceptual hash (dHash) cho ảnh clipboard + index tra theo khoảng cách Hamming.
+
+Screenshot cùng 1 đoạn code chụp lệch vài pixel cho MD5 khác hẳn nhưng dHash gần như giữ nguyên,
+nên dùng lại được verdict cũ thay vì gửi thêm 1 request vision. Như MinHashIndex, chỉ dùng lại verdict an
+toàn khi sai (CODE): 2 screenshot cùng bố cục editor, 1 README và 1 đoạn code chứa key, chỉ lệch 1-2 bit dHash,
+nên TEXT không bao giờ được suy từ ảnh gần giống - ảnh đó đi cache hash chính xác hoặc gọi vision.
+"""
+from __future__ import annotations
+import hashlib
+import threading
+from collections import OrderedDict
+
+HASH_SIZE = 8                 # 8x8 phép so sánh -> 64 bit
+DEFAULT_MAX_DISTANCE = 4      # Số bit khác nhau tối đa để coi là cùng 1 ảnh
+REUSABLE_VERDICTS = ("CODE",)
+FINGERPRINT_SAMPLE_BYTES = 256 * 1024   # Số byte pixel tối đa đưa vào hash nhận diện thay đổi
+
+
+def buffer_fingerprint(header, buf, sample_bytes=FINGERPRINT_SAMPLE_BYTES):
+    """Hash header + mẫu cách đều trên buffer pixel thô (memoryview, không copy toàn bộ lần 2).
+
+    Bước nhảy lẻ để không trùng pha với độ rộng hàng (thường là số chẵn) - tránh chỉ lấy mẫu 1 cột.
+    """
+    mv = memoryview(buf)
+    h = hashlib.blake2b(repr(header).encode("utf-8"), digest_size=16)
+    h.update(len(mv).to_bytes(8, "little"))
+    if len(mv) <= sample_bytes:
+        h.update(mv)
+    else:
+        step = (len(mv) // sample_bytes) | 1
+        h.update(mv[::step].tobytes())
+        h.update(mv[-4096:])  # Luôn lấy trọn phần cuối (vùng hay thay đổi khi chụp lệch kích thước)
+    return h.hexdigest()
+
+
+def image_fingerprint(img):
+    """Nhận diện thay đổi ảnh clipboard: mode/size + mẫu pixel thô, thay cho PNG encode + MD5 (nhanh hơn hàng trăm lần)."""
+    return buffer_fingerprint((img.mode, img.size), img.tobytes())
+
+
+def dhash_from_pixels(pixels, width, height):
+    """dHash trên mảng grayscale (width x height, row-major): bit = pixel trái > pixel phải."""
+    fp = 0
+    bit = 0
+    for y in range(height):
+        row = y * width
+        for x in range(width - 1):
+            if pixels[row + x] > pixels[row + x + 1]:
+                fp |= 1 << bit
+            bit += 1
+    return fp
+
+
+def dhash(img, hash_size=HASH_SIZE):
+    """Thu nhỏ ảnh PIL về (hash_size+1) x hash_size grayscale rồi tính dHash (vài ms kể cả ảnh 4K)."""
+    from PIL import Image
+    if img.mode not in ("L", "RGB", "RGBA"):
+        img = img.convert("RGB")  # Ảnh palette/CMYK: resize BOX không hỗ trợ trực tiếp
+    small = img.resize((hash_size + 1, hash_size), Image.Resampling.BOX, reducing_gap=2.0).convert("L")
+    return dhash_from_pixels(small.tobytes(), hash_size + 1, hash_size)
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class HammingIndex:
+    """fingerprint -> verdict (LRU có giới hạn), tìm entry gần nhất trong max_distance bit.
+
+    Chia fingerprint thành max_distance + 1 band: 2 hash lệch <= max_distance bit chắc chắn trùng
+    ít nhất 1 band (nguyên lý chuồng bồ câu) -> chỉ so Hamming với ứng viên cùng bucket.
+    reusable: verdict được phép dùng lại cho ảnh gần giống; verdict khác không được lưu.
+    """
+
+    def __init__(self, bits=HASH_SIZE * HASH_SIZE, max_distance=DEFAULT_MAX_DISTANCE,
+                 max_entries=2000, name="hamming", reusable=REUSABLE_VERDICTS):
+        self.max_distance = max_distance
+        self.reusable = frozenset(reusable)
+        self.max_entries = max_entries
+        self.name = name
+        n_bands = max_distance + 1
+        width = bits // n_bands
+        self._bands = [(i * width, width if i < n_bands - 1 else bits - i * width) for i in range(n_bands)]
+        self._buckets = [{} for _ in self._bands]   # band -> {giá trị band: set(fingerprint)}
+        self._entries = OrderedDict()                # fingerprint -> verdict
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _band_keys(self, fp):
+        return [(fp >> start) & ((1 << width) - 1) for start, width in self._bands]
+
+    def add(self, fp, verdict):
+        if verdict not in self.reusable:
+            return
+        with self._lock:
+            if fp in self._entries:
+                self._entries[fp] = verdict
+                self._entries.move_to_end(fp)
+                return
+            self._entries[fp] = verdict
+            for bucket, key in zip(self._buckets, self._band_keys(fp)):
+                bucket.setdefault(key, set()).add(fp)
+            while len(self._entries) > self.max_entries:
+                old, _ = self._entries.popitem(last=False)
+                for bucket, key in zip(self._buckets, self._band_keys(old)):
+                    members = bucket.get(key)
+                    if members is not None:
+                        members.discard(old)
+                        if not members:
+                            del bucket[key]
+
+    def lookup(self, fp):
+        """Trả về (verdict, distance) của entry gần nhất trong ngưỡng, hoặc (None, None)."""
+        best, best_dist = None, None
+        with self._lock:
+            for bucket, key in zip(self._buckets, self._band_keys(fp)):
+                for cand in bucket.get(key, ()):
+                    dist = hamming(fp, cand)
+                    if dist <= self.max_distance and (best_dist is None or dist < best_dist):
+                        best, best_dist = cand, dist
+            if best is None:
+                self.misses += 1
+                return None, None
+            self.hits += 1
+            self._entries.move_to_end(best)
+            return self._entries[best], best_dist
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            return {"name": self.name, "entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""Chế độ payload lớn cho text clipboard (log vài trăm MB...): không copy thêm bản nào của chuỗi gốc.
+
+Dưới ngưỡng giữ nguyên hành vi cũ (strip + MD5) để key cache/verdict store không đổi; trên ngưỡng thì
+không strip, hash theo độ dài + mẫu cách đều + đầu/cuối, và chỉ phân loại vài cửa sổ có giới hạn.
+"""
+from __future__ import annotations
+import hashlib
+
+DEFAULT_THRESHOLD = 1024 * 1024        # Số ký tự từ đó coi là payload lớn
+SAMPLE_CHARS = 256 * 1024              # Số ký tự tối đa đưa vào fingerprint
+EDGE_CHARS = 4096                      # Đầu/cuối luôn hash trọn (vùng hay bị sửa khi copy lại)
+_CHUNK_CHARS = 1024 * 1024             # Encode theo khối để không tạo bản bytes của cả chuỗi
+
+
+def is_large(text, threshold=DEFAULT_THRESHOLD):
+    return isinstance(text, str) and len(text) > threshold
+
+
+def lazy_strip(text, threshold=DEFAULT_THRESHOLD):
+    """strip() cho text thường; payload lớn trả nguyên object (strip = 1 bản copy đầy đủ).
+
+    Chuỗi lớn toàn khoảng trắng -> "" (isspace dừng ngay ở ký tự đầu tiên không phải khoảng trắng).
+    """
+    if not text:
+        return text
+    if len(text) <= threshold:
+        return text.strip()
+    return "" if text.isspace() else text
+
+
+def text_fingerprint(text, threshold=DEFAULT_THRESHOLD, sample_chars=SAMPLE_CHARS):
+    """MD5 như cũ dưới ngưỡng; trên ngưỡng: blake2b(độ dài + đầu + mẫu bước lẻ + cuối), tiền tố "big:"."""
+    if len(text) <= threshold:
+        return hashlib.md5(text.encode("utf-8")).hexdigest()
+    h = hashlib.blake2b(len(text).to_bytes(8, "little"), digest_size=16)
+    step = (len(text) // sample_chars) | 1  # Bước lẻ: không trùng pha với độ dài dòng cố định
+    h.update(text[:EDGE_CHARS].encode("utf-8", "surrogatepass"))
+    h.update(text[EDGE_CHARS:-EDGE_CHARS:step].encode("utf-8", "surrogatepass"))
+    h.update(text[-EDGE_CHARS:].encode("utf-8", "surrogatepass"))
+    return "big:" + h.hexdigest()
+
+
+def iter_encoded(text, chunk_chars=_CHUNK_CHARS):
+    """Encode UTF-8 theo khối 1M ký tự - dùng cho nén/ghi file mà không giữ bytes của cả chuỗi."""
+    for start in range(0, len(text), chunk_chars):
+        yield text[start:start + chunk_chars].encode("utf-8", "surrogatepass")
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""OpenAI client dùng lâu dài: giữ connection pool HTTP, warm-up lúc khởi động, ping keep-alive."""
+from __future__ import annotations
+import time
+import threading
+
+import httpx   # Dependency bắt buộc của openai
+import openai
+from openai import OpenAI
+
+KEEPALIVE_INTERVAL = 60    # giây giữa 2 lần ping
+KEEPALIVE_EXPIRY = 300     # httpx mặc định đóng connection idle sau 5s -> nâng lên để không phải bắt tay TLS lại
+REQUEST_TIMEOUT = 15
+
+# Lỗi mạng -> bỏ client cũ, lần sau tạo lại (reconnect trong suốt với caller)
+_CONNECTION_ERRORS = (openai.APIConnectionError, httpx.TransportError)
+
+
+class LLMClientPool:
+    """Giữ 1 OpenAI client + httpx pool cho cả agent thay vì tạo mới mỗi lần cache miss."""
+
+    def __init__(self, base_url, api_key, keepalive_interval=KEEPALIVE_INTERVAL):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.keepalive_interval = keepalive_interval
+        self._client = None
+        self._lock = threading.Lock()
+        self._keepalive_thread = None
+        self.reconnects = 0
+        self.last_ping_ms = None
+
+    def get(self):
+        """Trả client hiện tại, tạo mới nếu chưa có hoặc vừa bị reset."""
+        client = self._client
+        if client is not None:
+            return client
+        with self._lock:
+            if self._client is None:
+                http_client = httpx.Client(
+                    limits=httpx.Limits(max_connections=10, max_keepalive_connections=4,
+                                        keepalive_expiry=KEEPALIVE_EXPIRY),
+                    timeout=REQUEST_TIMEOUT,
+                )
+                self._client = OpenAI(base_url=self.base_url, api_key=self.api_key,
+                                      http_client=http_client)
+            return self._client
+
+    def reset(self):
+        with self._lock:
+            client, self._client = self._client, None
+            self.reconnects += 1
+        if client is not None:
+            try: client.close()
+            except Exception: pass
+
+    def report_error(self, exc):
+        """Caller gọi khi request lỗi - chỉ reset với lỗi kết nối, lỗi API (4xx/5xx) thì giữ pool."""
+        if isinstance(exc, _CONNECTION_ERRORS):
+            self.reset()
+
+    def ping(self):
+        """Request nhẹ (GET /models) để mở/giữ kết nối TCP+TLS. 404/401 vẫn tính là đã warm."""
+        start = time.perf_counter()
+        try:
+            self.get().with_options(max_retries=0).models.list()
+        except openai.APIStatusError:
+            pass
+        except Exception as e:
+            self.report_error(e)
+            return False
+        self.last_ping_ms = (time.perf_counter() - start) * 1000
+        return True
+
+    def start(self):
+        """Warm-up ngay + chạy thread keep-alive (daemon)."""
+        if not self.base_url or not self.api_key or self._keepalive_thread:
+            return
+
+        def loop():
+            while True:
+                self.ping()
+                time.sleep(self.keepalive_interval)
+
+        self._keepalive_thread = threading.Thread(target=loop, daemon=True)
+        self._keepalive_thread.start()
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""Index MinHash (bottom-k) cho text/code: snippet gần giống (thêm 1 dòng, đổi thụt lề) dùng lại verdict cũ.
+
+Cache MD5 chỉ khớp tuyệt đối; index này đứng cạnh nó và tra theo độ tương đồng Jaccard ước lượng.
+Chỉ dùng lại verdict an toàn khi sai (mặc định CODE = chặn): text đã là TEXT rồi thêm 1 hàm vẫn giống
+~95% nhưng không còn là TEXT, nên verdict TEXT không bao giờ được suy ra từ hàng xóm.
+"""
+from __future__ import annotations
+import re
+import heapq
+import threading
+from collections import OrderedDict
+
+SKETCH_SIZE = 64             # k giá trị hash nhỏ nhất của tập shingle
+DEFAULT_THRESHOLD = 0.8      # Jaccard ước lượng tối thiểu để dùng lại verdict
+REUSABLE_VERDICTS = ("CODE",)
+SHINGLE_SIZE = 3             # Shingle = 3 token liên tiếp
+MIN_TOKENS = 12              # Snippet quá ngắn -> sketch không đáng tin, bỏ qua
+MAX_TOKENS = 4000
+_MASK = (1 << 64) - 1
+
+# Chuẩn hóa: bỏ thụt lề/khoảng trắng, không phân biệt hoa thường
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def sketch(text, k=SKETCH_SIZE):
+    """Bottom-k MinHash: 1 hash/shingle, giữ k giá trị nhỏ nhất (frozenset); None nếu text quá ngắn.
+
+    Dùng hash() của Python: đổi theo từng process (PYTHONHASHSEED) nhưng index chỉ nằm trong RAM.
+    """
+    tokens = _TOKEN_RE.findall(text.lower())[:MAX_TOKENS]
+    if len(tokens) < MIN_TOKENS:
+        return None
+    hashes = {hash(sh) & _MASK for sh in zip(*(tokens[i:] for i in range(SHINGLE_SIZE)))}
+    return frozenset(heapq.nsmallest(k, hashes))
+
+
+def similarity(a, b, k=SKETCH_SIZE):
+    """Ước lượng Jaccard từ 2 sketch: tỉ lệ phần tử của bottom-k(A ∪ B) nằm trong cả A và B."""
+    union = heapq.nsmallest(k, a | b)
+    if not union:
+        return 0.0
+    both = a & b
+    return sum(1 for h in union if h in both) / len(union)
+
+
+class MinHashIndex:
+    """sketch -> verdict, LRU có giới hạn; inverted index hash -> entry để chỉ so với ứng viên chung giá trị.
+
+    reusable: verdict được phép dùng lại cho snippet gần giống; verdict khác không được lưu.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, max_entries=5000, k=SKETCH_SIZE, name="minhash",
+                 reusable=REUSABLE_VERDICTS):
+        self.threshold = threshold
+        self.reusable = frozenset(reusable)
+        self.max_entries = max_entries
+        self.k = k
+        self.name = name
+        self._entries = OrderedDict()   # sketch (frozenset) -> verdict
+        self._postings = {}             # hash -> set(sketch)
+        self._lock = threading.Lock()
+        # Jaccard >= t thì 2 sketch chung ít nhất ~t*k giá trị; lọc ứng viên lỏng hơn 1 chút
+        self._min_shared = max(1, int(threshold * k * 0.75))
+        self.hits = 0
+        self.misses = 0
+
+    def add(self, text, verdict, sk=None):
+        if verdict not in self.reusable:
+            return
+        if sk is None:
+            sk = sketch(text, self.k)
+        if sk is None:
+            return
+        with self._lock:
+            if sk in self._entries:
+                self._entries[sk] = verdict
+                self._entries.move_to_end(sk)
+                return
+            self._entries[sk] = verdict
+            for h in sk:
+                self._postings.setdefault(h, set()).add(sk)
+            while len(self._entries) > self.max_entries:
+                old, _ = self._entries.popitem(last=False)
+                for h in old:
+                    members = self._postings.get(h)
+                    if members is not None:
+                        members.discard(old)
+                        if not members:
+                            del self._postings[h]
+
+    def lookup(self, text, sk=None):
+        """Trả về (verdict, similarity) của entry giống nhất vượt ngưỡng, hoặc (None, None)."""
+        if sk is None:
+            sk = sketch(text, self.k)
+        if sk is None:
+            return None, None
+        with self._lock:
+            shared = {}
+            for h in sk:
+                for cand in self._postings.get(h, ()):
+                    shared[cand] = shared.get(cand, 0) + 1
+            best, best_sim = None, None
+            for cand, count in shared.items():
+                if count < self._min_shared:
+                    continue
+                sim = similarity(sk, cand, self.k)
+                if sim >= self.threshold and (best_sim is None or sim > best_sim):
+                    best, best_sim = cand, sim
+            if best is None:
+                self.misses += 1
+                return None, None
+            self.hits += 1
+            self._entries.move_to_end(best)
+            return self._entries[best], best_sim
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            return {"name": self.name, "entries": len(self._entries), "hits": self.hits, "misses": self.misses}
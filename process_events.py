@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+"""Nguồn sự kiện "process mới chạy" cho smart killer + metric độ trễ phát hiện -> kill.
+
+Linux: netlink proc connector (kernel đẩy PROC_EVENT_EXEC ngay lúc exec, cần CAP_NET_ADMIN),
+không có quyền thì diff /proc mỗi 50ms. macOS/Windows: ProcessScanner (psutil) theo chu kỳ.
+Mọi nguồn gọi cùng 1 callback on_start(pid, detected_at, proc=None, info=None) -> cùng 1 quyết định kill.
+"""
+from __future__ import annotations
+import os
+import sys
+import time
+import errno
+import socket
+import struct
+import threading
+
+import psutil
+
+from process_scanner import stat_identity
+
+PROC_DIFF_INTERVAL = 0.05     # /proc diff: listdir ~200 entry tốn vài chục µs
+RECHECK_TICKS = 20            # PID mới: so stat mỗi tick ~1s; PID cũ xoay vòng, mỗi PID ~1 lần / RECHECK_TICKS tick
+NETLINK_RCVBUF = 1 << 20      # Buffer lớn để burst fork/exec ít bị ENOBUFS
+NETLINK_MAX_FAILURES = 5      # recv lỗi liên tiếp chừng này lần -> chuyển sang /proc diff
+
+# --- netlink proc connector (linux/connector.h, linux/cn_proc.h) ---
+NETLINK_CONNECTOR = 11
+CN_IDX_PROC = 1
+CN_VAL_PROC = 1
+NLMSG_DONE = 3
+PROC_CN_MCAST_LISTEN = 1
+PROC_CN_MCAST_IGNORE = 2
+PROC_EVENT_EXEC = 0x00000002
+_NLMSGHDR = struct.Struct("=IHHII")      # len, type, flags, seq, pid
+_CN_MSG = struct.Struct("=IIIIHH")       # idx, val, seq, ack, len, flags
+_PROC_EVENT = struct.Struct("=IIQ")      # what, cpu, timestamp_ns
+_EXEC_EVENT = struct.Struct("=II")       # process_pid, process_tgid
+
+
+class LatencyStats:
+    """Giữ N mẫu gần nhất (ms), trả p50/p95/max."""
+
+    def __init__(self, keep=512):
+        self.keep = keep
+        self._samples = []
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def record(self, ms):
+        with self._lock:
+            self.count += 1
+            self._samples.append(ms)
+            if len(self._samples) > self.keep:
+                del self._samples[: len(self._samples) - self.keep]
+
+    def summary(self):
+        with self._lock:
+            values = sorted(self._samples)
+        if not values:
+            return {"count": self.count, "p50": None, "p95": None, "max": None}
+        pick = lambda pct: values[min(len(values) - 1, int(len(values) * pct / 100))]
+        return {"count": self.count, "p50": pick(50), "p95": pick(95), "max": values[-1]}
+
+
+class ProcessEventSource:
+    """Base: thread daemon chạy run(), gọi on_start cho mỗi process mới.
+
+    running: callable -> False thì dừng (vd lambda: RUN_FLAG của agent), ngoài stop().
+    """
+
+    name = "base"
+
+    def __init__(self, on_start, running=None):
+        self.on_start = on_start
+        self.running = running or (lambda: True)
+        self._stop = threading.Event()
+        self._thread = None
+        self.events = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run_safe, name=f"proc_events:{self.name}", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _stopped(self, wait=0):
+        return self._stop.wait(wait) or not self.running()
+
+    def _emit(self, pid, proc=None, info=None):
+        self.events += 1
+        try:
+            self.on_start(pid, time.perf_counter(), proc, info)
+        except Exception:
+            pass
+
+    def _run_safe(self):
+        try:
+            self.run()
+        except Exception as e:
+            print(f"⚠️ [{self.name}] process event source stopped: {e}")
+
+    def run(self):
+        raise NotImplementedError
+
+
+class NetlinkProcSource(ProcessEventSource):
+    """Kernel gửi PROC_EVENT_EXEC qua netlink: phát hiện trong ~µs thay vì đợi tới vòng poll sau.
+
+    recv lỗi (ENOBUFS khi burst fork: kernel đã bỏ sự kiện) -> quét lại bằng scanner để không sót process;
+    lỗi liên tiếp NETLINK_MAX_FAILURES lần -> chạy tiếp bằng ProcDiffSource trong cùng thread.
+    """
+
+    name = "netlink"
+
+    def __init__(self, on_start, running=None, scanner=None):
+        super().__init__(on_start, running)
+        self.scanner = scanner
+        self.stats = {"overruns": 0, "errors": 0, "resyncs": 0}
+        self._sock = self._subscribe()   # Lỗi quyền (EPERM) raise ngay để caller chọn nguồn khác
+
+    @staticmethod
+    def _subscribe():
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_CONNECTOR)
+        try:
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, NETLINK_RCVBUF)
+            except OSError:
+                pass
+            sock.bind((0, CN_IDX_PROC))
+            op = struct.pack("=I", PROC_CN_MCAST_LISTEN)
+            cn = _CN_MSG.pack(CN_IDX_PROC, CN_VAL_PROC, 0, 0, len(op), 0)
+            hdr = _NLMSGHDR.pack(_NLMSGHDR.size + len(cn) + len(op), NLMSG_DONE, 0, 0, 0)
+            sock.send(hdr + cn + op)
+            sock.settimeout(0.5)  # Để vòng recv kiểm tra được stop()
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    @staticmethod
+    def parse(data):
+        """Trả về list tgid của các PROC_EVENT_EXEC trong 1 datagram (bỏ thread, chỉ lấy process)."""
+        pids = []
+        offset = 0
+        while offset + _NLMSGHDR.size <= len(data):
+            length = _NLMSGHDR.unpack_from(data, offset)[0]
+            if length < _NLMSGHDR.size:
+                break
+            body = offset + _NLMSGHDR.size + _CN_MSG.size
+            if body + _PROC_EVENT.size + _EXEC_EVENT.size <= offset + length:
+                what = _PROC_EVENT.unpack_from(data, body)[0]
+                if what == PROC_EVENT_EXEC:
+                    pid, tgid = _EXEC_EVENT.unpack_from(data, body + _PROC_EVENT.size)
+                    if pid == tgid:
+                        pids.append(tgid)
+            offset += (length + 3) & ~3   # NLMSG_ALIGN
+        return pids
+
+    def resync(self):
+        """Sự kiện có thể đã mất: báo mọi process mới/đổi binary kể từ lần scanner quét trước."""
+        if self.scanner is None:
+            return
+        self.stats["resyncs"] += 1
+        for proc, info in self.scanner.scan():
+            self._emit(proc.pid, proc, info)
+
+    def run(self):
+        failures = 0
+        try:
+            while not self._stopped():
+                try:
+                    data = self._sock.recv(4096)
+                except socket.timeout:
+                    continue
+                except OSError as e:
+                    failures += 1
+                    if e.errno == errno.ENOBUFS:
+                        self.stats["overruns"] += 1
+                    else:
+                        self.stats["errors"] += 1
+                        print(f"⚠️ [{self.name}] recv failed: {e}")
+                    if failures >= NETLINK_MAX_FAILURES:
+                        break
+                    self.resync()
+                    continue
+                failures = 0
+                for pid in self.parse(data):
+                    self._emit(pid)
+        finally:
+            self._sock.close()
+        if failures >= NETLINK_MAX_FAILURES:
+            print(f"⚠️ [{self.name}] {failures} recv failures in a row, falling back to /proc diff")
+            fallback = ProcDiffSource(lambda pid, _at, proc=None, info=None: self._emit(pid, proc, info),
+                                      running=self.running)
+            fallback._stop = self._stop   # stop() của source này dừng luôn fallback
+            self.resync()
+            fallback.run()
+
+
+class ProcDiffSource(ProcessEventSource):
+    """Fallback Linux không cần quyền: so tập PID trong /proc giữa 2 lần listdir."""
+
+    name = "proc_diff"
+
+    def __init__(self, on_start, interval=PROC_DIFF_INTERVAL, proc_root="/proc", running=None):
+        super().__init__(on_start, running)
+        self.interval = interval
+        self.proc_root = proc_root
+
+    def _pids(self):
+        return {int(n) for n in os.listdir(self.proc_root) if n.isdigit()}
+
+    def _identity(self, pid):
+        return stat_identity(pid, self.proc_root)
+
+    def run(self):
+        known = {pid: self._identity(pid) for pid in self._pids()}   # pid -> (comm, starttime)
+        young = {}     # pid -> số tick còn so mỗi tick
+        backlog = []   # PID cũ chờ tới lượt so trong vòng xoay hiện tại
+        while not self._stopped(self.interval):
+            current = self._pids()
+            for pid in [p for p in known if p not in current]:
+                del known[pid]
+                young.pop(pid, None)
+            # exec giữ nguyên PID nên chỉ thấy qua comm: PID mới (có thể vẫn là bản fork mang tên process cha)
+            # so mỗi tick, PID còn lại so xoay vòng ~len/RECHECK_TICKS PID mỗi tick -> chi phí gần như cố định
+            # mà process exec sau bao lâu cũng bị bắt trong ~RECHECK_TICKS tick
+            if not backlog:
+                backlog = [pid for pid in known if pid not in young]
+            batch = backlog[-max(1, len(known) // RECHECK_TICKS):]
+            del backlog[-len(batch):]
+            for pid in list(young) + batch:
+                if pid in young:
+                    young[pid] -= 1
+                    if young[pid] <= 0:
+                        del young[pid]
+                if pid not in known:
+                    continue
+                identity = self._identity(pid)
+                if identity is not None and identity != known[pid]:
+                    known[pid] = identity
+                    self._emit(pid)
+            for pid in current - known.keys():
+                known[pid] = self._identity(pid)
+                young[pid] = RECHECK_TICKS
+                self._emit(pid)
+
+
+class ScannerPollSource(ProcessEventSource):
+    """macOS/Windows: ProcessScanner mỗi interval giây, process mới kèm sẵn info (khỏi đọc lại)."""
+
+    name = "scanner_poll"
+
+    def __init__(self, on_start, scanner, interval=1.0, first_scan=True, running=None):
+        super().__init__(on_start, running)
+        self.scanner = scanner
+        self.interval = interval
+        self.first_scan = first_scan
+
+    def poll_once(self):
+        for proc, info in self.scanner.scan():
+            self._emit(proc.pid, proc, info)
+
+    def run(self):
+        if self.first_scan:
+            self.poll_once()  # Lần đầu: mọi process đang chạy đều là "mới" (app cấm mở trước agent)
+        while not self._stopped(self.interval):
+            self.poll_once()
+
+
+def open_process_events(on_start, scanner, interval=1.0, prefer_netlink=True, running=None):
+    """Chọn nguồn tốt nhất có thể: netlink -> /proc diff (Linux), ProcessScanner poll (nơi khác).
+
+    Trên Linux vẫn quét 1 lượt bằng scanner lúc khởi động để bắt process đã chạy trước agent.
+    """
+    if sys.platform.startswith("linux"):
+        for proc, info in scanner.scan():
+            on_start(proc.pid, time.perf_counter(), proc, info)
+        if prefer_netlink:
+            try:
+                return NetlinkProcSource(on_start, running, scanner)
+            except OSError as e:
+                print(f"ℹ️ netlink proc connector unavailable ({e}), falling back to /proc diff")
+        return ProcDiffSource(on_start, running=running)
+    return ScannerPollSource(on_start, scanner, interval, running=running)
+
+
+class ProcessKiller:
+    """Quyết định kill chung cho mọi nguồn sự kiện.
+
+    decide(info) -> lý do (truthy) nếu phải kill. Metric detect_to_kill (ms): từ lúc nguồn sự kiện thấy
+    process tới lúc kill xong - so sánh các nguồn thì cộng thêm chu kỳ poll của nguồn đó.
+    log_every: in metrics() tối đa 1 lần mỗi N giây (0 = không in), cùng kiểu log_every của ProcessScanner.
+    """
+
+    def __init__(self, decide, attrs=("name", "exe", "cmdline"), scanner=None, name="killer", log_every=0):
+        self.decide = decide
+        self.attrs = list(attrs)
+        self.scanner = scanner
+        self.name = name
+        self.log_every = log_every
+        self._last_log = time.monotonic()
+        self.detect_to_kill = LatencyStats()
+        self.stats = {"checked": 0, "killed": 0, "denied": 0}
+
+    def handle(self, pid, detected_at, proc=None, info=None):
+        if self.log_every and time.monotonic() - self._last_log >= self.log_every:
+            self.log_metrics()
+        try:
+            if proc is None:
+                proc = psutil.Process(pid)
+            if info is None:
+                info = proc.as_dict(self.attrs)
+            self.stats["checked"] += 1
+            reason = self.decide(info)
+            if not reason:
+                return False
+            print(f"🚫 Killing banned app: {info.get('name')} (PID: {pid}, {reason})")
+            try:
+                proc.kill()
+            except psutil.AccessDenied:
+                self.stats["denied"] += 1
+                if self.scanner is not None:
+                    self.scanner.forget(pid)  # Thử lại ở vòng quét sau
+                return False
+            self.stats["killed"] += 1
+            self.detect_to_kill.record((time.perf_counter() - detected_at) * 1000)
+            return True
+        except (psutil.NoSuchProcess, psutil.ZombieProcess, psutil.AccessDenied):
+            return False
+
+    def metrics(self):
+        return dict(self.stats, name=self.name, detect_to_kill_ms=self.detect_to_kill.summary())
+
+    def log_metrics(self):
+        self._last_log = time.monotonic()
+        lat = self.detect_to_kill.summary()
+        fmt = lambda v: "-" if v is None else f"{v:.1f}ms"
+        print(f"📊 [{self.name}] checked={self.stats['checked']} killed={self.stats['killed']} "
+              f"denied={self.stats['denied']} detect_to_kill p50={fmt(lat['p50'])} p95={fmt(lat['p95'])} "
+              f"max={fmt(lat['max'])}")
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""Quét process tăng dần cho smart killer: chỉ lấy name/exe/cmdline của process MỚI xuất hiện.
+
+process_iter(['pid','name','exe','cmdline']) mỗi giây đọc lại exe + cmdline của hàng trăm process
+sống lâu đã kiểm tra rồi. Scanner giữ bảng pid -> (Process, create_time, identity); mỗi tick list PID,
+inspect đầy đủ PID chưa thấy, còn PID đã biết chỉ so identity rẻ (xem _identity): process đã qua kiểm tra
+rồi exec sang binary khác (giữ nguyên pid + create_time) đổi identity -> inspect lại. Định kỳ so thêm
+create_time của toàn bảng để bắt PID bị tái sử dụng (Windows).
+"""
+from __future__ import annotations
+import sys
+import time
+
+import psutil
+
+VERIFY_EVERY = 10      # Cứ N tick thì so create_time của mọi PID đã biết (PID reuse)
+_SKIP_ERRORS = (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess)
+PF_KTHREAD = 0x00200000   # /proc/<pid>/stat flags: kernel thread
+
+
+def stat_identity(pid, proc_root="/proc"):
+    """Linux: 1 lần đọc /proc/<pid>/stat -> (comm thô, starttime); None nếu process đã mất.
+
+    comm đổi khi exec, starttime đổi khi PID bị tái sử dụng. Kernel thread chỉ trả starttime: kworker tự đổi
+    comm theo workqueue nhưng không exec được.
+    """
+    try:
+        with open(f"{proc_root}/{pid}/stat", "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    end = data.rfind(b")")
+    fields = data[end + 2:].split()   # fields[0] là trường 3 (state)
+    if int(fields[6]) & PF_KTHREAD:
+        return fields[19]
+    return data[data.find(b"(") + 1:end], fields[19]
+
+
+def _identity(pid, proc):
+    """Dấu hiệu rẻ thay đổi khi process exec, không đụng tới name()/cmdline (None = không đọc được).
+
+    Linux: stat_identity. macOS: đường dẫn exe (proc_pidpath) - name() của psutil đọc cả cmdline khi comm
+    bị cắt ở 15 ký tự. Windows không có exec: None, chỉ còn verify tick.
+    """
+    if sys.platform.startswith("linux"):
+        return stat_identity(pid)
+    if sys.platform == "darwin":
+        try:
+            return proc.exe()
+        except _SKIP_ERRORS:
+            return None
+    return None
+
+
+class ProcessScanner:
+    """scan() -> [(Process, info dict)] của các process mới kể từ lần scan trước (lần đầu: tất cả)."""
+
+    def __init__(self, attrs=("name", "exe", "cmdline"), verify_every=VERIFY_EVERY,
+                 name="process_scanner", log_every=0):
+        self.attrs = list(attrs)
+        self.verify_every = verify_every
+        self.name = name
+        self.log_every = log_every
+        self._table = {}   # pid -> (Process, create_time (None nếu không đọc được), identity)
+        self._ticks = 0
+        self.last = {"ms": 0.0, "pids": 0, "inspected": 0, "new": 0}
+        self.stats = {"scans": 0, "inspected": 0, "new": 0, "reused": 0, "renamed": 0, "total_ms": 0.0}
+
+    def _create_time(self, proc):
+        try:
+            return proc.create_time()
+        except psutil.AccessDenied:
+            return None
+
+    def scan(self):
+        start = time.perf_counter()
+        self._ticks += 1
+        verify = bool(self.verify_every) and self._ticks % self.verify_every == 0
+        pids = psutil.pids()
+        alive = set(pids)
+        for pid in [p for p in self._table if p not in alive]:
+            del self._table[pid]
+
+        found = []
+        inspected = 0
+        for pid in pids:
+            entry = self._table.get(pid)
+            try:
+                if entry is not None:
+                    proc, created, identity = entry
+                    # exec đổi binary nhưng giữ pid/create_time: so identity mỗi tick, chưa đổi thì không
+                    # đọc name/exe/cmdline
+                    if identity is not None and _identity(pid, proc) != identity:
+                        self.stats["renamed"] += 1
+                    elif verify and self._create_time(psutil.Process(pid)) != created:
+                        self.stats["reused"] += 1
+                    else:
+                        continue
+                inspected += 1
+                proc = psutil.Process(pid)
+                identity = _identity(pid, proc)   # Đọc trước as_dict: exec xen giữa thì tick sau inspect lại
+                info = proc.as_dict(self.attrs)
+                self._table[pid] = (proc, self._create_time(proc), identity)
+                found.append((proc, info))
+            except _SKIP_ERRORS:
+                continue
+
+        elapsed = (time.perf_counter() - start) * 1000
+        self.last = {"ms": elapsed, "pids": len(pids), "inspected": inspected, "new": len(found)}
+        self.stats["scans"] += 1
+        self.stats["inspected"] += inspected
+        self.stats["new"] += len(found)
+        self.stats["total_ms"] += elapsed
+        if self.log_every and self.stats["scans"] % self.log_every == 0:
+            print(f"📊 [{self.name}] pids={len(pids)} inspected={inspected} new={len(found)} scan={elapsed:.2f}ms")
+        return found
+
+    def forget(self, pid):
+        """Inspect lại PID này ở tick sau (vd: kill thất bại, cần thử lại)."""
+        self._table.pop(pid, None)
+
+    def __len__(self):
+        return len(self._table)
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""Quét nội dung pre-push: chỉ các blob mới (chưa có trên remote), verdict cache theo blob SHA.
+
+git gửi trên stdin của pre-push mỗi dòng: <local ref> <local sha> <remote ref> <remote sha>.
+  1. `git rev-list --objects` các commit mới, loại trừ remote sha + refs/remotes/<remote>/*
+  2. `git cat-file --batch-check` lọc blob; blob đã có verdict (theo SHA) thì bỏ qua hẳn
+  3. `git cat-file --batch` stream phần còn lại, chỉ giữ các cửa sổ file_sampler cần (~12KB/blob)
+  4. classify_local song song (process pool khi nhiều blob), ghi verdict theo lô
+
+SHA là địa chỉ nội dung nên verdict không bao giờ cũ: push lại / rebase không quét lại blob nào.
+Chạy được như hook độc lập:  python -S -E push_scanner.py <remote> <url>  (exit 0 = cho phép).
+Agent thường trú phục vụ cùng việc quét cho hook qua agent_ipc (agent_handlers, op "check_push").
+"""
+from __future__ import annotations
+import os
+import sys
+import threading
+import subprocess
+
+from code_detector import CODE, MIN_CHARS, TEXT, UNSURE, classify_local
+from file_sampler import BINARY_PROBE_BYTES, WINDOW_BYTES, iter_windows, window_offsets
+from verdict_store import VerdictStore
+
+BINARY = "BINARY"
+PUSH_VERDICTS = (CODE, TEXT, UNSURE, BINARY)
+DEFAULT_DB_PATH = os.path.expanduser("~/.dlp_push_verdicts.db")
+CACHE_PREFIX = "blob:v1:"        # Đổi version khi code_detector đổi cách chấm -> bỏ cache cũ
+PARALLEL_MIN_BLOBS = 200         # Ít blob hơn: classify ngay trong process (khởi động pool tốn hơn)
+CHUNK_BYTES = 1 << 20
+MAX_REPORT = 10
+
+
+def parse_push_lines(lines):
+    """-> list (local_ref, local_sha, remote_ref, remote_sha); bỏ dòng sai định dạng."""
+    updates = []
+    for line in lines:
+        parts = line.split()
+        if len(parts) == 4:
+            updates.append(tuple(parts))
+    return updates
+
+
+def _is_zero(sha):
+    return not sha.strip("0")
+
+
+def _git(args, cwd=None, **kwargs):
+    return subprocess.run(["git"] + args, cwd=cwd, capture_output=True, check=True, **kwargs).stdout
+
+
+def new_blobs(updates, remote=None, cwd=None):
+    """-> {blob_sha: (size, path)} của các blob mà push này sẽ gửi lên (chưa có trên remote)."""
+    include = [local for _, local, _, _ in updates if not _is_zero(local)]   # Xóa nhánh: không gửi nội dung
+    if not include:
+        return {}
+    exclude = [remote_sha for _, _, _, remote_sha in updates if not _is_zero(remote_sha)]
+    args = ["rev-list", "--objects", "--ignore-missing"] + include + ["--not"] + exclude
+    if remote and "/" not in remote and ":" not in remote:   # Tên remote (không phải URL)
+        args.append(f"--remotes={remote}")
+    listing = _git(args, cwd=cwd)
+    if not listing:
+        return {}
+    checked = _git(["cat-file", "--batch-check=%(objecttype) %(objectname) %(objectsize) %(rest)"],
+                   cwd=cwd, input=listing)
+    blobs = {}
+    for line in checked.decode("utf-8", errors="replace").splitlines():
+        kind, _, rest = line.partition(" ")
+        if kind != "blob":
+            continue
+        sha, size, path = (rest.split(" ", 2) + [""])[:3]
+        blobs.setdefault(sha, (int(size), path))
+    return blobs
+
+
+def _ranges(size):
+    """Các đoạn (offset, length) classify_parts sẽ đọc với blob kích thước size."""
+    ranges = [(0, min(size, max(WINDOW_BYTES, BINARY_PROBE_BYTES)))]
+    if size > WINDOW_BYTES:
+        ranges += [(offset, WINDOW_BYTES) for offset in window_offsets(size)]
+    return ranges
+
+
+def _read_parts(stream, size):
+    """Đọc đúng size byte nội dung blob từ stream, chỉ giữ các đoạn trong _ranges (blob lớn không nằm trong RAM)."""
+    ranges = _ranges(size)
+    parts = {r: [] for r in ranges}
+    pos = 0
+    while pos < size:
+        chunk = stream.read(min(CHUNK_BYTES, size - pos))
+        if not chunk:
+            raise EOFError("git cat-file ended early")
+        end = pos + len(chunk)
+        for (start, length), pieces in parts.items():
+            lo, hi = max(start, pos), min(start + length, end)
+            if lo < hi:
+                pieces.append(chunk[lo - pos:hi - pos])
+        pos = end
+    stream.read(1)   # '\n' sau nội dung
+    return {r: b"".join(pieces) for r, pieces in parts.items()}
+
+
+def classify_parts(item):
+    """Worker: (sha, size, parts) -> (sha, verdict). Chạy được trong process pool (hàm top-level).
+
+    Mỗi cửa sổ classify đúng 1 lần: có cửa sổ CODE -> CODE, có cửa sổ UNSURE -> UNSURE, còn lại TEXT.
+    """
+    sha, size, parts = item
+
+    def read(offset, length):
+        return parts.get((offset, length), b"")
+
+    head = read(0, min(size, max(WINDOW_BYTES, BINARY_PROBE_BYTES)))
+    if b"\0" in head[:BINARY_PROBE_BYTES]:
+        return sha, BINARY
+    if size <= WINDOW_BYTES:
+        windows = [head.decode("utf-8", errors="ignore")]
+    else:
+        windows = iter_windows(read, size)
+    verdict = TEXT
+    for text in windows:
+        if len(text.strip()) < MIN_CHARS:   # File rỗng / quá ngắn (VERSION, .gitkeep): không có gì để lộ
+            continue
+        local = classify_local(text)
+        if local == CODE:
+            return sha, CODE
+        if local == UNSURE:
+            verdict = UNSURE
+    return sha, verdict
+
+
+def _iter_blob_parts(shas, cwd=None):
+    proc = subprocess.Popen(["git", "cat-file", "--batch"], cwd=cwd, stdin=subprocess.PIPE,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    # Ghi danh sách SHA ở thread riêng để 2 đầu pipe không chờ nhau khi danh sách dài
+    def feed():
+        try:
+            proc.stdin.write("".join(f"{sha}\n" for sha in shas).encode())
+        finally:
+            proc.stdin.close()
+    writer = threading.Thread(target=feed, daemon=True)
+    writer.start()
+    try:
+        for _ in shas:
+            header = proc.stdout.readline().split()
+            if len(header) != 3:
+                raise RuntimeError(f"git cat-file: unexpected header {header!r}")
+            sha, size = header[0].decode(), int(header[2])
+            yield sha, size, _read_parts(proc.stdout, size)
+    finally:
+        proc.stdout.close()
+        proc.wait()
+        writer.join(timeout=1)
+
+
+class PushScanner:
+    """scan(updates, remote) -> {blob_sha: verdict} cho mọi blob mới trong push.
+
+    stats: blobs (tổng blob mới), cached (lấy từ cache), scanned (đã đọc + classify).
+    max_scan: số blob chưa có verdict tối đa chịu quét, vượt -> RuntimeError (agent trả việc lại cho hook).
+    """
+
+    def __init__(self, store=None, workers=None, cwd=None, max_scan=None):
+        self.store = store if store is not None else VerdictStore(DEFAULT_DB_PATH, verdicts=PUSH_VERDICTS)
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.cwd = cwd
+        self.max_scan = max_scan
+        self.paths = {}
+        self.stats = {"blobs": 0, "cached": 0, "scanned": 0}
+
+    def scan(self, updates, remote=None):
+        blobs = new_blobs(updates, remote, self.cwd)
+        self.paths = {sha: path for sha, (_, path) in blobs.items()}
+        return self.classify(list(blobs))
+
+    def classify(self, shas):
+        """-> {sha: verdict} cho các blob (đã có trong repo cwd): lấy từ cache, còn lại đọc + classify."""
+        cached = self.store.get_many(CACHE_PREFIX + sha for sha in shas)
+        verdicts = {sha: cached[CACHE_PREFIX + sha] for sha in shas if CACHE_PREFIX + sha in cached}
+        pending = [sha for sha in dict.fromkeys(shas) if sha not in verdicts]
+        self.stats.update(blobs=len(shas), cached=len(verdicts), scanned=len(pending))
+        if self.max_scan is not None and len(pending) > self.max_scan:
+            raise RuntimeError(f"{len(pending)} blobs to scan (max_scan={self.max_scan})")
+        if pending:
+            if self.workers > 1 and len(pending) >= PARALLEL_MIN_BLOBS:
+                from concurrent.futures import ProcessPoolExecutor
+                with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                    # Khởi động worker trước khi mở pipe tới git: worker fork sau đó sẽ giữ đầu ghi stdin
+                    # của cat-file -> git không bao giờ thấy EOF và proc.wait() treo
+                    list(pool.map(int, range(self.workers)))
+                    items = _iter_blob_parts(pending, self.cwd)
+                    results = list(pool.map(classify_parts, items, chunksize=64))
+            else:
+                results = [classify_parts(item) for item in _iter_blob_parts(pending, self.cwd)]
+            self.store.put_many((CACHE_PREFIX + sha, verdict) for sha, verdict in results)
+            verdicts.update(results)
+        return verdicts
+
+    def check(self, updates, remote=None):
+        """-> (allowed, offending) - chỉ cho phép khi mọi blob mới đều TEXT; offending = [(path, verdict)]."""
+        verdicts = self.scan(updates, remote)
+        offending = sorted((self.paths.get(sha) or sha, verdict)
+                           for sha, verdict in verdicts.items() if verdict != TEXT)
+        return not offending, offending
+
+
+def agent_handlers(store):
+    """Handler cho agent_ipc.AgentServer, dùng store đã mở của agent. Quét ngay trong process agent
+    (workers=1: không fork/spawn từ agent); push cần quét nhiều blob -> lỗi, hook tự quét bằng process pool."""
+
+    def check_push(cwd, remote, url, lines):
+        scanner = PushScanner(store=store, workers=1, cwd=cwd, max_scan=PARALLEL_MIN_BLOBS)
+        allowed, offending = scanner.check(parse_push_lines(lines.splitlines()), remote)
+        return {"allowed": allowed, "lines": report_lines(url, allowed, offending, scanner.stats)}
+
+    def classify_blobs(cwd, shas):
+        return PushScanner(store=store, workers=1, cwd=cwd, max_scan=PARALLEL_MIN_BLOBS).classify(shas)
+
+    return {"check_push": check_push, "classify_blobs": classify_blobs}
+
+
+def report_lines(url, allowed, offending, stats):
+    if allowed:
+        return [f"✅ [DLP] Push to {url}: {stats['blobs']} new file(s), text only "
+                f"({stats['cached']} cached, {stats['scanned']} scanned)"]
+    lines = [f"🚫 [DLP] Push to {url} contains {len(offending)} non-text file(s):"]
+    lines += [f"    {verdict:6s} {path}" for path, verdict in offending[:MAX_REPORT]]
+    if len(offending) > MAX_REPORT:
+        lines.append(f"    ... and {len(offending) - MAX_REPORT} more")
+    return lines
+
+
+def check_push(remote, url, stdin, workers=None, cwd=None):
+    """Dùng trong hook: quét push, in kết quả ra stderr. Lỗi git/đọc -> chặn (fail closed)."""
+    try:
+        scanner = PushScanner(workers=workers, cwd=cwd)
+        allowed, offending = scanner.check(parse_push_lines(stdin), remote)
+    except Exception as e:
+        print(f"⚠️ [DLP] Push content scan failed: {e}", file=sys.stderr)
+        return False
+    for line in report_lines(url, allowed, offending, scanner.stats):
+        print(line, file=sys.stderr)
+    return allowed
+
+
+if __name__ == "__main__":
+    _remote = sys.argv[1] if len(sys.argv) > 1 else ""
+    _url = sys.argv[2] if len(sys.argv) > 2 else _remote
+    sys.exit(0 if check_push(_remote, _url, sys.stdin) else 1)
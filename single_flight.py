@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Single-flight: gộp các lời gọi đồng thời cùng key thành 1 lần thực thi, các thread còn lại chờ chung kết quả."""
+from __future__ import annotations
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    def __init__(self, name="single_flight"):
+        self.name = name
+        self._inflight = {}  # key -> Future
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0   # số lời gọi trùng đã được hấp thụ
+
+    def do(self, key, fn, *args, **kwargs):
+        """Chạy fn(*args) cho key; nếu key đang chạy ở thread khác thì chờ kết quả của thread đó."""
+        with self._lock:
+            self.calls += 1
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+                self.executions += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def in_flight(self, key):
+        with self._lock:
+            return key in self._inflight
+
+    def stats(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "calls": self.calls,
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._inflight),
+            }
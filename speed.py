@@ -17,10 +17,15 @@ from dotenv import load_dotenv
 from openai import OpenAI
 from pynput import keyboard
 from pynput.keyboard import Key, Listener
-from AppKit import NSWorkspace, NSWorkspaceDidActivateApplicationNotification
+from AppKit import NSWorkspace, NSWorkspaceDidActivateApplicationNotification, NSPasteboard
 from Foundation import NSObject
 from PyObjCTools import AppHelper
 
+from bounded_cache import BoundedCache
+from clipboard_prefetch import ClipboardPrefetcher
+from single_flight import SingleFlight
+from verdict_store import VerdictStore
+
 # Whitelist - Allowed apps (copy/paste được trong các app này)
 ALLOWED_CODE_APPS_MAC = {
     "Code", "Electron", "PyCharm", "IntelliJ IDEA", "CLion",
@@ -230,6 +235,22 @@ def trigger_email_async(content, app_name="Unknown"):
 # ==============================
 #   AI LLM CLASSIFICATION
 # ==============================
+VERDICT_STORE = VerdictStore()  # Cache verdict trên đĩa, dùng chung giữa các lần restart
+
+def get_pasteboard_change_count():
+    """changeCount của NSPasteboard - tăng mỗi lần clipboard đổi, đọc rất rẻ"""
+    try:
+        return NSPasteboard.generalPasteboard().changeCount()
+    except:
+        return 0
+
+def peek_clipboard_text():
+    """Đọc text clipboard (không xóa) theo đúng cách handleAppActivation_ đọc để hash khớp"""
+    try:
+        return "text", pyperclip.paste()
+    except:
+        return None, None
+
 def hash_data(data):
     """Hash content để track thay đổi"""
     if isinstance(data, str):
@@ -249,9 +270,20 @@ def call_llm(client, model, content):
             return result
         except Exception as e:
             print(f"🤖 [LLM] Error: {e}")
-            return "CODE"  # Default to CODE nếu lỗi
+            return None  # Caller tự fallback CODE, không lưu bền lỗi
     return "TEXT"
 
+def classify_with_store(client, model, content, content_hash):
+    """Tra cache verdict trên đĩa trước khi gọi LLM - lỗi LLM (fallback CODE) không được lưu bền"""
+    result = VERDICT_STORE.get(content_hash)
+    if result:
+        return result
+    result = call_llm(client, model, content)
+    if result is None:
+        return "CODE"  # Default to CODE nếu lỗi
+    VERDICT_STORE.put(content_hash, result)
+    return result
+
 class TrapdoorHandler(NSObject):
     """
     Class này lắng nghe sự kiện từ hệ điều hành MacOS.
@@ -267,7 +299,8 @@ class TrapdoorHandler(NSObject):
         
         # Khởi tạo LLM client nếu có config
         self.llm_client = None
-        self.llm_cache = {}  # Cache kết quả LLM theo hash
+        self.llm_cache = BoundedCache(max_entries=5000, max_bytes=1024 * 1024, ttl=24 * 3600, name="llm_cache")  # Cache kết quả LLM theo hash
+        self.llm_flight = SingleFlight("speed_llm")  # Prefetch và check_llm_* cùng hash chỉ gọi LLM 1 lần
         if AZURE_ENDPOINT and AZURE_KEY and AZURE_MODEL:
             try:
                 self.llm_client = OpenAI(base_url=AZURE_ENDPOINT, api_key=AZURE_KEY)
@@ -376,6 +409,22 @@ class TrapdoorHandler(NSObject):
         except Exception as e:
             print(f"Lỗi: {e}")
     
+    def classify_cached(self, content, content_hash):
+        """llm_cache -> (VerdictStore + LLM, gộp các lời gọi trùng hash đang chạy)"""
+        result = self.llm_cache.get(content_hash)
+        if result is not None:
+            print(f"🤖 [LLM] Cache hit: {result}")
+            return result
+        result = self.llm_flight.do(content_hash, classify_with_store, self.llm_client, AZURE_MODEL, content, content_hash)
+        self.llm_cache[content_hash] = result
+        return result
+
+    def prefetch(self, d_type, content):
+        """Gọi từ ClipboardPrefetcher ngay khi copy - lúc chuyển app verdict đã nằm trong llm_cache"""
+        if not self.llm_client or not AZURE_MODEL or not content.strip():
+            return
+        self.classify_cached(content, hash_data(content))
+
     def check_llm_sync(self, content, content_hash):
         """Gọi LLM sync để check content type (blocking)"""
         if not self.llm_client or not AZURE_MODEL:
@@ -384,15 +433,7 @@ class TrapdoorHandler(NSObject):
             return "CODE"
         
         try:
-            # Check cache trước
-            if content_hash in self.llm_cache:
-                result = self.llm_cache[content_hash]
-                print(f"🤖 [LLM] Cache hit: {result}")
-            else:
-                # Gọi LLM
-                result = call_llm(self.llm_client, AZURE_MODEL, content)
-                self.llm_cache[content_hash] = result
-            
+            result = self.classify_cached(content, content_hash)
             self.content_type = result
             return result
         except Exception as e:
@@ -409,15 +450,7 @@ class TrapdoorHandler(NSObject):
         
         def llm_check():
             try:
-                # Check cache trước
-                if content_hash in self.llm_cache:
-                    result = self.llm_cache[content_hash]
-                    print(f"🤖 [LLM] Cache hit: {result}")
-                else:
-                    # Gọi LLM
-                    result = call_llm(self.llm_client, AZURE_MODEL, content)
-                    self.llm_cache[content_hash] = result
-                
+                result = self.classify_cached(content, content_hash)
                 self.content_type = result
                 
                 # Nếu là TEXT và đang ở app không allowed, restore clipboard
@@ -526,6 +559,10 @@ def main():
     # Bắt đầu keyboard listener cho Cmd+V
     keyboard_listener = start_keyboard_listener(handler)
     
+    # Phân loại trước ngay lúc copy (theo NSPasteboard changeCount)
+    prefetcher = ClipboardPrefetcher(get_pasteboard_change_count, peek_clipboard_text, handler.prefetch, types=("text",))
+    prefetcher.start()
+    
     print(f"✅ Allowed apps: {', '.join(sorted(ALLOWED_CODE_APPS_MAC))}")
     print(f"🚫 Banned apps: {', '.join(BANNED_APPS_MAC)}")
     print("👀 Đang theo dõi...")
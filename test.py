@@ -20,6 +20,9 @@ from AppKit import NSWorkspace, NSWorkspaceDidActivateApplicationNotification, N
 from Foundation import NSObject, NSURL
 from PyObjCTools import AppHelper
 
+from bounded_cache import BoundedCache
+from verdict_store import VerdictStore
+
 # Whitelist - Allowed apps (copy/paste được trong các app này)
 ALLOWED_CODE_APPS_MAC = {
     "Code", "Electron", "PyCharm", "IntelliJ IDEA", "CLion",
@@ -304,6 +307,8 @@ def restore_clipboard(data_type, data):
 # ==============================
 #   AI LLM CLASSIFICATION
 # ==============================
+VERDICT_STORE = VerdictStore()  # Cache verdict trên đĩa, dùng chung giữa các lần restart
+
 def hash_data(data):
     """Hash content để track thay đổi"""
     if isinstance(data, str):
@@ -323,9 +328,20 @@ def call_llm(client, model, content):
             return result
         except Exception as e:
             print(f"🤖 [LLM] Error: {e}")
-            return "CODE"  # Default to CODE nếu lỗi
+            return None  # Caller tự fallback CODE, không lưu bền lỗi
     return "TEXT"
 
+def classify_with_store(client, model, content, content_hash):
+    """Tra cache verdict trên đĩa trước khi gọi LLM - lỗi LLM (fallback CODE) không được lưu bền"""
+    result = VERDICT_STORE.get(content_hash)
+    if result:
+        return result
+    result = call_llm(client, model, content)
+    if result is None:
+        return "CODE"  # Default to CODE nếu lỗi
+    VERDICT_STORE.put(content_hash, result)
+    return result
+
 class TrapdoorHandler(NSObject):
     """
     Class này lắng nghe sự kiện từ hệ điều hành MacOS.
@@ -342,7 +358,7 @@ class TrapdoorHandler(NSObject):
         
         # Khởi tạo LLM client nếu có config
         self.llm_client = None
-        self.llm_cache = {}  # Cache kết quả LLM theo hash
+        self.llm_cache = BoundedCache(max_entries=5000, max_bytes=1024 * 1024, ttl=24 * 3600, name="llm_cache")  # Cache kết quả LLM theo hash
         if AZURE_ENDPOINT and AZURE_KEY and AZURE_MODEL:
             try:
                 self.llm_client = OpenAI(base_url=AZURE_ENDPOINT, api_key=AZURE_KEY)
@@ -436,12 +452,12 @@ class TrapdoorHandler(NSObject):
         
         try:
             # Check cache trước
-            if content_hash in self.llm_cache:
-                verdict = self.llm_cache[content_hash]
+            verdict = self.llm_cache.get(content_hash)
+            if verdict is not None:
                 print(f"   🤖 [LLM] Cache hit: {verdict}")
             else:
                 # Gọi LLM
-                verdict = call_llm(self.llm_client, AZURE_MODEL, content_to_check)
+                verdict = classify_with_store(self.llm_client, AZURE_MODEL, content_to_check, content_hash)
                 self.llm_cache[content_hash] = verdict
             
             self.content_type = verdict
@@ -462,12 +478,12 @@ class TrapdoorHandler(NSObject):
         
         try:
             # Check cache trước
-            if content_hash in self.llm_cache:
-                result = self.llm_cache[content_hash]
+            result = self.llm_cache.get(content_hash)
+            if result is not None:
                 print(f"🤖 [LLM] Cache hit: {result}")
             else:
                 # Gọi LLM
-                result = call_llm(self.llm_client, AZURE_MODEL, content)
+                result = classify_with_store(self.llm_client, AZURE_MODEL, content, content_hash)
                 self.llm_cache[content_hash] = result
             
             self.content_type = result
@@ -20,6 +20,9 @@ import pyperclip
 import psutil
 from openai import OpenAI
 
+from bounded_cache import BoundedCache
+from clipboard_backend import ChangeGate, native_change_counter
+
 # Ép buộc môi trường chạy phải dùng UTF-8
 os.environ["PYTHONIOENCODING"] = "utf-8"
 os.environ["LANG"] = "en_US.UTF-8"
@@ -350,7 +353,7 @@ def call_llm(client, model, content):
 # ==============================
 def main_loop(url, key, model):
     client = OpenAI(base_url=url, api_key=key)
-    cache = {}
+    cache = BoundedCache(max_entries=5000, max_bytes=1024 * 1024, ttl=24 * 3600, name="verdict_cache")
     
     # Source tracking
     source_content = None
@@ -364,10 +367,16 @@ def main_loop(url, key, model):
     print("🚀 DLP Agent Mac Started...")
     start_smart_killer()
 
+    # Chỉ gọi get_clipboard_mac (osascript + paste) và hash lại khi changeCount đổi
+    gate = ChangeGate(native_change_counter(), name="main_loop", log_every=6000)
+    curr_type, curr_data, curr_hash = "empty", None, None
+
     while RUN_FLAG:
         try:
             current_app_name = get_active_app_name_mac()
-            curr_type, curr_data = get_clipboard_mac()
+            if gate.changed():
+                curr_type, curr_data = get_clipboard_mac()
+                curr_hash = hash_data(curr_data) if curr_type != "empty" else None
             
             # --- 1. CLIPBOARD EMPTY + ĐANG BLOCK → Kiểm tra restore ---
             if curr_type == "empty" and is_blocked and source_content:
@@ -383,8 +392,6 @@ def main_loop(url, key, model):
                 time.sleep(0.1)
                 continue
 
-            curr_hash = hash_data(curr_data)
-
             # --- 2. PHÁT HIỆN SAO CHÉP MỚI ---
             if curr_hash != source_hash:
                 source_content = curr_data
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""Cache verdict CODE/TEXT lưu trên đĩa (SQLite WAL) - giữ lại qua các lần restart agent."""
+from __future__ import annotations
+import os
+import time
+import sqlite3
+import threading
+
+DEFAULT_DB_PATH = os.path.expanduser("~/.dlp_agent_verdicts.db")
+DEFAULT_TTL = 30 * 24 * 3600      # 30 ngày
+DEFAULT_MAX_ENTRIES = 50000
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+COMPACT_EVERY = 500               # Compact sau mỗi N lần ghi
+TOUCH_INTERVAL = 3600             # Chỉ cập nhật last_used tối đa 1 lần/giờ để giảm ghi đĩa
+
+VALID_VERDICTS = ("CODE", "TEXT")
+
+
+class VerdictStore:
+    """Map content-hash -> verdict, mở kết nối lazy ở lần truy cập đầu tiên.
+
+    Mọi lỗi SQLite đều bị nuốt: store hỏng/khóa thì agent vẫn chạy như cache rỗng.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH, ttl=DEFAULT_TTL,
+                 max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES, verdicts=VALID_VERDICTS):
+        self.path = path
+        self.verdicts = tuple(verdicts)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._conn = None
+        self._disabled = False
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is not None or self._disabled:
+            return self._conn
+        try:
+            conn = sqlite3.connect(self.path, timeout=1.0, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS verdicts ("
+                " key TEXT PRIMARY KEY, verdict TEXT NOT NULL,"
+                " created REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_verdicts_last_used ON verdicts(last_used)")
+            try: os.chmod(self.path, 0o600)
+            except Exception: pass
+            self._conn = conn
+            self._compact_locked()
+        except Exception as e:
+            print(f"⚠️ Verdict store disabled: {e}")
+            self._disabled = True
+        return self._conn
+
+    def get(self, key):
+        if not key: return None
+        with self._lock:
+            conn = self._connect()
+            if conn is None: return None
+            try:
+                row = conn.execute("SELECT verdict, created, last_used FROM verdicts WHERE key = ?", (key,)).fetchone()
+                if row is None: return None
+                verdict, created, last_used = row
+                now = time.time()
+                if now - created > self.ttl:
+                    conn.execute("DELETE FROM verdicts WHERE key = ?", (key,))
+                    return None
+                if now - last_used > TOUCH_INTERVAL:
+                    conn.execute("UPDATE verdicts SET last_used = ? WHERE key = ?", (now, key))
+                return verdict
+            except Exception:
+                return None
+
+    def get_many(self, keys):
+        """-> {key: verdict} cho các key còn hạn (1 lần khóa, truy vấn theo lô)."""
+        keys = [k for k in dict.fromkeys(keys) if k]
+        found = {}
+        if not keys: return found
+        with self._lock:
+            conn = self._connect()
+            if conn is None: return found
+            try:
+                now = time.time()
+                stale = []
+                for i in range(0, len(keys), 500):   # Giới hạn số tham số của SQLite
+                    batch = keys[i:i + 500]
+                    rows = conn.execute(
+                        "SELECT key, verdict, last_used FROM verdicts"
+                        f" WHERE created >= ? AND key IN ({','.join('?' * len(batch))})",
+                        (now - self.ttl, *batch),
+                    )
+                    for key, verdict, last_used in rows:
+                        found[key] = verdict
+                        if now - last_used > TOUCH_INTERVAL:
+                            stale.append((now, key))
+                if stale:   # Giống get(): entry được dùng không bị compact coi là nguội
+                    conn.executemany("UPDATE verdicts SET last_used = ? WHERE key = ?", stale)
+            except Exception:
+                pass
+        return found
+
+    def put(self, key, verdict):
+        if not key or verdict not in self.verdicts: return
+        with self._lock:
+            conn = self._connect()
+            if conn is None: return
+            try:
+                now = time.time()
+                conn.execute(
+                    "INSERT OR REPLACE INTO verdicts (key, verdict, created, last_used) VALUES (?, ?, ?, ?)",
+                    (key, verdict, now, now),
+                )
+                self._writes += 1
+                if self._writes % COMPACT_EVERY == 0:
+                    self._compact_locked()
+            except Exception:
+                pass
+
+    def put_many(self, items):
+        """Ghi nhiều (key, verdict) trong 1 transaction (mỗi put lẻ là 1 lần commit)."""
+        items = [(k, v) for k, v in items if k and v in self.verdicts]
+        if not items: return
+        with self._lock:
+            conn = self._connect()
+            if conn is None: return
+            try:
+                now = time.time()
+                with conn:
+                    conn.execute("BEGIN")
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO verdicts (key, verdict, created, last_used) VALUES (?, ?, ?, ?)",
+                        [(k, v, now, now) for k, v in items],
+                    )
+                before = self._writes // COMPACT_EVERY
+                self._writes += len(items)
+                if self._writes // COMPACT_EVERY != before:
+                    self._compact_locked()
+            except Exception:
+                pass
+
+    def compact(self):
+        with self._lock:
+            if self._connect() is not None:
+                self._compact_locked()
+
+    def _compact_locked(self):
+        """Xóa bản ghi hết hạn, cắt về 90% max_entries theo last_used, VACUUM nếu file quá lớn."""
+        conn = self._conn
+        try:
+            conn.execute("DELETE FROM verdicts WHERE created < ?", (time.time() - self.ttl,))
+            count = conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+            if count > self.max_entries:
+                keep = int(self.max_entries * 0.9)
+                conn.execute(
+                    "DELETE FROM verdicts WHERE key IN ("
+                    " SELECT key FROM verdicts ORDER BY last_used ASC LIMIT ?)",
+                    (count - keep,),
+                )
+            if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                conn.execute("VACUUM")
+        except Exception:
+            pass
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                try: self._conn.close()
+                except Exception: pass
+                self._conn = None